@@ -1,29 +1,77 @@
 import os
 import time
-import requests
-import re
 from datetime import datetime
 from concurrent.futures import ThreadPoolExecutor, as_completed
+from itertools import islice
 from selenium import webdriver
 from selenium.webdriver.common.by import By
 from selenium.webdriver.common.keys import Keys
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 from selenium.common.exceptions import TimeoutException, WebDriverException
+from browser_pool import BrowserPool
+from async_downloader import AsyncDownloadEngine
+from fast_resolver import FastResolver
+from extractors import default_chain, find_video_url
+from link_harvester import canonical_reel_url, harvest_new_reel_links
+from run_manifest import shortcode_from_url
+from session_store import SessionStore
+from popups import dismiss_popups, merge_popup_buttons
+from waits import WaitBudget, REEL_ANCHOR_COUNT_SCRIPT, SCROLL_HEIGHT_SCRIPT
+from rate_limiter import RateLimiter, RATE_LIMIT_PAGE_TEXT
+from transport import DEFAULT_HEADERS, create_session
+from write_path import FileSink, resume_plan
+from metrics import RunMetrics
+from browser_profile import BrowserProfile
+from network_capture import NetworkCapture, find_loaded_video
+from reel_feed import ReelFeed, FeedUnavailable
+from adaptive_stream import StreamDownloader, StreamError, is_stream_url, rendition_label
 
 class InstagramReelDownloader:
-    def __init__(self, username="AbanoubHakim1995", password=None, target_profile=None, video_limit=None, max_workers=5):
+    def __init__(self, username="AbanoubHakim1995", password=None, target_profile=None, video_limit=None, max_workers=5,
+                 browser_workers=1, download_engine="threads", fast_resolve=True,
+                 reuse_session=True, popup_signatures=None, metrics_path=None,
+                 block_resources=True, page_load_strategy="eager", headless=False, network_capture=True,
+                 feed_listing=True, rendition="highest", max_bandwidth=None, async_connections=100,
+                 stream_workers=4):
         self.username = username
         self.password = password
         self.target_profile = target_profile
         self.video_limit = video_limit
         self.max_workers = max_workers
+        self.waits = WaitBudget()
+        self.metrics = RunMetrics()
+        self.metrics.add_collector(self.collect_metrics)
+        self.metrics_path = metrics_path
+        self.popup_buttons = merge_popup_buttons(popup_signatures)
+        self.browser_profile = BrowserProfile(block_resources=block_resources,
+                                              page_load_strategy=page_load_strategy, headless=headless,
+                                              capture_network=network_capture)
+        self.browser_workers = browser_workers
+        self.browser_pool = None
+        self.download_engine = download_engine
+        self.async_connections = async_connections
+        self.async_engine = None
+        self.pending_downloads = []
         
         # Use provided UTC time for folder naming
         current_time = "2025-08-03_215329"  # Current UTC time formatted
         self.output_dir = f"{target_profile}_reels_{current_time}"
         
-        self.session = requests.Session()
+        # A download thread holds ``stream_workers`` connections while it fetches an HLS/DASH stream
+        self.session, self.transport_stats = create_session(max_workers * max(1, stream_workers))
+        self.limiter = RateLimiter()
+        self.fast_resolver = FastResolver(self.session, max_workers=max_workers, limiter=self.limiter,
+                                          metrics=self.metrics) if fast_resolve else None
+        self.reel_feed = ReelFeed(self.session, limiter=self.limiter, metrics=self.metrics,
+                                  rendition=rendition) if feed_listing else None
+        self.listed_video_urls = {}
+        # "feed" or "scroll" once iter_reel_links has picked how to list
+        self.listing_source = None
+        self.stream_downloader = StreamDownloader(self.session, rendition=rendition, max_bandwidth=max_bandwidth,
+                                                  workers=stream_workers, limiter=self.limiter,
+                                                  metrics=self.metrics)
+        self.session_store = SessionStore(f"session_{username}.json") if reuse_session and username else None
         self.cookies = {}
         self.total_downloaded = 0
         self.failed_downloads = []
@@ -61,43 +109,37 @@ class InstagramReelDownloader:
         # Mobile emulation for better compatibility
         mobile_emulation = {
             "deviceMetrics": {"width": 390, "height": 844, "pixelRatio": 3.0},
-            "userAgent": "Mozilla/5.0 (iPhone; CPU iPhone OS 14_0_1 like Mac OS X) AppleWebKit/605.1.15"
+            "userAgent": DEFAULT_HEADERS["User-Agent"]
         }
         options.add_experimental_option("mobileEmulation", mobile_emulation)
         
         # Disable logging and automation flags
         options.add_experimental_option('excludeSwitches', ['enable-logging', 'enable-automation'])
         options.add_experimental_option('useAutomationExtension', False)
+        self.browser_profile.apply(options)
         
         driver = webdriver.Chrome(options=options)
         return driver
 
-    def handle_popups(self, driver):
-        """Handle all Instagram popups including 'Save Login Info'"""
-        popup_buttons = {
-            "save_info": ["Not Now", "Not now"],  # Save login info popup
-            "notifications": ["Not Now", "Not now"],  # Turn on notifications popup
-            "add_to_home": ["Not Now", "Cancel"],  # Add to home screen
-            "generic": ["Skip", "Maybe Later", "No Thanks"]  # Other popups
-        }
-
-        for popup_type, button_texts in popup_buttons.items():
-            for text in button_texts:
-                try:
-                    button = WebDriverWait(driver, 3).until(
-                        EC.element_to_be_clickable((By.XPATH, 
-                            f"//button[contains(text(), '{text}')] | "
-                            f"//div[contains(text(), '{text}') and @role='button']"))
-                    )
-                    button.click()
-                    print(f"✓ Handled {popup_type} popup")
-                    time.sleep(1)
-                    break
-                except:
-                    continue
+    def handle_popups(self, driver, timeout=3.0):
+        """Dismiss all known Instagram popups, including 'Save Login Info'"""
+        with self.waits.track("handle_popups"):
+            handled = dismiss_popups(driver, self.popup_buttons, timeout=timeout)
+        for popup_type in handled:
+            print(f"✓ Handled {popup_type} popup")
 
     def instagram_login(self, driver):
+        self.browser_profile.release(driver)
+        if self.session_store:
+            try:
+                if self.session_store.restore(driver, self.session):
+                    print(f"\n♻️ Reusing saved session for {self.username}")
+                    return True
+            except Exception as e:
+                print(f"⚠️ Could not restore saved session: {str(e)}")
+
         print(f"\n🔐 Logging in as {self.username}...")
+        self.metrics.inc("navigations", page="login")
         driver.get("https://www.instagram.com/accounts/login/")
         wait = WebDriverWait(driver, 30)
         
@@ -109,23 +151,14 @@ class InstagramReelDownloader:
             pass_input.send_keys(self.password)
             pass_input.send_keys(Keys.RETURN)
             
-            # Wait for login to complete
-            time.sleep(5)
-            
-            # Handle "Save Login Info" popup first
-            try:
-                save_info_button = WebDriverWait(driver, 5).until(
-                    EC.element_to_be_clickable((By.XPATH, 
-                        "//button[contains(text(), 'Not Now')] | "
-                        "//div[contains(text(), 'Not Now') and @role='button']"))
-                )
-                save_info_button.click()
-                print("✓ Skipped saving login info")
-                time.sleep(1)
-            except:
-                print("No 'Save Login Info' prompt found")
+            # Wait until we leave the login page or it shows an error
+            self.waits.wait(
+                "instagram_login.submit",
+                lambda: ("/accounts/login" not in driver.current_url
+                         or driver.find_elements(By.ID, "slfErrorAlert")),
+                timeout=15)
             
-            # Handle other popups
+            # Handle "Save Login Info" and any other popups
             self.handle_popups(driver)
             
             # Verify login success
@@ -134,116 +167,212 @@ class InstagramReelDownloader:
                 return False
                 
             print("✅ Login successful!")
+            if self.session_store:
+                self.session_store.save(driver)
             return True
             
         except Exception as e:
             print(f"❌ Login failed: {str(e)}")
             return False
 
-    def collect_reel_links(self, driver):
+    def iter_reel_links(self, driver):
         print(f"\n🔍 Collecting reels from profile: {self.target_profile}")
+        seen = set()
+        if self.reel_feed:
+            self.listing_source = "feed"
+            try:
+                yield from self.iter_feed_links(driver, seen)
+                return
+            except FeedUnavailable as e:
+                print(f"\n📜 Reel feed unavailable ({e}), scrolling the profile instead")
+        self.listing_source = "scroll"
+        yield from self.iter_scrolled_links(driver, seen)
+
+    def iter_feed_links(self, driver, seen):
+        """Yield reel links page by page from the profile's JSON reel feed"""
+        self.reel_feed.copy_cookies(driver)
+        for page in self.reel_feed.pages(self.target_profile):
+            for shortcode, video_url in page.reels:
+                if shortcode in seen:
+                    continue
+                seen.add(shortcode)
+                if video_url:
+                    self.listed_video_urls[shortcode] = video_url
+                yield canonical_reel_url(shortcode)
+
+    def iter_scrolled_links(self, driver, seen):
         profile_url = f"https://www.instagram.com/{self.target_profile}/reels/"
+        # The grid needs its images and styles; a shared driver may come from extraction
+        self.browser_profile.release(driver)
+        self.limiter.acquire(RateLimiter.PAGE)
+        self.metrics.inc("navigations", page="profile")
         driver.get(profile_url)
-        time.sleep(5)
+        self.waits.wait("collect_reel_links.page_load",
+                        lambda: driver.execute_script(REEL_ANCHOR_COUNT_SCRIPT), timeout=10)
+        self.handle_popups(driver, timeout=0.5)
 
-        links = []
-        last_height = driver.execute_script("return document.body.scrollHeight")
+        last_height = driver.execute_script(SCROLL_HEIGHT_SCRIPT)
         attempts_without_new = 0
         
-        while len(links) < (self.video_limit or float('inf')):
-            current_len = len(links)
-            
-            elements = driver.find_elements(By.TAG_NAME, "a")
-            for elem in elements:
-                href = elem.get_attribute("href")
-                if href and "/reel/" in href and href not in links:
-                    links.append(href)
-                    print(f"\r📱 Found {len(links)} reels...", end="", flush=True)
-                    if self.video_limit and len(links) >= self.video_limit:
-                        print()
-                        return links[:self.video_limit]
-
-            if len(links) == current_len:
+        while True:
+            new_links = harvest_new_reel_links(driver, seen)
+            yield from new_links
+
+            if not new_links:
                 attempts_without_new += 1
                 if attempts_without_new >= 3:
                     break
             else:
                 attempts_without_new = 0
 
+            self.limiter.acquire(RateLimiter.PAGE)
+            self.metrics.inc("navigations", page="scroll")
             driver.execute_script("window.scrollTo(0, document.body.scrollHeight);")
-            time.sleep(2)
-            new_height = driver.execute_script("return document.body.scrollHeight")
-            if new_height == last_height:
+
+            def page_grew():
+                height = driver.execute_script(SCROLL_HEIGHT_SCRIPT)
+                return height if height > last_height else None
+
+            new_height = self.waits.wait("collect_reel_links.scroll", page_grew, timeout=4)
+            if not new_height:
                 break
             last_height = new_height
 
-        print()
-        return links[:self.video_limit] if self.video_limit else links
+    def iter_listing(self, driver):
+        """The profile's reel links, up to ``video_limit``"""
+        for count, link in enumerate(self.iter_reel_links(driver), 1):
+            yield link
+            if self.video_limit and count >= self.video_limit:
+                return
+
+    def iter_link_batches(self, driver, size):
+        """The profile's reel links in lists of up to ``size``, while it is still being listed.
+
+        A scrolled listing is read to the end with the first batch:
+        resolving the reels moves the browser off the profile grid.
+        """
+        listing = self.iter_listing(driver)
+        drained = False
+        while True:
+            with self.metrics.time("collect"):
+                links = list(islice(listing, size))
+                if self.listing_source == "scroll" and not drained:
+                    listing = iter(list(listing))
+                    drained = True
+            if not links:
+                return
+            self.metrics.inc("reels_found", len(links))
+            yield links
 
     def extract_video_url(self, driver, reel_url, max_retries=3):
+        self.browser_profile.prepare(driver)
+        capture = NetworkCapture(self.browser_profile.drain_log) if self.browser_profile.capture_network else None
+        with self.metrics.time("resolve_browser"):
+            video_url = self._extract_video_url(driver, reel_url, max_retries, capture)
+        messages = None
+        if capture:
+            capture.poll(driver)
+            messages = capture.messages
+        for resource_type, count in self.browser_profile.count_blocked(driver, messages).items():
+            self.metrics.inc("blocked_requests", count, type=resource_type)
+        return video_url
+
+    def _extract_video_url(self, driver, reel_url, max_retries, capture=None):
         for attempt in range(max_retries):
+            if attempt:
+                self.metrics.inc("retries", stage="resolve_browser")
             try:
+                self.limiter.acquire(RateLimiter.PAGE)
+                self.metrics.inc("navigations", page="reel")
+                if capture:
+                    capture.start(driver)
                 driver.get(reel_url)
-                time.sleep(2)
 
                 # Try multiple methods
                 for _ in range(2):
-                    try:
-                        video = WebDriverWait(driver, 5).until(
-                            EC.presence_of_element_located((By.TAG_NAME, "video"))
-                        )
-                        video_url = video.get_attribute("src")
-                        if video_url and video_url.startswith("http"):
+                    found = self.waits.wait("extract_video_url.video_src",
+                                            lambda: find_loaded_video(driver, capture), timeout=5)
+                    if not found and capture and capture.best():
+                        # A media request that is still loading is good enough now
+                        found = "network", capture.best().url
+                    source, video_url = found or (None, None)
+                    if video_url:
+                        self.metrics.inc("resolved_by", source=source)
+                        self.limiter.succeeded(RateLimiter.PAGE)
+                        return video_url
+
+                    if source != "throttled":
+                        # Nothing on the wire or in a <video> (blob: sources): scan the page data
+                        self.metrics.inc("page_source_fallbacks")
+                        page_source = driver.page_source
+                        video_url = find_video_url(page_source)
+                        if video_url:
+                            self.metrics.inc("resolved_by", source="page_source")
+                            self.limiter.succeeded(RateLimiter.PAGE)
                             return video_url
-                    except:
-                        pass
-
-                    page_source = driver.page_source
-                    patterns = [
-                        r'https://[^"]+\.mp4[^"]*',
-                        r'https://[^"]+\.m3u8[^"]*',
-                        r'"video_url":"([^"]+)"'
-                    ]
-                    
-                    for pattern in patterns:
-                        matches = re.findall(pattern, page_source)
-                        if matches:
-                            url = matches[0]
-                            if isinstance(url, tuple):
-                                url = url[0]
-                            return url.replace('\\u0026', '&')
 
-                    time.sleep(1)
+                    if source == "throttled" or RATE_LIMIT_PAGE_TEXT in page_source:
+                        print("🚦 Instagram is rate limiting page loads, backing off")
+                        self.limiter.throttled(RateLimiter.PAGE)
+                        break
 
             except Exception as e:
                 if attempt == max_retries - 1:
                     print(f"❌ Failed to extract video URL: {str(e)}")
                 else:
                     print(f"⚠️ Retry {attempt + 1}/{max_retries}")
-                    time.sleep(2)
+                    self.waits.sleep("extract_video_url.retry", 2)
         return None
 
     def download_video(self, video_url, filename, max_retries=3):
+        with self.metrics.time("download"):
+            success = self._download_video(video_url, filename, max_retries)
+        self.metrics.inc("reels", result="downloaded" if success else "failed")
+        return success
+
+    def _download_video(self, video_url, filename, max_retries):
+        if is_stream_url(video_url):
+            return self.download_stream(video_url, filename, max_retries)
         filepath = os.path.join(self.output_dir, filename)
+        part_path = filepath + '.part'
         
         for attempt in range(max_retries):
+            if attempt:
+                self.metrics.inc("retries", stage="download")
             try:
-                headers = {
-                    "User-Agent": "Mozilla/5.0 (iPhone; CPU iPhone OS 14_0_1 like Mac OS X) AppleWebKit/605.1.15",
-                    "Accept": "*/*",
-                    "Accept-Encoding": "gzip, deflate, br",
-                }
-                
+                # Ask only for what an earlier attempt or run has not written yet
+                offset = os.path.getsize(part_path) if os.path.exists(part_path) else 0
+                headers = {'Range': f"bytes={offset}-"} if offset else None
+                self.limiter.acquire(RateLimiter.CDN)
                 with self.session.get(video_url, headers=headers, stream=True, timeout=30) as response:
-                    if response.status_code == 200:
-                        with open(filepath, 'wb') as f:
-                            for chunk in response.iter_content(chunk_size=8192):
-                                if chunk:
-                                    f.write(chunk)
+                    self.metrics.inc("http_responses", kind=RateLimiter.CDN, status=response.status_code)
+                    if self.limiter.observe(RateLimiter.CDN, response):
+                        print(f"🚦 CDN throttled {filename} (HTTP {response.status_code}), attempt {attempt + 1}/{max_retries}")
+                        continue
+                    plan = resume_plan(response.status_code, response.headers, offset)
+                    if plan.action == "complete":
+                        os.replace(part_path, filepath)
                         print(f"✅ Downloaded: {filename}")
                         return True
-                    else:
+                    if plan.action == "restart":
+                        os.remove(part_path)
+                        continue
+                    if plan.action == "retry":
                         print(f"⚠️ Download failed (HTTP {response.status_code}), attempt {attempt + 1}/{max_retries}")
+                        continue
+                    if plan.action == "write":
+                        offset = 0
+                    with FileSink(part_path, 'ab' if plan.action == "append" else 'wb',
+                                  expected_size=plan.total) as sink:
+                        try:
+                            size = offset + sink.stream(response)
+                        finally:
+                            self.metrics.inc("bytes_downloaded", sink.written)
+                    if plan.total is not None and size != plan.total:
+                        raise IOError(f"incomplete download: {size}/{plan.total} bytes")
+                    os.replace(part_path, filepath)
+                    print(f"✅ Downloaded: {filename}")
+                    return True
                         
             except Exception as e:
                 if attempt == max_retries - 1:
@@ -253,9 +382,63 @@ class InstagramReelDownloader:
                     time.sleep(2)
         return False
 
+    def download_stream(self, video_url, filename, max_retries):
+        """Join an HLS playlist or DASH manifest into one file (separate audio goes next to it as .m4a)"""
+        try:
+            stream = self.stream_downloader.load(video_url)
+        except (StreamError, IOError, ValueError) as e:
+            print(f"❌ Cannot download the stream for {filename}: {str(e)}")
+            return False
+        print(f"🎞️ {filename}: {stream.kind.upper()} {rendition_label(stream.video)}")
+        self.metrics.inc("streams", kind=stream.kind)
+        tracks = [(stream.video, filename)]
+        if stream.audio:
+            tracks.append((stream.audio, os.path.splitext(filename)[0] + '.m4a'))
+        for rendition, name in tracks:
+            url = self.stream_downloader.whole_file(rendition)
+            if url:
+                if not self._download_video(url, name, max_retries):
+                    return False
+                continue
+            filepath = os.path.join(self.output_dir, name)
+            try:
+                self.stream_downloader.save(rendition, filepath + '.stream')
+            except Exception as e:
+                print(f"❌ Failed to download {name}: {str(e)}")
+                return False
+            os.replace(filepath + '.stream', filepath)
+            print(f"✅ Downloaded: {name} ({len(rendition.segments)} segments)")
+        return True
+
     def process_batch(self, driver, reel_urls, start_idx):
         results = []
+        pending = []
         for idx, url in enumerate(reel_urls, start_idx):
+            # Video URLs that came with the listing need no resolving
+            video_url = self.listed_video_urls.get(shortcode_from_url(url))
+            if video_url:
+                self.metrics.inc("listed_video_urls")
+                results.append((idx, video_url))
+            else:
+                pending.append((idx, url))
+
+        # Plain HTTP first; only unresolved reels go to the browser
+        if self.fast_resolver:
+            unresolved = []
+            for idx, url, video_url in self.fast_resolver.resolve_many(pending):
+                if video_url:
+                    results.append((idx, video_url))
+                else:
+                    unresolved.append((idx, url))
+            pending = sorted(unresolved)
+
+        if self.browser_pool:
+            for position, _, video_url in self.browser_pool.resolve([url for _, url in pending]):
+                if video_url:
+                    results.append((pending[position - 1][0], video_url))
+            return results
+
+        for idx, url in pending:
             print(f"\n📥 Processing reel {idx}")
             video_url = self.extract_video_url(driver, url)
             if video_url:
@@ -263,6 +446,9 @@ class InstagramReelDownloader:
         return results
 
     def download_batch(self, video_info_batch):
+        if self.async_engine:
+            return self.download_batch_async(video_info_batch)
+
         successful = 0
         failed = 0
         
@@ -289,52 +475,165 @@ class InstagramReelDownloader:
                     
         return successful, failed
 
+    def create_async_engine(self):
+        """The asyncio engine, allowed ``async_connections`` transfers at once.
+
+        Not ``max_workers``: the engine exists to keep far more transfers in
+        flight than there are download threads, all to the one CDN host.
+        """
+        return AsyncDownloadEngine(self.output_dir, headers=DEFAULT_HEADERS,
+                                   max_in_flight=self.async_connections,
+                                   per_host_limit=self.async_connections,
+                                   limiter=self.limiter, metrics=self.metrics)
+
+    def download_batch_async(self, video_info_batch, wait=False):
+        # Downloads keep running on the event loop while the next batch is
+        # extracted; only transfers that already finished are counted here
+        successful = 0
+        failed = 0
+        for idx, video_url in video_info_batch:
+            if is_stream_url(video_url):
+                # The engine saves single files; streams are joined from their segments here
+                if self.download_video(video_url, f"reel_{idx}.mp4"):
+                    successful += 1
+                else:
+                    failed += 1
+                continue
+            self.pending_downloads.append(self.async_engine.submit(video_url, f"reel_{idx}.mp4"))
+
+        still_pending = []
+        for future in self.pending_downloads:
+            if not wait and not future.done():
+                still_pending.append(future)
+                continue
+            try:
+                if future.result():
+                    successful += 1
+                else:
+                    failed += 1
+            except Exception as e:
+                print(f"❌ Download failed: {str(e)}")
+                failed += 1
+        self.pending_downloads = still_pending
+        return successful, failed
+
+    def collect_metrics(self, metrics):
+        """Copy the limiter, wait, connection and extractor totals into gauges"""
+        for kind, seconds, events, requests_made, rate in self.limiter.report():
+            metrics.set("limiter_wait_seconds", round(seconds, 3), kind=kind)
+            metrics.set("limiter_throttle_events", events, kind=kind)
+            metrics.set("limiter_requests", requests_made, kind=kind)
+            metrics.set("limiter_rate", round(rate, 4), kind=kind)
+        for site, seconds, count in self.waits.report():
+            metrics.set("wait_seconds", round(seconds, 3), site=site)
+            metrics.set("wait_calls", count, site=site)
+        requests_made, connections, _ = self.transport_stats.report()
+        metrics.set("http_requests", requests_made)
+        metrics.set("http_connections", connections)
+        for name, stats in default_chain.stats().items():
+            metrics.set("extractor_attempts", stats['attempts'], extractor=name)
+            metrics.set("extractor_hits", stats['hits'], extractor=name)
+
     def run(self):
         start_time = time.time()
         driver = self.setup_driver()
         
         try:
-            if not self.instagram_login(driver):
+            with self.metrics.time("login"):
+                logged_in = self.instagram_login(driver)
+            if not logged_in:
                 return
+            
+            if self.fast_resolver:
+                self.fast_resolver.copy_cookies(driver)
                 
-            reel_links = self.collect_reel_links(driver)
-            if not reel_links:
-                print("❌ No reels found!")
-                return
-
+            found = 0
             total_successful = 0
             total_failed = 0
-            batch_size = 5
+            batch_size = 5 * self.browser_workers
+
+            if self.browser_workers > 1:
+                self.browser_pool = BrowserPool(self.setup_driver, self.instagram_login,
+                                                self.extract_video_url,
+                                                num_workers=self.browser_workers).start()
 
-            # Process in batches
-            for i in range(0, len(reel_links), batch_size):
-                batch = reel_links[i:i + batch_size]
-                print(f"\n📦 Processing batch {i//batch_size + 1}/{(len(reel_links) + batch_size - 1)//batch_size}")
+            if self.download_engine == "asyncio":
+                self.async_engine = self.create_async_engine().start()
+
+            # Each batch is resolved and downloaded as soon as it is listed
+            for number, batch in enumerate(self.iter_link_batches(driver, batch_size), 1):
+                print(f"\n📦 Processing batch {number} ({found + 1}-{found + len(batch)})")
                 
-                video_info_batch = self.process_batch(driver, batch, i + 1)
+                video_info_batch = self.process_batch(driver, batch, found + 1)
+                found += len(batch)
                 if video_info_batch:
                     successful, failed = self.download_batch(video_info_batch)
                     total_successful += successful
                     total_failed += failed
                 
-                print(f"\n📊 Progress: {i + len(batch)}/{len(reel_links)} "
+                print(f"\n📊 Progress: {found} listed "
                       f"(✅ Success: {total_successful}, ❌ Failed: {total_failed})")
 
+            if not found:
+                print("❌ No reels found!")
+                return
+
+            if self.async_engine:
+                successful, failed = self.download_batch_async([], wait=True)
+                total_successful += successful
+                total_failed += failed
+
             # Final summary
             elapsed_time = time.time() - start_time
             print(f"\n=== 📑 Download Summary ===")
-            print(f"🎯 Total reels found: {len(reel_links)}")
+            print(f"🎯 Total reels found: {found}")
             print(f"✅ Successfully downloaded: {total_successful}")
             print(f"❌ Failed downloads: {total_failed}")
             print(f"⏱️ Time taken: {elapsed_time:.2f} seconds")
             if total_successful > 0:
                 print(f"⚡ Average time per video: {elapsed_time/total_successful:.2f} seconds")
+            for name, stats in default_chain.stats().items():
+                if stats['attempts']:
+                    print(f"🔎 {name}: {stats['hits']}/{stats['attempts']} pages ({stats['hit_rate']:.0%})")
+            for site, seconds, count in self.waits.report():
+                print(f"⏳ {site}: {seconds:.1f}s over {count} waits")
+            for kind, seconds, events, requests_made, rate in self.limiter.report():
+                if requests_made:
+                    print(f"🚦 {kind}: {requests_made} requests, held back {seconds:.1f}s, "
+                          f"throttled {events}x, rate now {rate:.2f}/s")
+            requests_made, connections, reused = self.transport_stats.report()
+            if requests_made:
+                print(f"🔌 HTTP: {requests_made} requests over {connections} connections ({reused:.0%} reused)")
+            report = self.metrics.report()
+            print(f"📈 {report['reels_per_sec']:.2f} reels/s, {report['mb_per_sec']:.1f} MB/s")
+            for stage, stats in report['stages'].items():
+                print(f"⏱️ {stage}: {stats['count']} calls, mean {stats['mean']:.2f}s, p95 {stats['p95']:.2f}s")
+            blocked = sum(row['value'] for row in report['counters'] if row['name'] == "blocked_requests")
+            if blocked:
+                print(f"🧱 Blocked {blocked} page requests (images, fonts, styles, trackers)")
+            sources = {row['labels']['source']: row['value'] for row in report['counters']
+                       if row['name'] == "resolved_by"}
+            if sources:
+                print("🔎 Video URLs found in the browser by: "
+                      + ", ".join(f"{source} {count}" for source, count in sorted(sources.items())))
             print(f"📁 Files saved in: {os.path.abspath(self.output_dir)}")
 
         except Exception as e:
             print(f"❌ An error occurred: {str(e)}")
         finally:
+            if self.browser_pool:
+                self.browser_pool.close()
+                self.browser_pool = None
+            if self.async_engine:
+                self.async_engine.close()
+                self.async_engine = None
             driver.quit()
+            try:
+                self.metrics.write_report(os.path.join(self.output_dir, "run_report.json"))
+                if self.metrics_path:
+                    self.metrics.write_prometheus(self.metrics_path)
+            except OSError as e:
+                print(f"⚠️ Could not write the run report: {str(e)}")
 
 def main():
     # Configuration
@@ -343,6 +642,10 @@ def main():
     TARGET_PROFILE = "netflixnmovies"
     VIDEO_LIMIT = 10    # Set to None for no limit
     MAX_WORKERS = 5      # Number of concurrent downloads
+    BROWSER_WORKERS = 1  # Number of browsers resolving video URLs
+    DOWNLOAD_ENGINE = "threads"  # "threads" or "asyncio" (requires aiohttp)
+    ASYNC_CONNECTIONS = 100  # Transfers in flight at once with the asyncio engine
+    HEADLESS = False     # Run Chrome without a window
     
     # Print session info
     print(f"\n=== Session Information ===")
@@ -351,6 +654,8 @@ def main():
     print(f"Target Profile: {TARGET_PROFILE}")
     print(f"Video Limit: {'Unlimited' if VIDEO_LIMIT is None else VIDEO_LIMIT}")
     print(f"Parallel Downloads: {MAX_WORKERS}")
+    print(f"Browser Workers: {BROWSER_WORKERS}")
+    print(f"Download Engine: {DOWNLOAD_ENGINE}")
     print("="*25 + "\n")
     
     downloader = InstagramReelDownloader(
@@ -358,7 +663,11 @@ def main():
         password=INSTAGRAM_PASSWORD,
         target_profile=TARGET_PROFILE,
         video_limit=VIDEO_LIMIT,
-        max_workers=MAX_WORKERS
+        max_workers=MAX_WORKERS,
+        browser_workers=BROWSER_WORKERS,
+        download_engine=DOWNLOAD_ENGINE,
+        async_connections=ASYNC_CONNECTIONS,
+        headless=HEADLESS
     )
     
     downloader.run()
@@ -0,0 +1,463 @@
+import hashlib
+import itertools
+import math
+import os
+import re
+import time
+import xml.etree.ElementTree as ET
+from collections import deque, namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urljoin, urlsplit
+
+from rate_limiter import RateLimiter
+from write_path import FileSink
+
+RENDITION_POLICIES = ("highest", "lowest")
+
+STREAM_EXTENSIONS = ('.m3u8', '.mpd')
+
+# One media segment; byte_range is an inclusive (start, end) or None for the whole resource
+Segment = namedtuple('Segment', ['url', 'byte_range'])
+
+# One quality level; ``segments`` is None for an HLS variant whose playlist is not loaded yet,
+# ``audio_group`` the GROUP-ID of an HLS variant's separate audio renditions
+Rendition = namedtuple('Rendition', ['bandwidth', 'width', 'height', 'segments', 'url', 'audio_group'],
+                       defaults=(None,))
+
+# What to save: the video rendition and a separate audio rendition (or None)
+Stream = namedtuple('Stream', ['kind', 'video', 'audio'])
+
+
+class StreamError(Exception):
+    """The playlist or manifest cannot be saved as one file (encrypted, live, malformed)"""
+
+
+def is_stream_url(url):
+    return urlsplit(url or "").path.lower().endswith(STREAM_EXTENSIONS)
+
+
+def is_stream_type(content_type):
+    content_type = (content_type or "").lower()
+    return 'mpegurl' in content_type or 'dash+xml' in content_type
+
+
+def rendition_label(rendition):
+    parts = []
+    if rendition.width and rendition.height:
+        parts.append(f"{rendition.width}x{rendition.height}")
+    if rendition.bandwidth:
+        parts.append(f"{rendition.bandwidth / 1e6:.1f} Mbps")
+    return ", ".join(parts) or "single rendition"
+
+
+def select_rendition(renditions, policy="highest", max_bandwidth=None):
+    """The best rendition within ``max_bandwidth`` bits/s (the smallest if none fits).
+
+    Policy "lowest" always takes the smallest, which saves bandwidth when
+    archiving in bulk.
+    """
+    if policy not in RENDITION_POLICIES:
+        raise ValueError(f"rendition must be one of {', '.join(RENDITION_POLICIES)}")
+    ranked = sorted(renditions, key=lambda r: (r.bandwidth, (r.width or 0) * (r.height or 0)))
+    if policy == "lowest":
+        return ranked[0]
+    fitting = [r for r in ranked if not max_bandwidth or r.bandwidth <= max_bandwidth]
+    return fitting[-1] if fitting else ranked[0]
+
+
+def _attributes(text):
+    """An HLS attribute list (``BANDWIDTH=1280000,CODECS="..."``) as a dict"""
+    return {key: value.strip('"') for key, value in re.findall(r'([A-Z0-9-]+)=("[^"]*"|[^,]*)', text)}
+
+
+def _resolution(value):
+    match = re.fullmatch(r'(\d+)x(\d+)', value or "")
+    return (int(match.group(1)), int(match.group(2))) if match else (None, None)
+
+
+def _byte_range(length, start):
+    return int(start), int(start) + int(length) - 1
+
+
+def parse_hls(text, url):
+    """Renditions of a master playlist, or the single rendition of a media playlist"""
+    lines = [line.strip() for line in text.splitlines() if line.strip()]
+    if not lines or lines[0] != '#EXTM3U':
+        raise StreamError("not an HLS playlist")
+
+    if not any(line.startswith('#EXT-X-STREAM-INF:') for line in lines):
+        return [Rendition(0, None, None, _hls_segments(lines, url), url)]
+
+    renditions = []
+    attributes = None
+    for line in lines:
+        if line.startswith('#EXT-X-STREAM-INF:'):
+            attributes = _attributes(line.split(':', 1)[1])
+        elif attributes is not None and not line.startswith('#'):
+            width, height = _resolution(attributes.get('RESOLUTION'))
+            renditions.append(Rendition(int(attributes.get('BANDWIDTH') or 0), width, height,
+                                        None, urljoin(url, line), attributes.get('AUDIO')))
+            attributes = None
+    return renditions
+
+
+def parse_hls_audio(text, url):
+    """A master playlist's ``EXT-X-MEDIA`` audio renditions, by GROUP-ID.
+
+    Each group lists its DEFAULT=YES rendition first. Entries without a
+    URI are carried inside the variant streams and are left out.
+    """
+    groups = {}
+    for line in text.splitlines():
+        line = line.strip()
+        if not line.startswith('#EXT-X-MEDIA:'):
+            continue
+        attributes = _attributes(line.split(':', 1)[1])
+        if attributes.get('TYPE') != 'AUDIO' or not attributes.get('URI'):
+            continue
+        rendition = Rendition(0, None, None, None, urljoin(url, attributes['URI']))
+        group = groups.setdefault(attributes.get('GROUP-ID'), [])
+        if attributes.get('DEFAULT') == 'YES':
+            group.insert(0, rendition)
+        else:
+            group.append(rendition)
+    return groups
+
+
+def _hls_segments(lines, url):
+    if '#EXT-X-ENDLIST' not in lines:
+        raise StreamError("live playlist")
+    segments = []
+    byte_range = None
+    next_start = 0
+    for line in lines:
+        if line.startswith('#EXT-X-KEY:'):
+            method = _attributes(line.split(':', 1)[1]).get('METHOD', 'NONE')
+            if method != 'NONE':
+                raise StreamError(f"encrypted stream ({method})")
+        elif line.startswith('#EXT-X-MAP:'):
+            attributes = _attributes(line.split(':', 1)[1])
+            length, _, start = attributes.get('BYTERANGE', '').partition('@')
+            segments.append(Segment(urljoin(url, attributes['URI']),
+                                    _byte_range(length, start or 0) if length else None))
+        elif line.startswith('#EXT-X-BYTERANGE:'):
+            # Without "@start" the range follows the previous segment's
+            length, _, start = line.split(':', 1)[1].partition('@')
+            byte_range = _byte_range(length, start or next_start)
+        elif not line.startswith('#'):
+            segments.append(Segment(urljoin(url, line), byte_range))
+            if byte_range:
+                next_start = byte_range[1] + 1
+            byte_range = None
+    return segments
+
+
+def _local(tag):
+    return tag.rsplit('}', 1)[-1]
+
+
+def _children(element, name):
+    return [child for child in element if _local(child.tag) == name]
+
+
+def _child(element, name):
+    children = _children(element, name)
+    return children[0] if children else None
+
+
+def _base_url(element, base):
+    child = _child(element, 'BaseURL')
+    return urljoin(base, child.text.strip()) if child is not None and child.text else base
+
+
+def _iso_duration(value):
+    """Seconds in an ISO 8601 duration such as ``PT1M3.5S``"""
+    match = re.fullmatch(r'P(?:(\d+)D)?(?:T(?:(\d+)H)?(?:(\d+)M)?(?:([\d.]+)S)?)?', value or "")
+    if not match:
+        return None
+    days, hours, minutes, seconds = (float(part) if part else 0.0 for part in match.groups())
+    return ((days * 24 + hours) * 60 + minutes) * 60 + seconds
+
+
+def _dash_range(value):
+    if not value:
+        return None
+    start, _, end = value.partition('-')
+    return int(start), int(end)
+
+
+def _fill_template(template, representation, number=None, start_time=None):
+    def substitute(match):
+        name, width = match.group(1), match.group(3)
+        if not name:
+            return '$'
+        value = {'RepresentationID': representation.get('id'), 'Number': number,
+                 'Bandwidth': representation.get('bandwidth'), 'Time': start_time}[name]
+        return f"{int(value):0{width}d}" if width else str(value)
+    return re.sub(r'\$(RepresentationID|Number|Bandwidth|Time)?(%0(\d+)d)?\$', substitute, template)
+
+
+def _dash_segments(representation, adaptation, base, duration):
+    templates = [t for t in (_child(adaptation, 'SegmentTemplate'), _child(representation, 'SegmentTemplate'))
+                 if t is not None]
+    if templates:
+        attributes = {}
+        for template in templates:
+            attributes.update(template.attrib)
+        timeline = next((_child(t, 'SegmentTimeline') for t in reversed(templates)
+                         if _child(t, 'SegmentTimeline') is not None), None)
+        timescale = int(attributes.get('timescale', 1))
+        number = int(attributes.get('startNumber', 1))
+        segments = []
+        if 'initialization' in attributes:
+            segments.append(Segment(urljoin(base, _fill_template(attributes['initialization'], representation)),
+                                    None))
+        media = attributes['media']
+        if timeline is not None:
+            start_time = 0
+            for entry in _children(timeline, 'S'):
+                start_time = int(entry.get('t', start_time))
+                length = int(entry.get('d'))
+                repeat = int(entry.get('r', 0))
+                if repeat < 0:
+                    if not duration:
+                        raise StreamError("open-ended segment timeline")
+                    repeat = math.ceil((duration * timescale - start_time) / length) - 1
+                for _ in range(repeat + 1):
+                    segments.append(Segment(urljoin(base, _fill_template(media, representation, number,
+                                                                         start_time)), None))
+                    number += 1
+                    start_time += length
+        else:
+            length = int(attributes.get('duration') or 0)
+            if not length or not duration:
+                raise StreamError("segment count unknown")
+            for index in range(math.ceil(duration * timescale / length)):
+                segments.append(Segment(urljoin(base, _fill_template(media, representation, number + index,
+                                                                     index * length)), None))
+        return segments
+
+    segment_list = _child(representation, 'SegmentList')
+    if segment_list is None:
+        segment_list = _child(adaptation, 'SegmentList')
+    if segment_list is not None:
+        segments = []
+        initialization = _child(segment_list, 'Initialization')
+        if initialization is not None:
+            segments.append(Segment(urljoin(base, initialization.get('sourceURL', '')),
+                                    _dash_range(initialization.get('range'))))
+        for entry in _children(segment_list, 'SegmentURL'):
+            segments.append(Segment(urljoin(base, entry.get('media', '')), _dash_range(entry.get('mediaRange'))))
+        return segments
+
+    # SegmentBase or a bare BaseURL: the whole representation is one file
+    return [Segment(base, None)]
+
+
+def parse_dash(text, url):
+    """``(video, audio)`` renditions of the first period of a DASH manifest"""
+    try:
+        root = ET.fromstring(text)
+    except ET.ParseError as e:
+        raise StreamError(f"malformed manifest: {e}")
+    if _local(root.tag) != 'MPD':
+        raise StreamError("not a DASH manifest")
+    if root.get('type') == 'dynamic':
+        raise StreamError("live manifest")
+    duration = _iso_duration(root.get('mediaPresentationDuration'))
+    period = _child(root, 'Period')
+    if period is None:
+        raise StreamError("manifest has no period")
+    if duration is None:
+        duration = _iso_duration(period.get('duration'))
+    base = _base_url(period, _base_url(root, url))
+
+    video, audio = [], []
+    for adaptation in _children(period, 'AdaptationSet'):
+        if _child(adaptation, 'ContentProtection') is not None:
+            raise StreamError("encrypted stream")
+        adaptation_base = _base_url(adaptation, base)
+        for representation in _children(adaptation, 'Representation'):
+            mime_type = representation.get('mimeType') or adaptation.get('mimeType') or ''
+            kind = adaptation.get('contentType') or mime_type.split('/')[0]
+            rendition = Rendition(
+                int(representation.get('bandwidth') or 0),
+                int(representation.get('width') or adaptation.get('width') or 0) or None,
+                int(representation.get('height') or adaptation.get('height') or 0) or None,
+                _dash_segments(representation, adaptation, _base_url(representation, adaptation_base),
+                               duration),
+                url)
+            if kind == 'video':
+                video.append(rendition)
+            elif kind == 'audio':
+                audio.append(rendition)
+    return video, audio
+
+
+def fetch_in_order(segments, fetch, workers=4, ahead=None):
+    """Yield ``fetch(segment)`` for each segment in order, ``workers`` fetches at a time.
+
+    At most ``ahead`` (twice ``workers`` by default) bodies are fetched
+    before the caller has taken them, so memory stays flat however long
+    the stream.
+    """
+    ahead = ahead or workers * 2
+    segments = iter(segments)
+    executor = ThreadPoolExecutor(max_workers=workers)
+    try:
+        pending = deque(executor.submit(fetch, segment) for segment in itertools.islice(segments, ahead))
+        while pending:
+            body = pending.popleft().result()
+            for segment in itertools.islice(segments, 1):
+                pending.append(executor.submit(fetch, segment))
+            yield body
+    finally:
+        # Drop queued fetches if the caller stops early or a segment failed
+        executor.shutdown(wait=True, cancel_futures=True)
+
+
+class StreamDownloader:
+    """Save HLS playlists and DASH manifests as one file per track.
+
+    ``load`` reads the playlist or manifest and picks a rendition by
+    ``rendition`` ("highest" or "lowest") and ``max_bandwidth`` (bits/s),
+    loading an HLS variant's media playlist. ``save`` fetches the
+    rendition's segments ``workers`` at a time over the shared session and
+    appends them in order to one file, so only a few segments are in
+    memory at once. Playlists and each saved rendition draw once from the
+    ``limiter``'s CDN budget, like one file download, rather than once per
+    segment, which would hold a 100-segment reel to the bucket's rate;
+    only segment retries draw again, so throttling still backs them off.
+    Requests are counted in ``metrics`` (a ``RunMetrics``) when given.
+
+    A rendition that is one whole file (DASH ``SegmentBase``) is better
+    left to the caller's regular, resumable download path; ``whole_file``
+    returns its URL.
+    DASH audio, and HLS audio in an ``EXT-X-MEDIA`` group, comes as a
+    separate track; joining it into the video needs a muxer, so callers
+    save it next to the video.
+    """
+
+    def __init__(self, session, rendition="highest", max_bandwidth=None, workers=4, timeout=30,
+                 max_retries=3, limiter=None, metrics=None, chunk_size=1024 * 1024, fsync="none",
+                 writer=None, should_stop=None):
+        if rendition not in RENDITION_POLICIES:
+            raise ValueError(f"rendition must be one of {', '.join(RENDITION_POLICIES)}")
+        self.session = session
+        self.rendition = rendition
+        self.max_bandwidth = max_bandwidth
+        self.workers = workers
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.limiter = limiter
+        self.metrics = metrics
+        self.chunk_size = chunk_size
+        self.fsync = fsync
+        self.writer = writer
+        self.should_stop = should_stop or (lambda: False)
+
+    @staticmethod
+    def whole_file(rendition):
+        """The URL if the rendition is a single, unranged file, else None"""
+        if len(rendition.segments) == 1 and rendition.segments[0].byte_range is None:
+            url = rendition.segments[0].url
+            return None if is_stream_url(url) else url
+        return None
+
+    def fetch(self, url, byte_range=None, charge=True):
+        """Body of a playlist or segment, retried on errors and throttling.
+
+        With ``charge`` False the first attempt does not wait for the limiter.
+        """
+        headers = {"Range": f"bytes={byte_range[0]}-{byte_range[1]}"} if byte_range else None
+        error = None
+        for attempt in range(self.max_retries):
+            if self.should_stop():
+                raise IOError("stopped")
+            if attempt and self.metrics:
+                self.metrics.inc("retries", stage="stream")
+            if self.limiter and (charge or attempt):
+                self.limiter.acquire(RateLimiter.CDN)
+            try:
+                response = self.session.get(url, headers=headers, timeout=self.timeout)
+            except Exception as e:
+                error = str(e)
+                if attempt < self.max_retries - 1:
+                    time.sleep(2)
+                continue
+            if self.metrics:
+                self.metrics.inc("http_responses", kind=RateLimiter.CDN, status=response.status_code)
+            if self.limiter and self.limiter.observe(RateLimiter.CDN, response):
+                # The limiter holds the next attempt back until Retry-After passes
+                error = f"throttled (HTTP {response.status_code})"
+                continue
+            if response.status_code in (200, 206):
+                body = response.content
+                if self.metrics:
+                    self.metrics.inc("bytes_downloaded", len(body))
+                if byte_range and response.status_code == 200:
+                    # The server ignored the Range header
+                    body = body[byte_range[0]:byte_range[1] + 1]
+                return body
+            error = f"HTTP {response.status_code}"
+            if attempt < self.max_retries - 1:
+                time.sleep(2)
+        raise IOError(f"{error} for {url}")
+
+    def load(self, url, text=None):
+        """The ``Stream`` to save from the playlist or manifest at ``url`` (or its ``text``)"""
+        if text is None:
+            text = self.fetch(url).decode('utf-8', 'replace')
+        if text.lstrip().startswith('<'):
+            video, audio = parse_dash(text, url)
+            if not video:
+                raise StreamError("no video representation")
+            audio = select_rendition(audio, self.rendition) if audio else None
+            return Stream("dash", select_rendition(video, self.rendition, self.max_bandwidth), audio)
+
+        renditions = parse_hls(text, url)
+        if not renditions:
+            raise StreamError("empty playlist")
+        chosen = self._with_segments(select_rendition(renditions, self.rendition, self.max_bandwidth))
+        audio = None
+        group = parse_hls_audio(text, url).get(chosen.audio_group) if chosen.audio_group else None
+        if group:
+            audio = self._with_segments(group[0])
+        return Stream("hls", chosen, audio)
+
+    def _with_segments(self, rendition):
+        """The HLS rendition with the segments of its media playlist loaded"""
+        if rendition.segments is None:
+            media = parse_hls(self.fetch(rendition.url).decode('utf-8', 'replace'), rendition.url)
+            if media[0].segments is None:
+                raise StreamError("nested master playlists")
+            rendition = rendition._replace(segments=media[0].segments)
+        if not rendition.segments:
+            raise StreamError("no segments")
+        return rendition
+
+    def save(self, rendition, path, keep_going=None):
+        """Write the rendition's segments to ``path`` in order; returns ``(size, sha256 digest)``.
+
+        ``path`` is removed if a segment fails or ``keep_going()`` returns
+        False.
+        """
+        digest = hashlib.sha256()
+        size = 0
+        if self.limiter:
+            self.limiter.acquire(RateLimiter.CDN)
+        try:
+            with FileSink(path, 'wb', chunk_size=self.chunk_size, fsync=self.fsync, writer=self.writer) as sink:
+                for body in fetch_in_order(rendition.segments,
+                                           lambda s: self.fetch(s.url, s.byte_range, charge=False),
+                                           workers=self.workers):
+                    if keep_going and not keep_going():
+                        raise IOError("stopped")
+                    digest.update(body)
+                    sink.write(body)
+                    size += len(body)
+        except BaseException:
+            if os.path.exists(path):
+                os.remove(path)
+            raise
+        return size, digest
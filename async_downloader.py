@@ -0,0 +1,177 @@
+import asyncio
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from metrics import RunMetrics
+from rate_limiter import RateLimiter
+from write_path import FileSink, resume_plan
+
+try:
+    import aiohttp
+except ImportError:
+    aiohttp = None
+
+
+class AsyncDownloadEngine:
+    """Download videos on a single asyncio event loop.
+
+    The loop runs in a background thread and keeps one ``aiohttp`` session
+    for the whole run, so hundreds of transfers can be in flight without a
+    thread each. The connector caps connections in total and per host.
+    File opens, writes and renames run on ``disk_workers`` threads so a
+    slow disk never stalls the loop; each transfer waits for its own
+    write before reading on, which keeps one chunk per transfer in memory.
+    Transfers resume from ``.part`` files with a Range request, like
+    ``download_video``, and share its CDN budget when given ``limiter``.
+    ``submit`` is thread-safe and returns a ``concurrent.futures.Future``
+    resolving to True/False, mirroring the result of ``download_video``.
+    """
+
+    def __init__(self, output_dir, headers=None, max_in_flight=200, per_host_limit=8,
+                 max_retries=3, chunk_size=64 * 1024, should_stop=None, log=print, disk_workers=4,
+                 limiter=None, metrics=None, retry_delay=2):
+        if aiohttp is None:
+            raise RuntimeError("The asyncio download engine requires aiohttp (pip install aiohttp)")
+
+        self.output_dir = output_dir
+        self.headers = headers or {}
+        self.max_in_flight = max_in_flight
+        self.per_host_limit = per_host_limit
+        self.max_retries = max_retries
+        self.chunk_size = chunk_size
+        self.should_stop = should_stop or (lambda: False)
+        self.log = log
+        self.disk_workers = disk_workers
+        self.limiter = limiter or RateLimiter()
+        self.metrics = metrics or RunMetrics()
+        self.retry_delay = retry_delay
+
+        self.loop = None
+        self.thread = None
+        self.session = None
+        self.disk = None
+
+    def start(self):
+        """Start the event loop thread and open the shared session"""
+        self.loop = asyncio.new_event_loop()
+        self.disk = ThreadPoolExecutor(max_workers=self.disk_workers, thread_name_prefix="async-disk")
+        self.thread = threading.Thread(target=self.loop.run_forever, daemon=True)
+        self.thread.start()
+        asyncio.run_coroutine_threadsafe(self._open_session(), self.loop).result()
+        return self
+
+    def close(self):
+        """Close the session and stop the event loop"""
+        if not self.loop:
+            return
+        asyncio.run_coroutine_threadsafe(self.session.close(), self.loop).result()
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join()
+        self.loop.close()
+        self.loop = None
+        self.disk.shutdown()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    async def _open_session(self):
+        connector = aiohttp.TCPConnector(limit=self.max_in_flight, limit_per_host=self.per_host_limit)
+        timeout = aiohttp.ClientTimeout(total=None, sock_connect=30, sock_read=30)
+        self.session = aiohttp.ClientSession(connector=connector, timeout=timeout, headers=self.headers,
+                                             read_bufsize=self.chunk_size)
+
+    def on_disk(self, function, *args):
+        """Run a blocking file operation off the event loop"""
+        return self.loop.run_in_executor(self.disk, function, *args)
+
+    def submit(self, video_url, filename):
+        """Schedule a download from any thread"""
+        return asyncio.run_coroutine_threadsafe(self.download(video_url, filename), self.loop)
+
+    async def download(self, video_url, filename):
+        """Stream one video to disk with the same retry rules as ``download_video``.
+
+        A stop or a failed last attempt leaves the ``.part`` file for the
+        next run to resume.
+        """
+        filepath = os.path.join(self.output_dir, filename)
+        part_path = filepath + '.part'
+
+        for attempt in range(self.max_retries):
+            if self.should_stop():
+                return False
+            if attempt:
+                self.metrics.inc("retries", stage="download")
+            last = attempt == self.max_retries - 1
+            try:
+                offset = await self.on_disk(part_size, part_path)
+                headers = {'Range': f"bytes={offset}-"} if offset else None
+                # The bucket is shared with the download threads; wait without blocking the loop
+                await asyncio.sleep(self.limiter.reserve(RateLimiter.CDN))
+
+                async with self.session.get(video_url, headers=headers) as response:
+                    self.metrics.inc("http_responses", kind=RateLimiter.CDN, status=response.status)
+                    if self.limiter.observe_status(RateLimiter.CDN, response.status, response.headers):
+                        # The limiter holds the next request back until Retry-After passes
+                        self.log(f"🚦 CDN throttled {filename} (HTTP {response.status}), "
+                                 f"attempt {attempt + 1}/{self.max_retries}")
+                        continue
+
+                    plan = resume_plan(response.status, response.headers, offset)
+                    if plan.action == "complete":
+                        await self.on_disk(os.replace, part_path, filepath)
+                        self.log(f"✅ Downloaded: {filename}")
+                        return True
+                    if plan.action == "restart":
+                        await self.on_disk(os.remove, part_path)
+                        continue
+                    if plan.action == "retry":
+                        self.log(f"⚠️ Download failed (HTTP {response.status}), "
+                                 f"attempt {attempt + 1}/{self.max_retries}")
+                        if not last:
+                            await asyncio.sleep(self.retry_delay)
+                        continue
+                    if plan.action == "write":
+                        offset = 0
+
+                    sink = await self.on_disk(FileSink, part_path, 'ab' if plan.action == "append" else 'wb',
+                                              self.chunk_size, plan.total)
+                    try:
+                        async for chunk in response.content.iter_chunked(self.chunk_size):
+                            if self.should_stop():
+                                break
+                            await self.on_disk(sink.write, chunk)
+                            sink.written += len(chunk)
+                    finally:
+                        self.metrics.inc("bytes_downloaded", sink.written)
+                        await self.on_disk(sink.close)
+
+                if self.should_stop():
+                    # Keep the .part file so the next run can resume it
+                    return False
+
+                size = offset + sink.written
+                if plan.total is not None and size != plan.total:
+                    raise IOError(f"incomplete download: {size}/{plan.total} bytes")
+
+                await self.on_disk(os.replace, part_path, filepath)
+                self.log(f"✅ Downloaded: {filename}")
+                return True
+
+            except Exception as e:
+                if last:
+                    self.log(f"❌ Failed to download {filename}: {str(e)}")
+                else:
+                    self.log(f"⚠️ Retry {attempt + 1}/{self.max_retries}")
+                    await asyncio.sleep(self.retry_delay)
+
+        return False
+
+
+def part_size(path):
+    """Bytes an earlier attempt left in ``path``, 0 if there is none"""
+    return os.path.getsize(path) if os.path.exists(path) else 0
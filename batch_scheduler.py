@@ -0,0 +1,326 @@
+import argparse
+import getpass
+import json
+import os
+import time
+from collections import deque
+from datetime import datetime
+from itertools import islice
+
+from instagram_scraper_gui import InstagramReelDownloader
+from metrics import RunMetrics
+
+
+def read_profiles(path):
+    """Profiles from a text file: one per line, '#' starts a comment"""
+    profiles = []
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            profile = line.split('#', 1)[0].strip().lstrip('@')
+            if profile and profile not in profiles:
+                profiles.append(profile)
+    return profiles
+
+
+class ProfileBatchScheduler:
+    """Download reels from many profiles with one login and shared pools.
+
+    One browser logs in once. Profiles are listed and resolved in
+    round-robin slices of ``slice_size`` reels per profile, so a huge
+    profile cannot starve the others, and downloads start with the first
+    slice and all go through a single pool of ``max_workers`` threads.
+    A listing that falls back to scrolling keeps the browser on the
+    profile grid, so it is finished in the turn it starts. Each profile gets its
+    own output directory under ``output_dir``; the combined summary is
+    written to ``batch_summary.json`` there, next to the ``run_report.json``
+    metrics. Metrics accumulate over every run of a ``watch``, and
+    ``metrics_port`` serves them to Prometheus for as long as it lasts.
+
+    Exposes the same ``run``/``stop_download``/``pause_download``/
+    ``resume_download`` interface as ``InstagramReelDownloader``, plus
+    ``watch`` to re-check the profiles on an interval.
+    """
+
+    def __init__(self, profiles, username=None, password=None, video_limit=None,
+                 max_workers=5, output_dir=None, progress_callback=None, slice_size=6,
+                 metrics_port=None, **options):
+        if not output_dir and (options.get('resume') or options.get('incremental')):
+            output_dir = "batch_reels"
+        elif not output_dir:
+            current_time = datetime.now().strftime("%Y-%m-%d_%H%M%S")
+            output_dir = f"batch_reels_{current_time}"
+        self.profiles = profiles
+        self.output_dir = output_dir
+        self.slice_size = slice_size
+        self.stop_requested = False
+        self.watching = False
+        self.metrics_port = metrics_port
+        self.metrics = RunMetrics()
+        self.metrics.add_collector(lambda metrics: self.lead.collect_metrics(metrics))
+        self.settings = dict(username=username, password=password, video_limit=video_limit,
+                             max_workers=max_workers, progress_callback=progress_callback,
+                             **options)
+        self.build()
+
+    def build(self):
+        """Create fresh downloaders (and counters) for the next run.
+
+        Only the lead creates a session, resolvers, budgets, writer and
+        stores; the per-profile downloaders are built on top of its.
+        """
+        settings = self.settings
+        self.lead = InstagramReelDownloader(
+            output_dir=self.output_dir, metrics=self.metrics, metrics_port=self.metrics_port,
+            **{key: value for key, value in settings.items() if key != 'resume'})
+        self.downloaders = []
+        for profile in self.profiles:
+            downloader = InstagramReelDownloader(
+                target_profile=profile, output_dir=os.path.join(self.output_dir, profile),
+                shared=self.lead, **settings)
+            self.downloaders.append(downloader)
+
+    def log_message(self, message):
+        self.lead.log_message(message)
+
+    def _all(self):
+        return [self.lead] + self.downloaders
+
+    def stop_download(self):
+        self.stop_requested = True
+        for downloader in self._all():
+            downloader.stop_requested = True
+        self.log_message("🛑 Stop requested...")
+
+    def pause_download(self):
+        for downloader in self._all():
+            downloader.paused = True
+        self.log_message("⏸️ Download paused")
+
+    def resume_download(self):
+        for downloader in self._all():
+            downloader.paused = False
+        self.log_message("▶️ Download resumed")
+
+    def next_slice(self, driver, downloader, listing, buffered):
+        """Up to ``slice_size`` more links; returns ``(links, listing, buffered)``.
+
+        ``listing`` comes back None once it is exhausted. A scrolled listing
+        is drained into ``buffered`` at once, before anything else moves
+        the browser off the profile grid.
+        """
+        links, buffered = buffered[:self.slice_size], buffered[self.slice_size:]
+        if listing and len(links) < self.slice_size:
+            wanted = self.slice_size - len(links)
+            fresh = list(islice(listing, wanted))
+            links += fresh
+            if len(fresh) < wanted:
+                listing = None
+            elif downloader.listing_source == "scroll":
+                buffered = list(listing)
+                listing = None
+        return links, listing, buffered
+
+    def resolve_round_robin(self, driver, collected):
+        """Yield ``(owner, idx, reel_url, video_url)``, listing and resolving a slice per profile per turn.
+
+        Every profile's links are added to ``collected`` as they are listed.
+        """
+        turns = deque((downloader, downloader.iter_listing(driver), [], 1)
+                      for downloader in self.downloaders)
+        while turns and not self.lead.stop_requested:
+            downloader, listing, buffered, next_idx = turns.popleft()
+            with self.metrics.time("collect"):
+                links, listing, buffered = self.next_slice(driver, downloader, listing, buffered)
+            collected[downloader.target_profile].extend(links)
+            self.metrics.inc("reels_found", len(links))
+            self.found += len(links)
+            for idx, reel_url, video_url in downloader.resolve_video_urls(
+                    driver, downloader.skip_finished(links), start_idx=next_idx):
+                yield downloader, idx, reel_url, video_url
+            if listing or buffered:
+                turns.append((downloader, listing, buffered, next_idx + len(links)))
+
+    def run(self):
+        """Log in once, then list, resolve and download every profile fairly"""
+        start_time = time.time()
+        lead = self.lead
+        driver = None
+        lead.serve_metrics()
+
+        try:
+            driver = lead.setup_driver()
+            with self.metrics.time("login"):
+                logged_in = lead.instagram_login(driver)
+            if not logged_in:
+                return False
+
+            if lead.browser_workers > 1:
+                lead.browser_pool = lead.create_browser_pool().start()
+            for downloader in self.downloaders:
+                downloader.browser_pool = lead.browser_pool
+
+            collected = {downloader.target_profile: [] for downloader in self.downloaders}
+            self.found = 0
+            self.log_message(f"📱 Listing and downloading {len(self.downloaders)} profiles")
+            lead.run_pipeline(self.resolve_round_robin(driver, collected), lambda: self.found)
+            for downloader in self.downloaders:
+                downloader.update_watch_state(collected[downloader.target_profile])
+
+            elapsed_time = time.time() - start_time
+            summary = {'profiles': {}, 'elapsed_seconds': round(elapsed_time, 2)}
+            self.log_message(f"\n=== 📑 Batch Summary ===")
+            for downloader in self.downloaders:
+                profile = downloader.target_profile
+                summary['profiles'][profile] = {
+                    'found': len(collected[profile]),
+                    'skipped': downloader.skipped,
+                    'downloaded': downloader.total_downloaded,
+                    'failed': len(downloader.failed_downloads),
+                    'deduplicated': downloader.deduplicated,
+                    'output_dir': os.path.abspath(downloader.output_dir),
+                }
+                self.log_message(f"👤 {profile}: ✅ {downloader.total_downloaded} "
+                                 f"❌ {len(downloader.failed_downloads)} ⏭️ {downloader.skipped}")
+            summary['downloaded'] = sum(p['downloaded'] for p in summary['profiles'].values())
+            summary['failed'] = sum(p['failed'] for p in summary['profiles'].values())
+            self.log_message(f"✅ Successfully downloaded: {summary['downloaded']}")
+            self.log_message(f"❌ Failed downloads: {summary['failed']}")
+            self.log_message(f"⏱️ Time taken: {elapsed_time:.2f} seconds")
+            for kind, seconds, events, requests_made, rate in lead.limiter.report():
+                if requests_made:
+                    self.log_message(f"🚦 {kind}: {requests_made} requests, held back {seconds:.1f}s, "
+                                     f"throttled {events}x, rate now {rate:.2f}/s")
+            requests_made, connections, reused = lead.transport_stats.report()
+            if requests_made:
+                self.log_message(f"🔌 HTTP: {requests_made} requests over {connections} connections "
+                                 f"({reused:.0%} reused)")
+            lead.log_stage_timings()
+
+            with open(os.path.join(self.output_dir, 'batch_summary.json'), 'w') as f:
+                json.dump(summary, f, indent=2)
+            self.log_message(f"📁 Files saved in: {os.path.abspath(self.output_dir)}")
+            return True
+
+        except Exception as e:
+            self.log_message(f"❌ An error occurred: {str(e)}")
+            return False
+        finally:
+            if lead.browser_pool:
+                lead.browser_pool.close()
+                lead.browser_pool = None
+            if driver:
+                driver.quit()
+            for downloader in self.downloaders:
+                if downloader.manifest:
+                    downloader.manifest.close()
+            if lead.content_store:
+                lead.content_store.close()
+            if lead.writer:
+                lead.writer.close()
+            report_path = lead.publish_metrics()
+            if report_path:
+                self.log_message(f"📊 Run report: {os.path.abspath(report_path)}")
+            if not self.watching:
+                self.metrics.close()
+
+    def watch(self, interval):
+        """Run the batch, then again every ``interval`` seconds until stopped.
+
+        Meant for incremental mode, where a check of a profile with nothing
+        new stops after the first screen of reels.
+        """
+        self.watching = True
+        try:
+            while True:
+                self.run()
+                if self.stop_requested:
+                    return True
+                self.log_message(f"👀 Next check in {interval / 60:.0f} min")
+                deadline = time.monotonic() + interval
+                while not self.stop_requested and time.monotonic() < deadline:
+                    time.sleep(1)
+                if self.stop_requested:
+                    return True
+                self.build()
+        finally:
+            self.watching = False
+            self.metrics.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Download reels from several Instagram profiles in one run")
+    parser.add_argument("profiles", nargs="*", help="profile usernames")
+    parser.add_argument("--profiles-file", help="text file with one profile per line")
+    parser.add_argument("--username", required=True, help="Instagram username to log in with")
+    parser.add_argument("--password", help="Instagram password (prompted if omitted)")
+    parser.add_argument("--video-limit", type=int, help="maximum reels per profile")
+    parser.add_argument("--max-workers", type=int, default=5, help="parallel downloads")
+    parser.add_argument("--browser-workers", type=int, default=1, help="browsers resolving video URLs")
+    parser.add_argument("--output-dir", help="root folder for per-profile folders")
+    parser.add_argument("--resume", action="store_true", help="skip reels already downloaded")
+    parser.add_argument("--incremental", action="store_true",
+                        help="only fetch reels posted since the last run")
+    parser.add_argument("--store", metavar="DIR",
+                        help="keep one copy of each video in a shared store and hard-link it into the profile folders")
+    parser.add_argument("--background-writes", action="store_true",
+                        help="write files from a dedicated thread so downloads never wait on the disk")
+    parser.add_argument("--fsync", choices=("none", "close", "chunk"), default="none",
+                        help="when to force downloaded data to disk")
+    parser.add_argument("--full-pages", action="store_true",
+                        help="let reel pages load images, fonts, styles and trackers")
+    parser.add_argument("--page-load", choices=("normal", "eager", "none"), default="eager",
+                        help="when driver.get returns: full load, DOM ready, or immediately")
+    parser.add_argument("--headless", action="store_true", help="run Chrome without a window")
+    parser.add_argument("--rendition", choices=("highest", "lowest"), default="highest",
+                        help="quality to take from HLS/DASH streams and multi-version listings")
+    parser.add_argument("--max-bandwidth", type=int, metavar="KBPS",
+                        help="best stream rendition within this bitrate (kbit/s)")
+    parser.add_argument("--scroll", action="store_true",
+                        help="list reels by scrolling the profile instead of through the JSON feed")
+    parser.add_argument("--no-network-capture", action="store_true",
+                        help="find video URLs in the page data instead of the browser's network events")
+    parser.add_argument("--metrics-file", metavar="PATH",
+                        help="also write the metrics in Prometheus text format (for a textfile collector)")
+    parser.add_argument("--metrics-port", type=int, metavar="PORT",
+                        help="serve Prometheus metrics on http://127.0.0.1:PORT/metrics while running")
+    parser.add_argument("--watch", type=float, metavar="MINUTES",
+                        help="keep running, re-checking the profiles every MINUTES (implies --incremental)")
+    args = parser.parse_args()
+
+    profiles = list(args.profiles)
+    if args.profiles_file:
+        profiles += [p for p in read_profiles(args.profiles_file) if p not in profiles]
+    if not profiles:
+        parser.error("no profiles given")
+
+    scheduler = ProfileBatchScheduler(
+        profiles,
+        username=args.username,
+        password=args.password or getpass.getpass("Instagram password: "),
+        video_limit=args.video_limit,
+        max_workers=args.max_workers,
+        output_dir=args.output_dir,
+        browser_workers=args.browser_workers,
+        resume=args.resume,
+        incremental=args.incremental or bool(args.watch),
+        store_dir=args.store,
+        background_writes=args.background_writes,
+        fsync_policy=args.fsync,
+        block_resources=not args.full_pages,
+        page_load_strategy=args.page_load,
+        headless=args.headless,
+        network_capture=not args.no_network_capture,
+        feed_listing=not args.scroll,
+        rendition=args.rendition,
+        max_bandwidth=args.max_bandwidth * 1000 if args.max_bandwidth else None,
+        metrics_path=args.metrics_file,
+        metrics_port=args.metrics_port,
+    )
+    if args.watch:
+        scheduler.watch(args.watch * 60)
+    else:
+        scheduler.run()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,139 @@
+"""Compare the thread and asyncio download engines against a local server.
+
+    python benchmarks/bench_download_engines.py --files 200 --size 1000000 --latency 0.2
+
+Each engine downloads the same set of files through the CLI downloader's
+``download_batch``. Results are printed as JSON: wall time, throughput,
+peak traced Python memory and peak client thread count.
+"""
+import argparse
+import importlib.util
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+def load_cli():
+    spec = importlib.util.spec_from_file_location(
+        "instagram_scraper_cli", os.path.join(ROOT, "Instagram Scraper Python.py"))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def start_server(size, latency):
+    body = os.urandom(size)
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, *args):
+            pass
+
+        def do_GET(self):
+            time.sleep(latency)
+            self.send_response(200)
+            self.send_header("Content-Type", "video/mp4")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def run_engine(cli, engine, urls, workers, connections):
+    downloader = cli.InstagramReelDownloader(target_profile=f"bench_{engine}", max_workers=workers,
+                                             download_engine=engine, async_connections=connections)
+    # Both engines draw on the same CDN budget; measure the engines, not the budget
+    for bucket in downloader.limiter.buckets.values():
+        bucket.rate = bucket.max_rate = 1e6
+        bucket.burst = len(urls)
+    if engine == "asyncio":
+        # Built the way run() builds it
+        downloader.async_engine = downloader.create_async_engine().start()
+
+    def client_threads():
+        # The local server spawns a thread per request; leave those out
+        return sum(1 for thread in threading.enumerate() if "process_request" not in thread.name)
+
+    peak_threads = client_threads()
+    done = threading.Event()
+
+    def watch_threads():
+        nonlocal peak_threads
+        while not done.is_set():
+            peak_threads = max(peak_threads, client_threads())
+            time.sleep(0.01)
+
+    watcher = threading.Thread(target=watch_threads, daemon=True)
+    watcher.start()
+    tracemalloc.start()
+    start = time.perf_counter()
+
+    batch = list(enumerate(urls, 1))
+    if engine == "asyncio":
+        successful, failed = downloader.download_batch_async(batch, wait=True)
+    else:
+        successful, failed = downloader.download_batch(batch)
+
+    elapsed = time.perf_counter() - start
+    _, peak_memory = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    done.set()
+    watcher.join()
+    if downloader.async_engine:
+        downloader.async_engine.close()
+
+    total_bytes = sum(os.path.getsize(os.path.join(downloader.output_dir, name))
+                      for name in os.listdir(downloader.output_dir))
+    return {
+        "engine": engine,
+        "workers": workers if engine == "threads" else connections,
+        "successful": successful,
+        "failed": failed,
+        "seconds": round(elapsed, 3),
+        "files_per_sec": round(successful / elapsed, 2),
+        "mb_per_sec": round(total_bytes / elapsed / 1e6, 2),
+        "peak_python_mb": round(peak_memory / 1e6, 2),
+        "peak_threads": peak_threads,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--files", type=int, default=200)
+    parser.add_argument("--size", type=int, default=1_000_000, help="bytes per file")
+    parser.add_argument("--latency", type=float, default=0.2, help="server delay per request (s)")
+    parser.add_argument("--workers", type=int, default=20, help="threads for the thread engine")
+    parser.add_argument("--connections", type=int, default=100,
+                        help="async_connections for the asyncio engine (the CLI default is 100)")
+    args = parser.parse_args()
+
+    server = start_server(args.size, args.latency)
+    urls = [f"http://127.0.0.1:{server.server_port}/video/{n}.mp4" for n in range(args.files)]
+
+    os.chdir(tempfile.mkdtemp(prefix="bench_engines_"))
+    sys.stdout = open(os.devnull, "w")
+    cli = load_cli()
+    results = [run_engine(cli, "threads", urls, args.workers, args.connections),
+               run_engine(cli, "asyncio", urls, args.workers, args.connections)]
+    sys.stdout = sys.__stdout__
+
+    server.shutdown()
+    print(json.dumps({"files": args.files, "size": args.size, "latency": args.latency,
+                      "results": results}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
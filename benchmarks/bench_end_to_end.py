@@ -0,0 +1,159 @@
+"""Run both downloaders end to end against the offline Instagram stand-in.
+
+    python benchmarks/bench_end_to_end.py --reels 60 --video-size 2000000 --latency 0.02
+
+The stand-in server (see ``offline_instagram.py``) runs in its own
+process, and each script's ``InstagramReelDownloader.run()`` runs in a
+fresh child process with a ``FakeDriver``, so peak RSS belongs to that
+script alone. Results are printed as JSON: reels/sec, MB/s, peak RSS and
+the downloader's own per-stage latency summary (``RunMetrics``; stage
+totals are summed over threads, so they can exceed wall time) and wait
+report.
+"""
+import argparse
+import importlib.util
+import json
+import multiprocessing
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+from offline_instagram import attach, serve_forever
+
+PROFILE = "bench.profile"
+
+
+def load_script(script):
+    if script == "gui":
+        import instagram_scraper_gui
+        return instagram_scraper_gui
+    spec = importlib.util.spec_from_file_location(
+        "instagram_scraper_cli", os.path.join(ROOT, "Instagram Scraper Python.py"))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def run_child(args):
+    """Run one script against the server on ``args.port``; prints one JSON line"""
+    os.chdir(tempfile.mkdtemp(prefix=f"bench_e2e_{args.child}_"))
+    module = load_script(args.child)
+    stdout = sys.stdout
+    sys.stdout = open(os.devnull, "w")
+
+    options = dict(username="bench", password="bench", target_profile=PROFILE,
+                   video_limit=args.reels, max_workers=args.workers,
+                   browser_workers=args.browser_workers, fast_resolve=not args.no_fast_resolve,
+                   reuse_session=False, block_resources=not args.full_pages,
+                   network_capture=not args.no_network_capture, feed_listing=not args.scroll,
+                   rendition=args.rendition)
+    downloader = attach(module.InstagramReelDownloader(**options), f"http://127.0.0.1:{args.port}")
+    downloader.log_message = lambda message: None
+    if not args.rate_limits:
+        # The stand-in only throttles when asked to; measure the code, not the budget
+        for bucket in downloader.limiter.buckets.values():
+            bucket.rate = bucket.max_rate = 1e6
+            bucket.burst = 1000
+
+    start = time.perf_counter()
+    downloader.run()
+    elapsed = time.perf_counter() - start
+    sys.stdout = stdout
+
+    files = [name for name in os.listdir(downloader.output_dir) if name.endswith(".mp4")]
+    total_bytes = sum(os.path.getsize(os.path.join(downloader.output_dir, name)) for name in files)
+    report = downloader.metrics.report()
+    counters = {}
+    for row in report["counters"]:
+        counters[row["name"]] = counters.get(row["name"], 0) + row["value"]
+    scrolls = sum(row["value"] for row in report["counters"]
+                  if row["name"] == "navigations" and row["labels"].get("page") == "scroll")
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024 if resource else None
+    print(json.dumps({
+        "script": args.child,
+        "reels": len(files),
+        "seconds": round(elapsed, 3),
+        "reels_per_sec": round(len(files) / elapsed, 2),
+        "mb_per_sec": round(total_bytes / elapsed / 1e6, 2),
+        "peak_rss_mb": round(peak_rss, 1) if peak_rss else None,
+        "stages": report["stages"],
+        "listing": {"feed_pages": counters.get("feed_pages", 0), "scrolls": scrolls,
+                    "listed_video_urls": counters.get("listed_video_urls", 0)},
+        "blocked_requests": counters.get("blocked_requests", 0),
+        "resolved_by": {row["labels"]["source"]: row["value"]
+                        for row in report["counters"] if row["name"] == "resolved_by"},
+        "streams": {row["labels"]["kind"]: row["value"]
+                    for row in report["counters"] if row["name"] == "streams"},
+        "waits": {site: {"seconds": round(seconds, 3), "calls": count}
+                  for site, seconds, count in downloader.waits.report()},
+    }))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--reels", type=int, default=60, help="reels on the profile (all are downloaded)")
+    parser.add_argument("--video-size", type=int, default=2_000_000, help="bytes per video")
+    parser.add_argument("--latency", type=float, default=0.02, help="server delay per request (s)")
+    parser.add_argument("--bandwidth", type=int, default=0, help="bytes/sec per video stream, 0 = unlimited")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="share of reel/mp4 requests failing with 500")
+    parser.add_argument("--throttle-rate", type=float, default=0.0, help="share answered with 429")
+    parser.add_argument("--workers", type=int, default=5)
+    parser.add_argument("--browser-workers", type=int, default=1)
+    parser.add_argument("--no-fast-resolve", action="store_true", help="resolve every reel in the browser")
+    parser.add_argument("--full-pages", action="store_true", help="do not block page subresources")
+    parser.add_argument("--scroll", action="store_true", help="list reels by scrolling, not the JSON feed")
+    parser.add_argument("--feed-down", action="store_true",
+                        help="the stand-in answers the JSON feed with 404 (tests the scroll fallback)")
+    parser.add_argument("--no-network-capture", action="store_true",
+                        help="find video URLs in the page, not the network log")
+    parser.add_argument("--stream", choices=["hls", "dash"],
+                        help="reel pages point at HLS/DASH streams instead of mp4s")
+    parser.add_argument("--rendition", choices=["highest", "lowest"], default="highest",
+                        help="which stream rendition (or feed video version) to download")
+    parser.add_argument("--rate-limits", action="store_true", help="keep the default request budgets")
+    parser.add_argument("--scripts", nargs="+", default=["gui", "cli"], choices=["gui", "cli"])
+    parser.add_argument("--child", choices=["gui", "cli"], help=argparse.SUPPRESS)
+    parser.add_argument("--port", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        return run_child(args)
+
+    port_queue = multiprocessing.Queue()
+    server = multiprocessing.Process(target=serve_forever, args=(port_queue,), kwargs=dict(
+        reels=args.reels, video_size=args.video_size, latency=args.latency,
+        bandwidth=args.bandwidth, error_rate=args.error_rate,
+        throttle_rate=args.throttle_rate, feed=not args.feed_down, stream=args.stream), daemon=True)
+    server.start()
+    port = port_queue.get()
+
+    results = []
+    for script in args.scripts:
+        command = [sys.executable, os.path.abspath(__file__), "--child", script, "--port", str(port),
+                   "--reels", str(args.reels), "--workers", str(args.workers),
+                   "--browser-workers", str(args.browser_workers)]
+        command += ["--no-fast-resolve"] * args.no_fast_resolve + ["--rate-limits"] * args.rate_limits
+        command += ["--full-pages"] * args.full_pages + ["--no-network-capture"] * args.no_network_capture
+        command += ["--scroll"] * args.scroll + ["--rendition", args.rendition]
+        output = subprocess.run(command, capture_output=True, text=True, check=True).stdout
+        results.append(json.loads(output.strip().splitlines()[-1]))
+    server.terminate()
+
+    print(json.dumps({"reels": args.reels, "video_size": args.video_size, "latency": args.latency,
+                      "bandwidth": args.bandwidth, "error_rate": args.error_rate,
+                      "throttle_rate": args.throttle_rate, "stream": args.stream,
+                      "rendition": args.rendition, "results": results}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
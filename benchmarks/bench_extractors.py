@@ -0,0 +1,130 @@
+"""Time each video URL extractor against a corpus of reel pages.
+
+    python benchmarks/bench_extractors.py [--corpus DIR | --synthetic] [--repeat 20]
+
+Pages are every ``*.html`` file in ``--corpus``, by default the saved reel
+pages in ``tests/fixtures/reels`` (the tests check the URL each one
+yields). ``--synthetic`` generates multi-megabyte pages instead, shaped
+like the same layouts with the video near the end, to measure scans over
+pages of real size. The legacy ``re.findall`` scan is measured alongside
+for comparison. Results are printed as JSON: mean time and allocated
+bytes per page, plus hit counts.
+"""
+import argparse
+import glob
+import json
+import os
+import random
+import re
+import string
+import sys
+import time
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CORPUS = os.path.join(ROOT, "tests", "fixtures", "reels")
+sys.path.insert(0, ROOT)
+
+from extractors import ExtractorChain
+
+LEGACY_PATTERNS = [
+    r'https://[^"]+\.mp4[^"]*',
+    r'https://[^"]+\.m3u8[^"]*',
+    r'"video_url":"([^"]+)"'
+]
+
+
+def legacy_find(page_source):
+    # The pattern scan extract_video_url used before the extractor chain
+    for pattern in LEGACY_PATTERNS:
+        matches = re.findall(pattern, page_source)
+        if matches:
+            url = matches[0]
+            if isinstance(url, tuple):
+                url = url[0]
+            return url.replace('\\u0026', '&')
+    return None
+
+
+def filler(size, rng):
+    chunk = ''.join(rng.choice(string.ascii_letters + ' <>/="') for _ in range(4096))
+    return (chunk * (size // len(chunk) + 1))[:size]
+
+
+def synthetic_corpus(page_size=2_000_000, seed=1):
+    rng = random.Random(seed)
+    cdn = "https://scontent.cdninstagram.com/v/t50.2886-16/{}_n.mp4?efg=abc&oh=00_{}&oe=66AA"
+    cdn_json = cdn.replace('/', '\\/').replace('&', '\\u0026')
+    pages = {
+        "json_ld": '<script type="application/ld+json">{}</script>'.format(
+            json.dumps({"@type": "VideoObject", "video": {"contentUrl": cdn.format(1, 'a')}})),
+        "embedded_json": '<script>{{"items":[{{"video_versions":[{{"type":101,"url":"{}"}}]}}]}}</script>'.format(
+            cdn_json.format(2, 'b')),
+        "video_url_json": '<script>{{"video_url":"{}"}}</script>'.format(cdn_json.format(3, 'c')),
+        "video_tag": '<video src="{}"></video>'.format(cdn.format(4, 'd').replace('&', '&amp;')),
+        "hls_only": '<source src="https://scontent.cdninstagram.com/hls/{}/master.m3u8">'.format(5),
+        "no_video": '',
+    }
+    corpus = {}
+    for name, marker in pages.items():
+        # Put the interesting part near the end, as in real pages
+        corpus[name] = filler(page_size, rng) + marker + filler(page_size // 10, rng)
+    return corpus
+
+
+def load_corpus(directory):
+    corpus = {}
+    for path in sorted(glob.glob(os.path.join(directory, '*.html'))):
+        with open(path, encoding='utf-8', errors='replace') as f:
+            corpus[os.path.basename(path)] = f.read()
+    return corpus
+
+
+def measure(find, pages, repeat):
+    hits = sum(1 for page in pages if find(page))
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for page in pages:
+            find(page)
+    elapsed = time.perf_counter() - start
+
+    tracemalloc.start()
+    for page in pages:
+        find(page)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    runs = repeat * len(pages)
+    return {
+        "ms_per_page": round(elapsed / runs * 1000, 3),
+        "peak_alloc_kb_per_page": round(peak / 1024, 1),
+        "hits": hits,
+        "pages": len(pages),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    source = parser.add_mutually_exclusive_group()
+    source.add_argument("--corpus", default=CORPUS, help="directory of saved reel pages (*.html)")
+    source.add_argument("--synthetic", action="store_true", help="generate multi-MB pages instead")
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    corpus = synthetic_corpus() if args.synthetic else load_corpus(args.corpus)
+    if not corpus:
+        sys.exit(f"No *.html pages found in {args.corpus}")
+    pages = list(corpus.values())
+
+    chain = ExtractorChain.default()
+    results = {"legacy_findall": measure(legacy_find, pages, args.repeat),
+               "chain": measure(chain.extract, pages, args.repeat)}
+    for extractor in ExtractorChain.default().extractors:
+        results[extractor.name] = measure(extractor.extract, pages, args.repeat)
+
+    print(json.dumps({"corpus": "synthetic" if args.synthetic else args.corpus, "pages": len(pages),
+                      "results": results, "hit_rates": chain.stats()}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
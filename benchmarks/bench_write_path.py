@@ -0,0 +1,124 @@
+"""Compare the old 8 KiB write loop with the tuned write path against a local server.
+
+    python benchmarks/bench_write_path.py --files 20 --size 50000000 --workers 4
+
+The server runs in a separate process, so CPU time is the downloader's
+own. Each configuration downloads the same files with the GUI
+downloader's ``download_video``; the baseline replays the previous loop
+(``iter_content(8192)`` straight into the file). Results are printed as
+JSON: MB/s and CPU seconds per GB.
+"""
+import argparse
+import hashlib
+import json
+import multiprocessing
+import os
+import shutil
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+def serve(size, port_queue):
+    body = os.urandom(size)
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, *args):
+            pass
+
+        def do_GET(self):
+            self.send_response(200)
+            self.send_header("Content-Type", "video/mp4")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    server.daemon_threads = True
+    port_queue.put(server.server_port)
+    server.serve_forever()
+
+
+def baseline_download(downloader, video_url, filename):
+    """The write loop ``download_video`` used before the tuned path"""
+    filepath = os.path.join(downloader.output_dir, filename)
+    digest = hashlib.sha256()
+    with downloader.session.get(video_url, stream=True, timeout=30) as response:
+        with open(filepath + '.part', 'wb') as f:
+            for chunk in response.iter_content(chunk_size=8192):
+                if chunk:
+                    f.write(chunk)
+                    digest.update(chunk)
+    os.replace(filepath + '.part', filepath)
+    return True
+
+
+def run(name, urls, workers, baseline=False, **options):
+    from instagram_scraper_gui import InstagramReelDownloader
+
+    output_dir = tempfile.mkdtemp(prefix=f"bench_write_{name}_")
+    downloader = InstagramReelDownloader(target_profile="bench", output_dir=output_dir,
+                                         max_workers=workers, **options)
+    downloader.log_message = lambda message: None
+    # Measure the write path, not the request budget
+    downloader.limiter.buckets["cdn"].rate = 1e6
+    downloader.limiter.buckets["cdn"].burst = len(urls)
+    fetch = (lambda url, name: baseline_download(downloader, url, name)) if baseline \
+        else downloader.download_video
+
+    cpu = time.process_time()
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        results = list(executor.map(fetch, urls, [f"reel_{n:03d}.mp4" for n in range(len(urls))]))
+    elapsed = time.perf_counter() - start
+    cpu = time.process_time() - cpu
+    if downloader.writer:
+        downloader.writer.close()
+
+    total_bytes = sum(os.path.getsize(os.path.join(output_dir, name)) for name in os.listdir(output_dir))
+    shutil.rmtree(output_dir, ignore_errors=True)
+    return {
+        "config": name,
+        "successful": sum(results),
+        "seconds": round(elapsed, 3),
+        "mb_per_sec": round(total_bytes / elapsed / 1e6, 1),
+        "cpu_sec_per_gb": round(cpu / (total_bytes / 1e9), 2) if total_bytes else None,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--files", type=int, default=20)
+    parser.add_argument("--size", type=int, default=50_000_000, help="bytes per file")
+    parser.add_argument("--workers", type=int, default=4)
+    args = parser.parse_args()
+
+    port_queue = multiprocessing.Queue()
+    server = multiprocessing.Process(target=serve, args=(args.size, port_queue), daemon=True)
+    server.start()
+    port = port_queue.get()
+    urls = [f"http://127.0.0.1:{port}/video/{n}.mp4" for n in range(args.files)]
+
+    configs = [
+        ("baseline_8k", dict(baseline=True)),
+        ("chunk_64k", dict(chunk_size=64 * 1024)),
+        ("chunk_1m", dict(chunk_size=1024 * 1024)),
+        ("chunk_1m_background", dict(chunk_size=1024 * 1024, background_writes=True)),
+        ("chunk_1m_fsync_close", dict(chunk_size=1024 * 1024, fsync_policy="close")),
+    ]
+    results = [run(name, urls, args.workers, **options) for name, options in configs]
+
+    server.terminate()
+    print(json.dumps({"files": args.files, "size": args.size, "workers": args.workers,
+                      "results": results}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
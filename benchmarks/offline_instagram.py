@@ -0,0 +1,513 @@
+"""A local stand-in for Instagram and a fake WebDriver that browses it.
+
+The server answers the paths the downloaders use (login, session check,
+profile ``/reels/`` grid with endless scroll, the cursor-paginated JSON
+reel feed, reel pages, the JSON reel endpoint and mp4 bodies, or HLS/DASH
+streams in three renditions) with configurable latency, bandwidth and error
+rates. ``FakeDriver`` implements the WebDriver calls the code makes
+(``get``, ``find_element(s)``, ``execute_script``, ``page_source``,
+``current_url``, cookies, the DevTools blocklist and performance log) on
+top of plain HTTP. Like Chrome, it fetches a reel page's stylesheet,
+images and video unless they are blocked, and records the network events
+(page status, media request and response or block) in the performance
+log; the page's ``<video>`` only has a ``blob:`` source, as on Instagram,
+so the video URL is in the page data and on the wire. ``attach`` points a downloader at both, so ``run()``
+works end to end without Chrome or the network.
+"""
+import fnmatch
+import json
+import os
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from selenium.common.exceptions import NoSuchElementException
+from selenium.webdriver.common.by import By
+from selenium.webdriver.common.keys import Keys
+
+from link_harvester import NEW_REEL_HREFS_SCRIPT
+from popups import DISMISS_POPUP_SCRIPT
+from waits import VIDEO_SRC_SCRIPT, REEL_ANCHOR_COUNT_SCRIPT, SCROLL_HEIGHT_SCRIPT
+
+INSTAGRAM = "https://www.instagram.com"
+GRID_PAGE = 12
+SUBRESOURCE_SIZE = 50_000
+SESSION_COOKIE = "bench-session"
+# (bandwidth, width, height) of each stream rendition; segment sizes scale with bandwidth
+STREAM_RENDITIONS = ((400_000, 360, 640), (1_200_000, 540, 960), (2_500_000, 720, 1280))
+STREAM_SEGMENTS = 8
+SEGMENT_SECONDS = 2
+INIT_SIZE = 1_000
+AUDIO_SIZE = 100_000
+
+
+def shortcode(profile, n):
+    return f"{re.sub(r'[^A-Za-z0-9]', '', profile)[:6]}{n:07d}"
+
+
+def make_server(reels=60, video_size=1_000_000, latency=0.0, bandwidth=0,
+                error_rate=0.0, throttle_rate=0.0, seed=0, feed=True, stream=None):
+    """Build (not start) the stand-in server.
+
+    ``latency`` delays every response, ``bandwidth`` caps each mp4 body in
+    bytes/sec (0 = unlimited), ``error_rate`` answers that fraction of
+    reel pages, feed pages and mp4s with HTTP 500 and ``throttle_rate``
+    with 429 and ``Retry-After: 1``. Each profile has ``reels`` reels.
+    ``feed=False`` answers the JSON reel feed with 404, as when Instagram
+    withdraws it. The feed lists a full-size and a quarter-size mp4 per
+    reel. ``stream`` "hls" or "dash" makes reel pages point at an HLS
+    master playlist or a DASH manifest instead, both with a separate audio
+    track, and leaves the mp4s out of the feed; segments count towards
+    ``media_bytes`` and fail at ``error_rate`` and ``throttle_rate`` too.
+    """
+    body = os.urandom(video_size)
+    chance = random.Random(seed)
+    chance_lock = threading.Lock()
+    stats = {'requests': 0, 'media_bytes': 0}
+    stats_lock = threading.Lock()
+
+    def roll():
+        with chance_lock:
+            return chance.random()
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, *args):
+            pass
+
+        def send(self, status, content=b"", content_type="text/html; charset=utf-8", headers=None):
+            self.send_response(status)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(content)))
+            for name, value in (headers or {}).items():
+                self.send_header(name, value)
+            self.end_headers()
+            if self.command != "HEAD":
+                self.wfile.write(content)
+
+        def logged_in(self):
+            return f"sessionid={SESSION_COOKIE}" in (self.headers.get("Cookie") or "")
+
+        def failure(self):
+            """Maybe answer with a simulated error; True if one was sent"""
+            value = roll()
+            if value < throttle_rate:
+                self.send(429, b"Please wait a few minutes before you try again.",
+                          headers={"Retry-After": "1"})
+                return True
+            if value < throttle_rate + error_rate:
+                self.send(500, b"error")
+                return True
+            return False
+
+        def do_HEAD(self):
+            self.do_GET()
+
+        def do_GET(self):
+            with stats_lock:
+                stats['requests'] += 1
+            if latency:
+                time.sleep(latency)
+            url = urlsplit(self.path)
+            path = url.path
+            query = parse_qs(url.query)
+
+            if path == "/accounts/login/":
+                return self.send(200, b'<form><input name="username"><input name="password" type="password"></form>')
+            if path == "/accounts/edit/":
+                if self.logged_in():
+                    return self.send(200, b"<h1>Edit profile</h1>")
+                return self.send(302, headers={"Location": "/accounts/login/"})
+            if path in ("/", "/robots.txt"):
+                popup = b'<div role="dialog"><button>Not Now</button></div>' if self.logged_in() else b""
+                return self.send(200, b"<main>home</main>" + popup)
+
+            match = re.fullmatch(r"/media/([A-Za-z0-9_-]+)\.mp4", path)
+            if match:
+                return self.media(match.group(1))
+            match = re.fullmatch(r"/stream/([A-Za-z0-9_-]+)/(.+)", path)
+            if match:
+                return self.stream(match.group(1), match.group(2))
+            if path.startswith("/static/") or path.endswith(".jpg"):
+                return self.send(200, body[:SUBRESOURCE_SIZE], content_type="application/octet-stream")
+
+            if path == "/api/v1/users/web_profile_info/" and feed:
+                if not self.logged_in():
+                    return self.send(302, headers={"Location": "/accounts/login/"})
+                profile = query.get("username", [""])[0]
+                user = {'id': profile.encode().hex(), 'username': profile}
+                return self.send(200, json.dumps({'data': {'user': user}}).encode(),
+                                 content_type="application/json")
+
+            match = re.fullmatch(r"/api/v1/([\w.]+)/reels/", path)
+            if match:
+                page = int(query.get("page", ["0"])[0])
+                return self.send(200, json.dumps(self.grid(match.group(1), page)).encode(),
+                                 content_type="application/json")
+
+            match = re.fullmatch(r"/(?:reel|p)/([A-Za-z0-9_-]+)/", path)
+            if match:
+                if not self.logged_in():
+                    return self.send(302, headers={"Location": "/accounts/login/"})
+                if self.failure():
+                    return
+                return self.send(200, self.reel_page(match.group(1)).encode())
+
+            match = re.fullmatch(r"/([\w.]+)/reels/", path)
+            if match:
+                grid = self.grid(match.group(1), 0)
+                anchors = "".join(f'<a href="{href}">reel</a>' for href in grid['hrefs'])
+                return self.send(200, f"<main>{anchors}</main>".encode())
+
+            self.send(404, b"not found")
+
+        def do_POST(self):
+            length = int(self.headers.get("Content-Length") or 0)
+            form = {key: values[0] for key, values in parse_qs(self.rfile.read(length).decode()).items()}
+            if latency:
+                time.sleep(latency)
+            if self.path.startswith("/accounts/login/ajax/"):
+                return self.send(200, b'{"authenticated": true}', content_type="application/json",
+                                 headers={"Set-Cookie": f"sessionid={SESSION_COOKIE}; Path=/"})
+            if self.path.startswith("/api/v1/clips/user/") and feed:
+                with stats_lock:
+                    stats['requests'] += 1
+                if not self.logged_in():
+                    return self.send(302, headers={"Location": "/accounts/login/"})
+                if self.failure():
+                    return
+                return self.send(200, json.dumps(self.clips(form)).encode(), content_type="application/json")
+            self.send(404, b"not found")
+
+        def clips(self, form):
+            """One page of the reel feed; the cursor is the offset of the next page"""
+            profile = bytes.fromhex(form.get("target_user_id", "")).decode()
+            start = int(form.get("max_id") or 0)
+            end = min(reels, start + min(int(form.get("page_size") or GRID_PAGE), 50))
+            host = self.headers.get("Host")
+            items = [{'media': {'code': shortcode(profile, n), 'media_type': 2,
+                                'video_versions': [] if stream else [
+                                    {'url': f"http://{host}/media/{shortcode(profile, n)}.mp4",
+                                     'width': 720, 'height': 1280},
+                                    {'url': f"http://{host}/media/{shortcode(profile, n)}_low.mp4",
+                                     'width': 360, 'height': 640}]}}
+                     for n in range(start, end)]
+            return {'items': items, 'paging_info': {'max_id': str(end), 'more_available': end < reels}}
+
+        def grid(self, profile, page):
+            start = page * GRID_PAGE
+            end = min(reels, start + GRID_PAGE)
+            return {'hrefs': [f"/reel/{shortcode(profile, n)}/" for n in range(start, end)],
+                    'more': end < reels}
+
+        def reel_page(self, code):
+            host = self.headers.get("Host")
+            video_url = f"http://{host}/media/{code}.mp4"
+            if stream == "hls":
+                video_url = f"http://{host}/stream/{code}/master.m3u8"
+            elif stream == "dash":
+                video_url = f"http://{host}/stream/{code}/manifest.mpd"
+            ld = json.dumps({"@type": "VideoObject", "contentUrl": video_url})
+            # Padding stands in for the rest of a real, multi-hundred-KB reel page
+            images = "".join(f'<img src="/media/{code}_{n}.jpg">' for n in range(3))
+            return (f'<html><head><script type="application/ld+json">{ld}</script>'
+                    f'<link rel="stylesheet" href="/static/app.css"></head>'
+                    f'<body>{images}<video src="blob:{INSTAGRAM}/{code}"></video>'
+                    f'{"<div></div>" * 2000}</body></html>')
+
+        def media(self, code):
+            if self.failure():
+                return
+            content = code.encode() + body[len(code):]
+            if code.endswith("_low"):
+                content = content[:len(content) // 4]
+            start = 0
+            status = 200
+            headers = {"Accept-Ranges": "bytes"}
+            match = re.match(r"bytes=(\d+)-(\d*)", self.headers.get("Range") or "")
+            if match:
+                start = int(match.group(1))
+                end = int(match.group(2)) if match.group(2) else len(content) - 1
+                if start >= len(content):
+                    return self.send(416, headers={"Content-Range": f"bytes */{len(content)}"})
+                headers["Content-Range"] = f"bytes {start}-{end}/{len(content)}"
+                content = content[start:end + 1]
+                status = 206
+
+            self.send_response(status)
+            self.send_header("Content-Type", "video/mp4")
+            self.send_header("Content-Length", str(len(content)))
+            for name, value in headers.items():
+                self.send_header(name, value)
+            self.end_headers()
+            if self.command == "HEAD":
+                return
+            step = 64 * 1024
+            for offset in range(0, len(content), step):
+                self.wfile.write(content[offset:offset + step])
+                if bandwidth:
+                    time.sleep(step / bandwidth)
+            with stats_lock:
+                stats['media_bytes'] += len(content)
+
+        def stream(self, code, name):
+            """Playlists, manifest and segments of a reel's HLS or DASH stream"""
+            top = STREAM_RENDITIONS[-1][0]
+            if name == "master.m3u8":
+                lines = ["#EXTM3U", "#EXT-X-VERSION:7",
+                         '#EXT-X-MEDIA:TYPE=AUDIO,GROUP-ID="aud",NAME="Original audio",DEFAULT=YES,'
+                         'URI="audio/index.m3u8"']
+                for rate, width, height in STREAM_RENDITIONS:
+                    lines += [f'#EXT-X-STREAM-INF:BANDWIDTH={rate},RESOLUTION={width}x{height},AUDIO="aud"',
+                              f"{rate}/index.m3u8"]
+                return self.send(200, "\n".join(lines).encode(), content_type="application/vnd.apple.mpegurl")
+            if name == "audio/index.m3u8":
+                # The audio group is the DASH audio file, as one segment
+                lines = ["#EXTM3U", "#EXT-X-VERSION:7", f"#EXT-X-TARGETDURATION:{STREAM_SEGMENTS * SEGMENT_SECONDS}",
+                         "#EXT-X-PLAYLIST-TYPE:VOD", f"#EXTINF:{STREAM_SEGMENTS * SEGMENT_SECONDS}.0,",
+                         "../audio.m4a", "#EXT-X-ENDLIST"]
+                return self.send(200, "\n".join(lines).encode(), content_type="application/vnd.apple.mpegurl")
+            if name.endswith("/index.m3u8"):
+                lines = ["#EXTM3U", "#EXT-X-VERSION:7", f"#EXT-X-TARGETDURATION:{SEGMENT_SECONDS}",
+                         "#EXT-X-PLAYLIST-TYPE:VOD", '#EXT-X-MAP:URI="init.mp4"']
+                for n in range(1, STREAM_SEGMENTS + 1):
+                    lines += [f"#EXTINF:{SEGMENT_SECONDS}.0,", f"seg{n}.m4s"]
+                lines.append("#EXT-X-ENDLIST")
+                return self.send(200, "\n".join(lines).encode(), content_type="application/vnd.apple.mpegurl")
+            if name == "manifest.mpd":
+                representations = "".join(
+                    f'<Representation id="{rate}" bandwidth="{rate}" width="{width}" height="{height}"'
+                    f' codecs="avc1.64001f" mimeType="video/mp4"/>'
+                    for rate, width, height in STREAM_RENDITIONS)
+                manifest = (
+                    '<?xml version="1.0"?>'
+                    '<MPD xmlns="urn:mpeg:dash:schema:mpd:2011" type="static"'
+                    f' mediaPresentationDuration="PT{STREAM_SEGMENTS * SEGMENT_SECONDS}S">'
+                    '<Period><AdaptationSet contentType="video" mimeType="video/mp4">'
+                    f'<SegmentTemplate timescale="1" duration="{SEGMENT_SECONDS}" startNumber="1"'
+                    ' initialization="$RepresentationID$/init.mp4" media="$RepresentationID$/seg$Number$.m4s"/>'
+                    f'{representations}</AdaptationSet>'
+                    '<AdaptationSet contentType="audio" mimeType="audio/mp4">'
+                    '<Representation id="audio" bandwidth="128000" codecs="mp4a.40.2">'
+                    '<BaseURL>audio.m4a</BaseURL></Representation></AdaptationSet>'
+                    '</Period></MPD>')
+                return self.send(200, manifest.encode(), content_type="application/dash+xml")
+            if self.failure():
+                return
+            match = re.fullmatch(r"(\d+)/(init\.mp4|seg(\d+)\.m4s)", name)
+            if name == "audio.m4a":
+                content, content_type = body[:AUDIO_SIZE], "audio/mp4"
+            elif match and match.group(2) == "init.mp4":
+                content, content_type = body[:INIT_SIZE], "video/mp4"
+            elif match and 1 <= int(match.group(3)) <= STREAM_SEGMENTS:
+                size = len(body) * int(match.group(1)) // top // STREAM_SEGMENTS
+                offset = (int(match.group(3)) - 1) * size
+                content, content_type = body[offset:offset + size], "video/iso.segment"
+            else:
+                return self.send(404, b"not found")
+            self.send(200, content, content_type=content_type)
+            with stats_lock:
+                stats['media_bytes'] += len(content)
+
+    server = QuietServer(("127.0.0.1", 0), Handler)
+    server.daemon_threads = True
+    server.stats = stats
+    return server
+
+
+class QuietServer(ThreadingHTTPServer):
+    def handle_error(self, request, client_address):
+        # Clients dropping keep-alive connections at exit is expected here
+        pass
+
+
+def serve_forever(port_queue, **config):
+    """Process target: run the server and report its port"""
+    server = make_server(**config)
+    port_queue.put(server.server_port)
+    server.serve_forever()
+
+
+class FakeElement:
+    def __init__(self, driver, name):
+        self.driver = driver
+        self.name = name
+
+    def send_keys(self, *values):
+        for value in values:
+            if value == Keys.RETURN:
+                self.driver.submit_login()
+            else:
+                self.driver.form[self.name] = self.driver.form.get(self.name, "") + value
+
+
+class FakeDriver:
+    """Just enough of a Selenium WebDriver to browse the stand-in server"""
+
+    def __init__(self, base_url):
+        self.base_url = base_url
+        self.http = requests.Session()
+        self.current_url = "about:blank"
+        self.page_source = ""
+        self.anchors = []
+        self.harvested = set()
+        self.grid = None
+        self.form = {}
+        self.local_storage = {}
+        self.blocked_patterns = []
+        self.performance_log = []
+        self.request_ids = 0
+        self.closed = False
+
+    def local(self, url):
+        return url.replace(INSTAGRAM, self.base_url, 1)
+
+    def public(self, url):
+        return url.replace(self.base_url, INSTAGRAM, 1)
+
+    def get(self, url):
+        if self.closed:
+            raise RuntimeError("browser closed")
+        response = self.http.get(self.local(url), timeout=30)
+        self.current_url = self.public(response.url)
+        self.page_source = response.text
+        self.anchors = [INSTAGRAM + href for href in re.findall(r'href="(/reel/[^"]+)"', response.text)]
+        self.harvested = set()
+        match = re.fullmatch(r"/([\w.]+)/reels/", urlsplit(self.current_url).path)
+        self.grid = {'profile': match.group(1), 'page': 0, 'more': True} if match else None
+        self.log_event('Network.responseReceived', type='Document', response={
+            'url': self.current_url, 'status': response.status_code,
+            'mimeType': response.headers.get('Content-Type', '').split(';')[0],
+            'headers': dict(response.headers)})
+        self.load_subresources(response.text)
+
+    def log_event(self, method, **params):
+        self.performance_log.append({'message': json.dumps({'message': {'method': method, 'params': params}})})
+
+    def load_subresources(self, page):
+        """Fetch the page's stylesheets, images and video, as a browser would, unless blocked"""
+        resources = [(INSTAGRAM + href, "Stylesheet")
+                     for href in re.findall(r'<link rel="stylesheet" href="([^"]+)"', page)]
+        resources += [(INSTAGRAM + src, "Image") for src in re.findall(r'<img src="([^"]+)"', page)]
+        # The player streams the video in byte ranges
+        resources += [(url + "?bytestart=0&byteend=65535", "Media")
+                      for url in re.findall(r'"contentUrl": "([^"]+)"', page)]
+        for url, resource_type in resources:
+            self.request_ids += 1
+            request_id = str(self.request_ids)
+            self.log_event('Network.requestWillBeSent', requestId=request_id, type=resource_type,
+                           request={'url': url, 'method': 'GET'})
+            if any(fnmatch.fnmatchcase(url, pattern) for pattern in self.blocked_patterns):
+                self.log_event('Network.loadingFailed', requestId=request_id, type=resource_type,
+                               errorText='net::ERR_BLOCKED_BY_CLIENT', blockedReason='inspector')
+                continue
+            if resource_type == "Media":
+                response = self.http.get(self.local(url), headers={'Range': 'bytes=0-65535'}, timeout=30)
+            else:
+                response = self.http.get(self.local(url), timeout=30)
+            response.content
+            self.log_event('Network.responseReceived', requestId=request_id, type=resource_type, response={
+                'url': url, 'status': response.status_code,
+                'mimeType': response.headers.get('Content-Type', '').split(';')[0],
+                'headers': dict(response.headers)})
+
+    def submit_login(self):
+        self.http.post(f"{self.base_url}/accounts/login/ajax/", data=self.form, timeout=30)
+        self.get(f"{INSTAGRAM}/")
+
+    def scroll(self):
+        """Load the next page of the reels grid, like Instagram's infinite scroll"""
+        if not self.grid or not self.grid['more']:
+            return
+        self.grid['page'] += 1
+        response = self.http.get(f"{self.base_url}/api/v1/{self.grid['profile']}/reels/",
+                                 params={'page': self.grid['page']}, timeout=30)
+        data = response.json()
+        self.anchors += [INSTAGRAM + href for href in data['hrefs']]
+        self.grid['more'] = data['more']
+
+    def find_element(self, by, value):
+        if by == By.NAME and f'name="{value}"' in self.page_source:
+            return FakeElement(self, value)
+        raise NoSuchElementException(f"{by}={value}")
+
+    def find_elements(self, by, value):
+        try:
+            return [self.find_element(by, value)]
+        except NoSuchElementException:
+            return []
+
+    def execute_script(self, script, *args):
+        if self.closed:
+            raise RuntimeError("browser closed")
+        if script == NEW_REEL_HREFS_SCRIPT:
+            fresh = [href for href in self.anchors if href not in self.harvested]
+            self.harvested.update(fresh)
+            return fresh
+        if script == REEL_ANCHOR_COUNT_SCRIPT:
+            return len(self.anchors)
+        if script == SCROLL_HEIGHT_SCRIPT:
+            return 1000 + 300 * len(self.anchors)
+        if script.startswith("window.scrollTo"):
+            return self.scroll()
+        if script == VIDEO_SRC_SCRIPT:
+            match = re.search(r'<video[^>]+src="([^"]+)"', self.page_source)
+            return match.group(1) if match else None
+        if script == DISMISS_POPUP_SCRIPT:
+            if '<div role="dialog">' in self.page_source:
+                self.page_source = re.sub(r'<div role="dialog">.*?</div>', "", self.page_source)
+                return "save_info"
+            return None
+        if "localStorage" in script:
+            if args:
+                self.local_storage.update(args[0])
+                return None
+            return dict(self.local_storage)
+        return None
+
+    def execute_cdp_cmd(self, command, params):
+        if command == 'Network.setBlockedURLs':
+            self.blocked_patterns = list(params['urls'])
+        return {}
+
+    def get_log(self, log_type):
+        entries, self.performance_log = self.performance_log, []
+        return entries
+
+    def get_cookies(self):
+        return [{'name': cookie.name, 'value': cookie.value, 'domain': '.instagram.com', 'path': '/'}
+                for cookie in self.http.cookies]
+
+    def add_cookie(self, cookie):
+        self.http.cookies.set(cookie['name'], cookie['value'])
+
+    def quit(self):
+        self.closed = True
+        self.http.close()
+
+
+class LocalInstagramAdapter(HTTPAdapter):
+    """Sends ``https://www.instagram.com`` requests to the stand-in instead"""
+
+    def __init__(self, base_url, inner):
+        super().__init__()
+        self.base_url = base_url
+        self.inner = inner
+
+    def send(self, request, **kwargs):
+        request.url = request.url.replace(INSTAGRAM, self.base_url, 1)
+        return self.inner.send(request, **kwargs)
+
+
+def attach(downloader, base_url):
+    """Point a downloader's browser and HTTP session at the stand-in server"""
+    downloader.setup_driver = lambda: FakeDriver(base_url)
+    inner = downloader.session.get_adapter("http://")
+    downloader.session.mount(INSTAGRAM, LocalInstagramAdapter(base_url, inner))
+    return downloader
@@ -0,0 +1,179 @@
+import queue
+import threading
+
+
+class BrowserPool:
+    """Resolve reel video URLs across several logged-in browser instances.
+
+    Each worker thread creates its own driver through ``driver_factory`` and
+    logs in once with ``login``. Reels are handed out from one shared work
+    queue and every result is reported back on the channel of the
+    ``resolve`` call that submitted it. A worker whose browser dies puts its
+    unfinished reel back on the queue and starts a new logged-in browser, up
+    to ``MAX_RESTARTS`` times. A worker that cannot get a browser stops,
+    and once none are left ``resolve`` raises ``RuntimeError``.
+
+    ``driver_factory``, ``login(driver)`` and ``extract(driver, reel_url)``
+    are plain callables, so a fake driver can be plugged in to exercise the
+    pool without Chrome.
+    """
+
+    # How many times a reel is handed back after killing its worker's browser
+    MAX_REQUEUES = 2
+    # How many replacement browsers one worker starts before giving up
+    MAX_RESTARTS = 3
+
+    def __init__(self, driver_factory, login, extract, num_workers=2,
+                 log=print, wait=None):
+        self.driver_factory = driver_factory
+        self.login = login
+        self.extract = extract
+        self.num_workers = max(1, num_workers)
+        self.log = log
+        self.wait = wait or (lambda: True)
+
+        self.tasks = queue.Queue()
+        self.threads = []
+        self.alive = 0
+        self.lock = threading.Lock()
+
+    def start(self):
+        """Launch the worker threads"""
+        for worker_id in range(1, self.num_workers + 1):
+            thread = threading.Thread(target=self._worker, args=(worker_id,), daemon=True)
+            self.threads.append(thread)
+            with self.lock:
+                self.alive += 1
+            thread.start()
+        return self
+
+    def close(self):
+        """Stop the workers and quit their browsers"""
+        for _ in self.threads:
+            self.tasks.put(None)
+        for thread in self.threads:
+            thread.join()
+        self.threads = []
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def _driver_alive(self, driver):
+        try:
+            driver.current_url
+            return True
+        except Exception:
+            return False
+
+    def _quit(self, driver):
+        try:
+            driver.quit()
+        except Exception:
+            pass
+
+    def _start_driver(self):
+        """A new driver, logged in"""
+        driver = self.driver_factory()
+        try:
+            if not self.login(driver):
+                raise RuntimeError("login failed")
+        except Exception:
+            self._quit(driver)
+            raise
+        return driver
+
+    def _requeue(self, task):
+        idx, reel_url, attempts, results = task
+        if attempts < self.MAX_REQUEUES:
+            self.tasks.put((idx, reel_url, attempts + 1, results))
+        else:
+            results.put((idx, reel_url, None))
+
+    def _worker(self, worker_id):
+        driver = None
+        task = None
+        restarts = 0
+        try:
+            driver = self._start_driver()
+            self.log(f"🧭 Browser worker {worker_id} ready")
+
+            while True:
+                task = self.tasks.get()
+                if task is None:
+                    return
+                idx, reel_url, attempts, results = task
+
+                if not self.wait():
+                    results.put((idx, reel_url, None))
+                    task = None
+                    continue
+
+                try:
+                    video_url = self.extract(driver, reel_url)
+                except Exception:
+                    video_url = None
+
+                if video_url is None and not self._driver_alive(driver):
+                    self._requeue(task)
+                    task = None
+                    self._quit(driver)
+                    driver = None
+                    if restarts >= self.MAX_RESTARTS:
+                        raise RuntimeError(f"browser died {restarts + 1} times")
+                    restarts += 1
+                    self.log(f"🔁 Browser worker {worker_id} lost its browser, starting a new one "
+                             f"({restarts}/{self.MAX_RESTARTS})")
+                    driver = self._start_driver()
+                    continue
+
+                results.put((idx, reel_url, video_url))
+                task = None
+
+        except Exception as e:
+            self.log(f"❌ Browser worker {worker_id} stopped: {str(e)}")
+            if task is not None:
+                self._requeue(task)
+        finally:
+            with self.lock:
+                self.alive -= 1
+            if driver:
+                self._quit(driver)
+
+    def resolve(self, reel_links, start_idx=1):
+        """Yield ``(idx, reel_url, video_url)`` in completion order.
+
+        ``video_url`` is None for reels that could not be resolved. Raises
+        ``RuntimeError`` if every worker has stopped with reels still queued.
+        """
+        results = queue.Queue()
+        pending = 0
+        for idx, reel_url in enumerate(reel_links, start_idx):
+            self.tasks.put((idx, reel_url, 0, results))
+            pending += 1
+
+        while pending:
+            try:
+                result = results.get(timeout=0.5)
+            except queue.Empty:
+                with self.lock:
+                    alive = self.alive
+                if not alive:
+                    # Every worker died; fail whatever is still queued, for other callers too
+                    self._fail_queued()
+                    raise RuntimeError(f"every browser worker has stopped, {pending} reels left unresolved")
+                continue
+            pending -= 1
+            yield result
+
+    def _fail_queued(self):
+        while True:
+            try:
+                task = self.tasks.get_nowait()
+            except queue.Empty:
+                return
+            if task is not None:
+                idx, reel_url, _, results = task
+                results.put((idx, reel_url, None))
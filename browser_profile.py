@@ -0,0 +1,128 @@
+import json
+import threading
+import weakref
+from collections import Counter
+
+PAGE_LOAD_STRATEGIES = ("normal", "eager", "none")
+
+# Requests a reel page makes that the video URL never depends on. Chrome's
+# blocklist takes URL patterns ("*" is a wildcard), so resource types are
+# matched by file extension, which Instagram's CDN URLs keep before "?"
+BLOCKED_URL_PATTERNS = {
+    'image': ["*.jpg*", "*.jpeg*", "*.png*", "*.gif*", "*.webp*", "*.heic*", "*.ico*", "*.svg*"],
+    'font': ["*.woff*", "*.woff2*", "*.ttf*", "*.otf*"],
+    'stylesheet': ["*.css*"],
+    'media': ["*.mp4*", "*.m4s*", "*.m4a*", "*.m4v*", "*.ts?*"],
+    'tracking': ["*google-analytics.com*", "*googletagmanager.com*", "*doubleclick.net*",
+                 "*connect.facebook.net*", "*facebook.com/tr*", "*graph.instagram.com/logging*",
+                 "*/logging_client_events*", "*/ajax/bz*"],
+}
+
+
+class BrowserProfile:
+    """Chrome settings that make reel page loads cheaper.
+
+    ``block_resources`` drops images, fonts, stylesheets, media and
+    trackers through the DevTools network blocklist; only the HTML and
+    scripts that carry the video URL are fetched. It is switched on per
+    browser by ``prepare`` before each extraction and off again by
+    ``release`` before the browser goes back to login or the profile grid,
+    which need their images and styles. ``page_load_strategy`` "eager" returns
+    from ``driver.get`` once the DOM is ready, "none" right away (the
+    extraction waits poll for the video either way). ``headless`` runs
+    Chrome without a window.
+
+    Blocked requests are counted from Chrome's performance log, which
+    ``count_blocked`` drains after every navigation so it cannot grow. The
+    log is also on with ``capture_network``, for ``NetworkCapture``.
+    """
+
+    def __init__(self, block_resources=True, page_load_strategy="eager", headless=False,
+                 capture_network=True, blocked_categories=None, extra_patterns=None):
+        if page_load_strategy not in PAGE_LOAD_STRATEGIES:
+            raise ValueError(f"page_load_strategy must be one of {', '.join(PAGE_LOAD_STRATEGIES)}")
+        self.block_resources = block_resources
+        self.page_load_strategy = page_load_strategy
+        self.headless = headless
+        self.capture_network = capture_network
+        categories = blocked_categories or list(BLOCKED_URL_PATTERNS)
+        self.patterns = [pattern for category in categories for pattern in BLOCKED_URL_PATTERNS[category]]
+        self.patterns += list(extra_patterns or [])
+        self.prepared = weakref.WeakSet()
+        self.unsupported = weakref.WeakSet()
+        self.lock = threading.Lock()
+
+    def apply(self, options):
+        """Set up ``ChromeOptions`` before the browser starts"""
+        options.page_load_strategy = self.page_load_strategy
+        if self.headless:
+            options.add_argument('--headless=new')
+        if self.block_resources or self.capture_network:
+            # Network events, for finding the video and counting what the blocklist stopped
+            options.set_capability('goog:loggingPrefs', {'performance': 'ALL'})
+            options.add_experimental_option('perfLoggingPrefs', {'enableNetwork': True, 'enablePage': False})
+        return options
+
+    def prepare(self, driver):
+        """Turn the blocklist on for ``driver``; cheap to call before every navigation.
+
+        Returns False if the driver has no DevTools access (e.g. a remote
+        or fake driver), in which case pages load in full.
+        """
+        if not self.block_resources:
+            return False
+        with self.lock:
+            if driver in self.prepared:
+                return True
+            if driver in self.unsupported:
+                return False
+        try:
+            driver.execute_cdp_cmd('Network.enable', {})
+            driver.execute_cdp_cmd('Network.setBlockedURLs', {'urls': self.patterns})
+            self.drain_log(driver)
+        except Exception:
+            with self.lock:
+                self.unsupported.add(driver)
+            return False
+        with self.lock:
+            self.prepared.add(driver)
+        return True
+
+    def release(self, driver):
+        """Turn the blocklist off again for ``driver``, before it leaves reel extraction"""
+        with self.lock:
+            if driver not in self.prepared:
+                return
+            self.prepared.discard(driver)
+        try:
+            driver.execute_cdp_cmd('Network.setBlockedURLs', {'urls': []})
+        except Exception:
+            pass
+
+    def drain_log(self, driver):
+        """Performance log entries since the last call, parsed; [] if unavailable"""
+        try:
+            entries = driver.get_log('performance')
+        except Exception:
+            return []
+        messages = []
+        for entry in entries:
+            try:
+                messages.append(json.loads(entry['message'])['message'])
+            except (KeyError, TypeError, ValueError):
+                continue
+        return messages
+
+    def count_blocked(self, driver, messages=None):
+        """``Counter`` of blocked requests by resource type since the last drain"""
+        blocked = Counter()
+        with self.lock:
+            if driver not in self.prepared:
+                return blocked
+        for message in self.drain_log(driver) if messages is None else messages:
+            if message.get('method') != 'Network.loadingFailed':
+                continue
+            params = message.get('params', {})
+            if params.get('blockedReason') or params.get('errorText') == 'net::ERR_BLOCKED_BY_CLIENT':
+                blocked[params.get('type', 'Other').lower()] += 1
+        return blocked
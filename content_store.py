@@ -0,0 +1,133 @@
+import os
+import shutil
+import sqlite3
+import threading
+from urllib.parse import urlsplit
+
+# Bytes compared when a same-sized blob might be the video about to download
+PREFIX_BYTES = 64 * 1024
+
+
+def url_key(video_url):
+    """CDN URL without its query string.
+
+    Instagram signs CDN links with expiring query parameters, but the path
+    names the asset, so it identifies the video across runs.
+    """
+    parts = urlsplit(video_url or "")
+    return f"{parts.netloc}{parts.path}" if parts.path else None
+
+
+class ContentStore:
+    """Shared blob directory that keeps one copy of each distinct video.
+
+    Finished downloads are moved to ``blobs/<aa>/<sha256>.mp4`` and the
+    file in the output directory becomes a hard link to the blob (a
+    symlink, or as a last resort a copy, where hard links are not
+    possible). ``index.sqlite3`` maps hashes to blobs and CDN URLs to
+    hashes, so a video seen in any earlier run or profile can be linked
+    without downloading it again.
+    """
+
+    FILENAME = "index.sqlite3"
+
+    def __init__(self, root):
+        self.root = root
+        self.blob_dir = os.path.join(root, "blobs")
+        os.makedirs(self.blob_dir, exist_ok=True)
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(os.path.join(root, self.FILENAME), check_same_thread=False)
+        with self.lock, self.conn:
+            self.conn.execute("""
+                CREATE TABLE IF NOT EXISTS blobs (
+                    sha256 TEXT PRIMARY KEY,
+                    bytes INTEGER NOT NULL
+                )
+            """)
+            self.conn.execute("CREATE INDEX IF NOT EXISTS blobs_bytes ON blobs (bytes)")
+            self.conn.execute("""
+                CREATE TABLE IF NOT EXISTS urls (
+                    url_key TEXT PRIMARY KEY,
+                    sha256 TEXT NOT NULL
+                )
+            """)
+
+    def blob_path(self, sha256):
+        return os.path.join(self.blob_dir, sha256[:2], f"{sha256}.mp4")
+
+    def _present(self, sha256, size):
+        path = self.blob_path(sha256)
+        return os.path.exists(path) and os.path.getsize(path) == size
+
+    def lookup_url(self, video_url):
+        """Return ``(sha256, size)`` of a stored blob for ``video_url``, or None"""
+        key = url_key(video_url)
+        if not key:
+            return None
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT blobs.sha256, blobs.bytes FROM urls JOIN blobs USING (sha256) "
+                "WHERE url_key = ?", (key,)).fetchone()
+        if row and self._present(*row):
+            return row
+        return None
+
+    def candidates(self, size):
+        """Hashes of stored blobs that are exactly ``size`` bytes long"""
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT sha256 FROM blobs WHERE bytes = ?", (size,)).fetchall()
+        return [sha256 for (sha256,) in rows if self._present(sha256, size)]
+
+    def read_prefix(self, sha256, length=PREFIX_BYTES):
+        with open(self.blob_path(sha256), 'rb') as f:
+            return f.read(length)
+
+    def remember_url(self, video_url, sha256):
+        key = url_key(video_url)
+        if key:
+            with self.lock, self.conn:
+                self.conn.execute(
+                    "INSERT OR REPLACE INTO urls (url_key, sha256) VALUES (?, ?)", (key, sha256))
+
+    def put(self, temp_path, sha256, size, video_url=None):
+        """Move a finished download into the store.
+
+        Returns True if the blob was new, False if an identical one was
+        already stored (``temp_path`` is then discarded).
+        """
+        blob = self.blob_path(sha256)
+        with self.lock:
+            if os.path.exists(blob) and os.path.getsize(blob) == size:
+                os.remove(temp_path)
+                new = False
+            else:
+                os.makedirs(os.path.dirname(blob), exist_ok=True)
+                os.replace(temp_path, blob)
+                new = True
+            with self.conn:
+                self.conn.execute(
+                    "INSERT OR REPLACE INTO blobs (sha256, bytes) VALUES (?, ?)", (sha256, size))
+        if video_url:
+            self.remember_url(video_url, sha256)
+        return new
+
+    def link(self, sha256, filepath):
+        """Make ``filepath`` refer to the stored blob, replacing any file there"""
+        blob = self.blob_path(sha256)
+        temp_path = filepath + '.link'
+        if os.path.lexists(temp_path):
+            os.remove(temp_path)
+        try:
+            os.link(blob, temp_path)
+        except OSError:
+            # Different file system, or no hard links (e.g. FAT, some shares)
+            try:
+                os.symlink(os.path.abspath(blob), temp_path)
+            except OSError:
+                shutil.copyfile(blob, temp_path)
+        os.replace(temp_path, filepath)
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
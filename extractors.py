@@ -0,0 +1,148 @@
+import html
+import json
+import re
+import threading
+
+
+def decode_escapes(value):
+    """Undo JSON string escapes (``\\u0026``, ``\\/``...) and HTML entities"""
+    try:
+        value = json.loads(f'"{value}"')
+    except ValueError:
+        value = value.replace('\\u0026', '&').replace('\\/', '/')
+    return html.unescape(value)
+
+
+class Extractor:
+    """One way of finding a video URL in a reel page.
+
+    Subclasses implement ``find``; ``extract`` wraps it and keeps the
+    attempt/hit counters used for the hit-rate report. When ``markers`` is
+    set, a plain substring search (much cheaper than a regex over a
+    multi-MB page) skips pages without any of them and starts ``find`` at
+    the first marker, less ``lookbehind`` characters.
+    """
+
+    name = "extractor"
+    markers = ()
+    lookbehind = 0
+
+    def __init__(self):
+        self.attempts = 0
+        self.hits = 0
+        self.lock = threading.Lock()
+
+    def find(self, page_source, start=0):
+        raise NotImplementedError
+
+    def extract(self, page_source):
+        start = 0
+        if self.markers:
+            positions = [pos for pos in (page_source.find(marker) for marker in self.markers) if pos >= 0]
+            start = max(0, min(positions) - self.lookbehind) if positions else None
+        url = self.find(page_source, start) if start is not None else None
+        with self.lock:
+            self.attempts += 1
+            if url:
+                self.hits += 1
+        return url
+
+    def stats(self):
+        with self.lock:
+            rate = self.hits / self.attempts if self.attempts else 0.0
+            return {'attempts': self.attempts, 'hits': self.hits, 'hit_rate': round(rate, 3)}
+
+
+class JsonLdExtractor(Extractor):
+    """``contentUrl`` from ``<script type="application/ld+json">`` blocks"""
+
+    name = "json_ld"
+    markers = ('application/ld+json',)
+    lookbehind = 256
+    SCRIPT = re.compile(r'<script[^>]+type="application/ld\+json"[^>]*>(.*?)</script>', re.S)
+
+    def find(self, page_source, start=0):
+        for match in self.SCRIPT.finditer(page_source, start):
+            try:
+                data = json.loads(match.group(1))
+            except ValueError:
+                continue
+            for item in data if isinstance(data, list) else [data]:
+                if not isinstance(item, dict):
+                    continue
+                video = item.get('video', item)
+                if isinstance(video, list):
+                    video = video[0] if video else {}
+                url = video.get('contentUrl') if isinstance(video, dict) else None
+                if url and url.startswith('http'):
+                    return url
+        return None
+
+
+class EmbeddedJsonExtractor(Extractor):
+    """``video_url`` / ``video_versions`` fields from the page's embedded JSON"""
+
+    name = "embedded_json"
+    markers = ('"video_url"', '"video_versions"')
+    FIELD = re.compile(r'"video_url":"((?:[^"\\]|\\.)+)"'
+                       r'|"video_versions":\[\{[^\]]*?"url":"((?:[^"\\]|\\.)+)"')
+
+    def find(self, page_source, start=0):
+        match = self.FIELD.search(page_source, start)
+        if not match:
+            return None
+        return decode_escapes(match.group(1) or match.group(2))
+
+
+class RegexExtractor(Extractor):
+    """First URL in the raw page matching a compiled pattern"""
+
+    # URLs end in the marker (".mp4"), so start scanning a URL's length earlier
+    lookbehind = 4096
+
+    def __init__(self, name, pattern, markers=()):
+        super().__init__()
+        self.name = name
+        self.pattern = re.compile(pattern)
+        self.markers = markers
+
+    def find(self, page_source, start=0):
+        match = self.pattern.search(page_source, start)
+        return decode_escapes(match.group(0)) if match else None
+
+
+class ExtractorChain:
+    """Run extractors in order and return the first video URL found"""
+
+    def __init__(self, extractors):
+        self.extractors = list(extractors)
+
+    @classmethod
+    def default(cls):
+        # Structured data first; the raw URL scans are the fallback
+        return cls([
+            JsonLdExtractor(),
+            EmbeddedJsonExtractor(),
+            RegexExtractor("mp4_url", r'https:(?:\\?/){2}[^"\s<>]+?\.mp4[^"\s<>]*', markers=('.mp4',)),
+            RegexExtractor("m3u8_url", r'https:(?:\\?/){2}[^"\s<>]+?\.m3u8[^"\s<>]*', markers=('.m3u8',)),
+            RegexExtractor("mpd_url", r'https:(?:\\?/){2}[^"\s<>]+?\.mpd[^"\s<>]*', markers=('.mpd',)),
+        ])
+
+    def extract(self, page_source):
+        for extractor in self.extractors:
+            url = extractor.extract(page_source)
+            if url:
+                return url
+        return None
+
+    def stats(self):
+        """Attempts, hits and hit rate for each extractor"""
+        return {extractor.name: extractor.stats() for extractor in self.extractors}
+
+
+default_chain = ExtractorChain.default()
+
+
+def find_video_url(page_source):
+    """Return the first video URL found in a reel page or its JSON, or None"""
+    return default_chain.extract(page_source)
@@ -0,0 +1,88 @@
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from extractors import find_video_url
+from rate_limiter import RateLimiter
+from run_manifest import shortcode_from_url
+from transport import DEFAULT_HEADERS, INSTAGRAM_APP_ID, set_cookies
+
+
+class FastResolver:
+    """Resolve reel video URLs over plain HTTP with the browser's login cookies.
+
+    Reel pages (and their JSON variant) are fetched with ``requests`` in
+    parallel and scanned with the same extractor chain as ``extract_video_url``.
+    Reels that cannot be resolved this way are reported with a None URL so
+    the caller can hand them to Selenium. Page fetches draw from the
+    ``limiter``'s page budget when one is given, and are timed and counted
+    in ``metrics`` (a ``RunMetrics``) when that is given.
+    """
+
+    # Pages are text, so unlike video they may come compressed
+    HEADERS = dict(DEFAULT_HEADERS, **{
+        "Accept": "text/html,application/json;q=0.9,*/*;q=0.8",
+        "Accept-Encoding": "gzip, deflate",
+        "X-IG-App-ID": INSTAGRAM_APP_ID,
+    })
+
+    def __init__(self, session, max_workers=8, timeout=15, limiter=None, metrics=None):
+        self.session = session
+        self.max_workers = max_workers
+        self.timeout = timeout
+        self.limiter = limiter
+        self.metrics = metrics
+
+    def copy_cookies(self, driver):
+        """Load the logged-in driver's cookies into the HTTP session"""
+        set_cookies(self.session, driver.get_cookies())
+
+    def candidate_urls(self, reel_url):
+        urls = [reel_url]
+        shortcode = shortcode_from_url(reel_url)
+        if shortcode:
+            urls.append(f"https://www.instagram.com/p/{shortcode}/?__a=1&__d=dis")
+        return urls
+
+    def resolve(self, reel_url):
+        """Return the video URL for one reel, or None"""
+        if not self.metrics:
+            return self._resolve(reel_url)
+        self.metrics.reel_started(reel_url)
+        with self.metrics.time("resolve_http"):
+            return self._resolve(reel_url)
+
+    def _resolve(self, reel_url):
+        for url in self.candidate_urls(reel_url):
+            if self.limiter:
+                self.limiter.acquire(RateLimiter.PAGE)
+            try:
+                response = self.session.get(url, headers=self.HEADERS, timeout=self.timeout)
+            except Exception:
+                continue
+            if self.metrics:
+                self.metrics.inc("http_responses", kind=RateLimiter.PAGE, status=response.status_code)
+            if self.limiter and self.limiter.observe(RateLimiter.PAGE, response):
+                # Throttled: leave this reel to the browser, which waits its turn
+                return None
+            if response.status_code != 200:
+                continue
+            video_url = find_video_url(response.text)
+            if video_url:
+                return video_url
+        return None
+
+    def resolve_many(self, items):
+        """Yield ``(idx, reel_url, video_url)`` for ``(idx, reel_url)`` pairs as they finish"""
+        executor = ThreadPoolExecutor(max_workers=self.max_workers)
+        try:
+            futures = {executor.submit(self.resolve, reel_url): (idx, reel_url)
+                       for idx, reel_url in items}
+            for future in as_completed(futures):
+                idx, reel_url = futures[future]
+                try:
+                    video_url = future.result()
+                except Exception:
+                    video_url = None
+                yield idx, reel_url, video_url
+        finally:
+            # Drop queued lookups if the caller stops early
+            executor.shutdown(wait=True, cancel_futures=True)
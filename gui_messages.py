@@ -0,0 +1,68 @@
+import threading
+from collections import deque
+from datetime import datetime
+
+
+class MessageChannel:
+    """Hands downloader messages to the Tk thread without letting them pile up.
+
+    Progress events overwrite each other, so only the latest state waits
+    for the UI. Log lines wait in a buffer of ``max_pending`` lines; when
+    the UI falls behind, the oldest are dropped and counted. Other events
+    (``finished``) are never dropped. With a log file open, every line is
+    also appended to it, dropped ones included.
+    """
+
+    def __init__(self, max_pending=5000):
+        self.lock = threading.Lock()
+        self.lines = deque(maxlen=max_pending)
+        self.dropped = 0
+        self.progress = None
+        self.events = deque()
+        self.log_file = None
+
+    def open_log(self, path):
+        """Also append every log line to ``path`` until ``close_log``"""
+        self.close_log()
+        log_file = open(path, 'a', encoding='utf-8')
+        with self.lock:
+            self.log_file = log_file
+
+    def close_log(self):
+        with self.lock:
+            log_file, self.log_file = self.log_file, None
+        if log_file:
+            log_file.close()
+
+    def put(self, msg_type, data):
+        """Queue one message; safe to call from any thread"""
+        if msg_type == 'log':
+            now = datetime.now()
+            with self.lock:
+                if len(self.lines) == self.lines.maxlen:
+                    self.dropped += 1
+                self.lines.append(f"[{now:%H:%M:%S}] {data}")
+                if self.log_file:
+                    self.log_file.write(f"{now:%Y-%m-%d %H:%M:%S} {data}\n")
+        elif msg_type == 'progress':
+            with self.lock:
+                self.progress = data
+        else:
+            with self.lock:
+                self.events.append((msg_type, data))
+
+    def drain(self, max_lines=500):
+        """Take ``(lines, dropped, progress, events)`` gathered since the last call.
+
+        At most ``max_lines`` lines are taken so one tick of the Tk loop
+        stays short; the rest wait for the next one.
+        """
+        with self.lock:
+            lines = [self.lines.popleft() for _ in range(min(max_lines, len(self.lines)))]
+            dropped, self.dropped = self.dropped, 0
+            progress, self.progress = self.progress, None
+            events = list(self.events)
+            self.events.clear()
+            if self.log_file:
+                self.log_file.flush()
+        return lines, dropped, progress, events
@@ -1,11 +1,11 @@
 import os
 import time
+import hashlib
 import json
 import threading
-import requests
-import re
 from datetime import datetime
 from concurrent.futures import ThreadPoolExecutor, as_completed
+from itertools import islice
 from selenium import webdriver
 from selenium.webdriver.common.by import By
 from selenium.webdriver.common.keys import Keys
@@ -17,33 +17,112 @@ from tkinter import ttk, messagebox, filedialog, scrolledtext
 from tkinter.font import Font
 import queue
 import sys
+from browser_pool import BrowserPool
+from run_manifest import RunManifest, shortcode_from_url
+from fast_resolver import FastResolver
+from extractors import default_chain, find_video_url
+from link_harvester import canonical_reel_url, harvest_new_reel_links
+from session_store import SessionStore
+from popups import dismiss_popups, merge_popup_buttons
+from waits import WaitBudget, REEL_ANCHOR_COUNT_SCRIPT, SCROLL_HEIGHT_SCRIPT
+from watch_state import WatchState, ListingBoundary
+from content_store import ContentStore, PREFIX_BYTES
+from rate_limiter import RateLimiter, RATE_LIMIT_PAGE_TEXT
+from transport import DEFAULT_HEADERS, create_session
+from write_path import BackgroundWriter, FileSink, hash_file, resume_plan
+from metrics import RunMetrics
+from gui_messages import MessageChannel
+from browser_profile import BrowserProfile
+from network_capture import NetworkCapture, find_loaded_video
+from reel_feed import ReelFeed, FeedUnavailable
+from adaptive_stream import StreamDownloader, StreamError, is_stream_type, is_stream_url, rendition_label
 
 class InstagramReelDownloader:
     def __init__(self, username=None, password=None, target_profile=None, 
-                 video_limit=None, max_workers=5, output_dir=None, progress_callback=None):
+                 video_limit=None, max_workers=5, output_dir=None, progress_callback=None,
+                 browser_workers=1, resume=False, segments=1,
+                 segment_threshold=8 * 1024 * 1024, fast_resolve=True, reuse_session=True,
+                 popup_signatures=None, incremental=False, watch_state_path="watch_state.json",
+                 store_dir=None, chunk_size=1024 * 1024, background_writes=False, fsync_policy="none",
+                 metrics=None, report_path=None, metrics_path=None, metrics_port=None,
+                 block_resources=True, page_load_strategy="eager", headless=False, network_capture=True,
+                 feed_listing=True, rendition="highest", max_bandwidth=None, stream_workers=4,
+                 shared=None):
         self.username = username
         self.password = password
         self.target_profile = target_profile
         self.video_limit = video_limit
         self.max_workers = max_workers
+        self.browser_workers = browser_workers
+        self.segments = segments
+        self.segment_threshold = segment_threshold
+        self.chunk_size = chunk_size
+        self.fsync_policy = fsync_policy
         self.progress_callback = progress_callback
         self.stop_requested = False
         self.paused = False
+        self.popup_buttons = merge_popup_buttons(popup_signatures)
+        self.report_path = report_path
+        self.metrics_path = metrics_path
+        self.metrics_port = metrics_port
         
-        # Create output directory with timestamp
+        # Create output directory with timestamp; resumable and incremental runs reuse a fixed one
         if output_dir:
             self.output_dir = output_dir
+        elif resume or incremental:
+            self.output_dir = f"{target_profile}_reels" if target_profile else "reels"
         else:
             current_time = datetime.now().strftime("%Y-%m-%d_%H%M%S")
             self.output_dir = f"{target_profile}_reels_{current_time}" if target_profile else f"reels_{current_time}"
         
-        self.session = requests.Session()
+        if shared:
+            # Multi-profile batches build every profile on the lead downloader's resources
+            self.share_resources(shared)
+        else:
+            self.writer = BackgroundWriter() if background_writes else None
+            self.waits = WaitBudget(should_stop=lambda: self.stop_requested)
+            self.browser_profile = BrowserProfile(block_resources=block_resources,
+                                                  page_load_strategy=page_load_strategy, headless=headless,
+                                                  capture_network=network_capture)
+            
+            # Shared metrics (batch runs) are collected by their owner
+            self.metrics = metrics or RunMetrics()
+            if not metrics:
+                self.metrics.add_collector(self.collect_metrics)
+            
+            # Every download thread may hold ``segments`` connections to the CDN,
+            # or ``stream_workers`` while it fetches an HLS/DASH stream
+            self.session, self.transport_stats = create_session(max_workers * max(1, segments, stream_workers))
+            self.limiter = RateLimiter()
+            self.fast_resolver = FastResolver(self.session, max_workers=max_workers, limiter=self.limiter,
+                                              metrics=self.metrics) if fast_resolve else None
+            self.reel_feed = ReelFeed(self.session, limiter=self.limiter, metrics=self.metrics,
+                                      rendition=rendition) if feed_listing else None
+            self.stream_downloader = StreamDownloader(
+                self.session, rendition=rendition, max_bandwidth=max_bandwidth, workers=stream_workers,
+                limiter=self.limiter, metrics=self.metrics, chunk_size=chunk_size, fsync=fsync_policy,
+                writer=self.writer, should_stop=lambda: self.stop_requested)
+            self.session_store = SessionStore(f"session_{username}.json") if reuse_session and username else None
+            self.watch_state = WatchState(watch_state_path) if incremental else None
+            self.content_store = ContentStore(store_dir) if store_dir else None
+        self.listed_video_urls = {}
         self.total_downloaded = 0
         self.failed_downloads = []
+        self.results_lock = threading.Lock()
+        self.skipped = 0
+        self.file_stats = {}
+        self.browser_pool = None
+        self.finished_shortcodes = set()
+        # "feed" or "scroll" once iter_reel_links has picked how to list
+        self.listing_source = None
+        self.deduplicated = 0
+        self.bytes_saved = 0
         
         # Create output directory
         if not os.path.exists(self.output_dir):
             os.makedirs(self.output_dir, exist_ok=True)
+        
+        self.manifest = RunManifest(self.output_dir) if resume else None
 
     def log_message(self, message):
         """Send log message to GUI if callback is available"""
@@ -87,7 +166,7 @@ class InstagramReelDownloader:
         # Mobile emulation for better compatibility
         mobile_emulation = {
             "deviceMetrics": {"width": 390, "height": 844, "pixelRatio": 3.0},
-            "userAgent": "Mozilla/5.0 (iPhone; CPU iPhone OS 14_0_1 like Mac OS X) AppleWebKit/605.1.15"
+            "userAgent": DEFAULT_HEADERS["User-Agent"]
         }
         options.add_experimental_option("mobileEmulation", mobile_emulation)
         
@@ -95,6 +174,9 @@ class InstagramReelDownloader:
         options.add_experimental_option('excludeSwitches', ['enable-logging', 'enable-automation'])
         options.add_experimental_option('useAutomationExtension', False)
         
+        # Page load strategy, headless mode and network logging for the blocklist and capture
+        self.browser_profile.apply(options)
+        
         try:
             driver = webdriver.Chrome(options=options)
             return driver
@@ -102,35 +184,27 @@ class InstagramReelDownloader:
             self.log_message(f"❌ Failed to setup Chrome driver: {str(e)}")
             raise
 
-    def handle_popups(self, driver):
-        """Handle Instagram popups"""
-        popup_buttons = {
-            "save_info": ["Not Now", "Not now"],
-            "notifications": ["Not Now", "Not now"],
-            "add_to_home": ["Not Now", "Cancel"],
-            "generic": ["Skip", "Maybe Later", "No Thanks"]
-        }
-
-        for popup_type, button_texts in popup_buttons.items():
-            if self.stop_requested:
-                return
-            for text in button_texts:
-                try:
-                    button = WebDriverWait(driver, 3).until(
-                        EC.element_to_be_clickable((By.XPATH, 
-                            f"//button[contains(text(), '{text}')] | "
-                            f"//div[contains(text(), '{text}') and @role='button']"))
-                    )
-                    button.click()
-                    self.log_message(f"✓ Handled {popup_type} popup")
-                    time.sleep(1)
-                    break
-                except:
-                    continue
+    def handle_popups(self, driver, timeout=3.0):
+        """Dismiss any known Instagram popups; safe to call at any point"""
+        with self.waits.track("handle_popups"):
+            handled = dismiss_popups(driver, self.popup_buttons, timeout=timeout,
+                                     should_stop=lambda: self.stop_requested)
+        for popup_type in handled:
+            self.log_message(f"✓ Handled {popup_type} popup")
 
     def instagram_login(self, driver):
-        """Login to Instagram"""
+        """Login to Instagram, reusing a saved session when it is still valid"""
+        self.browser_profile.release(driver)
+        if self.session_store:
+            try:
+                if self.session_store.restore(driver, self.session):
+                    self.log_message(f"♻️ Reusing saved session for {self.username}")
+                    return True
+            except Exception as e:
+                self.log_message(f"⚠️ Could not restore saved session: {str(e)}")
+
         self.log_message(f"🔐 Logging in as {self.username}...")
+        self.metrics.inc("navigations", page="login")
         driver.get("https://www.instagram.com/accounts/login/")
         wait = WebDriverWait(driver, 30)
         
@@ -145,8 +219,12 @@ class InstagramReelDownloader:
             pass_input.send_keys(self.password)
             pass_input.send_keys(Keys.RETURN)
             
-            # Wait for login to complete
-            time.sleep(5)
+            # Wait until we leave the login page or it shows an error
+            self.waits.wait(
+                "instagram_login.submit",
+                lambda: ("/accounts/login" not in driver.current_url
+                         or driver.find_elements(By.ID, "slfErrorAlert")),
+                timeout=15)
             
             # Handle popups
             self.handle_popups(driver)
@@ -157,140 +235,458 @@ class InstagramReelDownloader:
                 return False
                 
             self.log_message("✅ Login successful!")
+            if self.session_store:
+                self.session_store.save(driver)
             return True
             
         except Exception as e:
             self.log_message(f"❌ Login failed: {str(e)}")
             return False
 
-    def collect_reel_links(self, driver):
-        """Collect reel links from target profile"""
+    def iter_reel_links(self, driver):
+        """Yield reel links from the target profile: from the JSON feed, else by scrolling"""
         self.log_message(f"🔍 Collecting reels from profile: {self.target_profile}")
+        
+        # Incremental runs skip known reels and stop at the first run of them
+        boundary = None
+        if self.watch_state:
+            boundary = ListingBoundary(self.watch_state.known(self.target_profile),
+                                       self.watch_state.retry(self.target_profile))
+        
+        seen = set()
+        if self.reel_feed:
+            self.listing_source = "feed"
+            try:
+                yield from self.iter_feed_links(driver, seen, boundary)
+                return
+            except FeedUnavailable as e:
+                self.log_message(f"📜 Reel feed unavailable ({e}), scrolling the profile instead")
+        self.listing_source = "scroll"
+        yield from self.iter_scrolled_links(driver, seen, boundary)
+
+    def iter_feed_links(self, driver, seen, boundary=None):
+        """Yield reel links page by page from the profile's JSON reel feed.
+
+        Video URLs that come with the listing are kept in
+        ``listed_video_urls``. With a manifest, the cursor is saved after
+        every page, and a listing the last run left unfinished continues
+        from there after replaying the reels it had found.
+        """
+        cursor = None
+        if self.manifest:
+            cursor = self.manifest.listing_cursor(self.target_profile)
+            if cursor:
+                self.log_message("📜 Continuing the reel listing of the last run")
+                for reel_url in self.manifest.listed_reel_urls():
+                    shortcode = shortcode_from_url(reel_url)
+                    if shortcode and shortcode not in seen:
+                        seen.add(shortcode)
+                        yield reel_url
+        
+        self.reel_feed.copy_cookies(driver)
+        for page in self.reel_feed.pages(self.target_profile, cursor):
+            for shortcode, video_url in page.reels:
+                if shortcode in seen:
+                    continue
+                seen.add(shortcode)
+                if boundary and not boundary.is_new(shortcode):
+                    continue
+                if video_url:
+                    self.listed_video_urls[shortcode] = video_url
+                reel_url = canonical_reel_url(shortcode)
+                if self.manifest:
+                    self.manifest.discover(shortcode, reel_url)
+                yield reel_url
+            
+            if boundary and boundary.reached:
+                self.log_message("✨ Reached reels downloaded in an earlier run")
+                return
+            if self.manifest:
+                self.manifest.save_listing_cursor(self.target_profile, page.cursor if page.more else None)
+            if self.stop_requested or not self.wait_if_paused():
+                return
+
+    def iter_scrolled_links(self, driver, seen, boundary=None):
+        """Yield reel links from the profile's grid as they appear while scrolling"""
         profile_url = f"https://www.instagram.com/{self.target_profile}/reels/"
+        # The grid needs its images and styles; a shared driver may come from extraction
+        self.browser_profile.release(driver)
+        self.limiter.acquire(RateLimiter.PAGE)
+        self.metrics.inc("navigations", page="profile")
         driver.get(profile_url)
-        time.sleep(5)
+        self.waits.wait("collect_reel_links.page_load",
+                        lambda: driver.execute_script(REEL_ANCHOR_COUNT_SCRIPT), timeout=10)
+        self.handle_popups(driver, timeout=0.5)
 
-        links = []
-        last_height = driver.execute_script("return document.body.scrollHeight")
+        last_height = driver.execute_script(SCROLL_HEIGHT_SCRIPT)
         attempts_without_new = 0
         
-        while len(links) < (self.video_limit or float('inf')) and not self.stop_requested:
+        while not self.stop_requested:
             # Handle pause
-            while self.paused and not self.stop_requested:
-                time.sleep(0.5)
-            
-            if self.stop_requested:
+            if not self.wait_if_paused():
                 break
-                
-            current_len = len(links)
             
-            elements = driver.find_elements(By.TAG_NAME, "a")
-            for elem in elements:
-                href = elem.get_attribute("href")
-                if href and "/reel/" in href and href not in links:
-                    links.append(href)
-                    self.log_message(f"📱 Found {len(links)} reels...")
-                    self.update_progress(len(links), self.video_limit or 100, "Collecting reels")
-                    if self.video_limit and len(links) >= self.video_limit:
-                        return links[:self.video_limit]
-
-            if len(links) == current_len:
+            new_links = harvest_new_reel_links(driver, seen)
+            for link in new_links:
+                if boundary and not boundary.is_new(shortcode_from_url(link)):
+                    continue
+                yield link
+
+            if boundary and boundary.reached:
+                self.log_message("✨ Reached reels downloaded in an earlier run")
+                break
+
+            # Each scroll makes the page fetch the next set of reels
+            self.limiter.acquire(RateLimiter.PAGE)
+            if not new_links:
                 attempts_without_new += 1
                 if attempts_without_new >= 3:
                     break
             else:
                 attempts_without_new = 0
 
+            self.metrics.inc("navigations", page="scroll")
             driver.execute_script("window.scrollTo(0, document.body.scrollHeight);")
-            time.sleep(2)
-            new_height = driver.execute_script("return document.body.scrollHeight")
-            if new_height == last_height:
+
+            def page_grew():
+                height = driver.execute_script(SCROLL_HEIGHT_SCRIPT)
+                return height if height > last_height else None
+
+            new_height = self.waits.wait("collect_reel_links.scroll", page_grew, timeout=4)
+            if not new_height:
                 break
             last_height = new_height
 
-        return links[:self.video_limit] if self.video_limit else links
+    def iter_listing(self, driver):
+        """The profile's reel links, up to ``video_limit``"""
+        for count, link in enumerate(self.iter_reel_links(driver), 1):
+            yield link
+            if self.video_limit and count >= self.video_limit:
+                return
+
+    def iter_link_slices(self, driver, size):
+        """The profile's reel links in lists of up to ``size``, while it is still being listed.
+
+        A scrolled listing is read to the end with the first slice: resolving
+        the reels moves the browser off the profile grid.
+        """
+        listing = self.iter_listing(driver)
+        drained = False
+        while not self.stop_requested:
+            with self.metrics.time("collect"):
+                links = list(islice(listing, size))
+                if self.listing_source == "scroll" and not drained:
+                    listing = iter(list(listing))
+                    drained = True
+            if not links:
+                return
+            self.metrics.inc("reels_found", len(links))
+            yield links
 
     def extract_video_url(self, driver, reel_url, max_retries=3):
         """Extract video URL from reel page"""
+        self.metrics.reel_started(reel_url)
+        self.browser_profile.prepare(driver)
+        capture = NetworkCapture(self.browser_profile.drain_log) if self.browser_profile.capture_network else None
+        with self.metrics.time("resolve_browser"):
+            video_url = self._extract_video_url(driver, reel_url, max_retries, capture)
+        messages = None
+        if capture:
+            capture.poll(driver)
+            messages = capture.messages
+        for resource_type, count in self.browser_profile.count_blocked(driver, messages).items():
+            self.metrics.inc("blocked_requests", count, type=resource_type)
+        return video_url
+
+    def _extract_video_url(self, driver, reel_url, max_retries, capture=None):
         for attempt in range(max_retries):
             if self.stop_requested:
                 return None
+            if attempt:
+                self.metrics.inc("retries", stage="resolve_browser")
                 
             try:
+                self.limiter.acquire(RateLimiter.PAGE)
+                self.metrics.inc("navigations", page="reel")
+                if capture:
+                    capture.start(driver)
                 driver.get(reel_url)
-                time.sleep(2)
 
                 # Try multiple methods
                 for _ in range(2):
-                    try:
-                        video = WebDriverWait(driver, 5).until(
-                            EC.presence_of_element_located((By.TAG_NAME, "video"))
-                        )
-                        video_url = video.get_attribute("src")
-                        if video_url and video_url.startswith("http"):
+                    found = self.waits.wait("extract_video_url.video_src",
+                                            lambda: find_loaded_video(driver, capture), timeout=5)
+                    if not found and capture and capture.best():
+                        # A media request that is still loading is good enough now
+                        found = "network", capture.best().url
+                    source, video_url = found or (None, None)
+                    if video_url:
+                        self.metrics.inc("resolved_by", source=source)
+                        self.limiter.succeeded(RateLimiter.PAGE)
+                        return video_url
+
+                    if source != "throttled":
+                        # Nothing on the wire or in a <video> (blob: sources): scan the page data
+                        self.metrics.inc("page_source_fallbacks")
+                        page_source = driver.page_source
+                        video_url = find_video_url(page_source)
+                        if video_url:
+                            self.metrics.inc("resolved_by", source="page_source")
+                            self.limiter.succeeded(RateLimiter.PAGE)
                             return video_url
-                    except:
-                        pass
-
-                    page_source = driver.page_source
-                    patterns = [
-                        r'https://[^"]+\.mp4[^"]*',
-                        r'https://[^"]+\.m3u8[^"]*',
-                        r'"video_url":"([^"]+)"'
-                    ]
-                    
-                    for pattern in patterns:
-                        matches = re.findall(pattern, page_source)
-                        if matches:
-                            url = matches[0]
-                            if isinstance(url, tuple):
-                                url = url[0]
-                            return url.replace('\\u0026', '&')
 
-                    time.sleep(1)
+                    if source == "throttled" or RATE_LIMIT_PAGE_TEXT in page_source:
+                        self.log_message("🚦 Instagram is rate limiting page loads, backing off")
+                        self.limiter.throttled(RateLimiter.PAGE)
+                        break
 
             except Exception as e:
                 if attempt == max_retries - 1:
                     self.log_message(f"❌ Failed to extract video URL: {str(e)}")
                 else:
-                    time.sleep(2)
+                    self.waits.sleep("extract_video_url.retry", 2)
+        return None
+
+    def place_file(self, temp_path, filepath, filename, size, digest, video_url=None):
+        """Move a finished temporary file into place, through the content store if enabled"""
+        sha256 = digest.hexdigest()
+        if self.content_store:
+            if not self.content_store.put(temp_path, sha256, size, video_url):
+                self.count_duplicate(size)
+            self.content_store.link(sha256, filepath)
+        else:
+            os.replace(temp_path, filepath)
+        self.file_stats[filename] = (size, sha256)
+
+    def finish_download(self, part_path, filepath, filename, size, digest, video_url=None):
+        """Move a completed .part file into place"""
+        self.place_file(part_path, filepath, filename, size, digest, video_url)
+        self.log_message(f"✅ Downloaded: {filename}")
+        return True
+
+    def count_duplicate(self, size):
+        with self.results_lock:
+            self.deduplicated += 1
+            self.bytes_saved += size
+        self.metrics.inc("deduplicated_videos")
+        self.metrics.inc("deduplicated_bytes", size)
+
+    def link_stored(self, video_url, filename):
+        """Link an already-stored copy of the video instead of downloading it.
+
+        The CDN URL identifies most repeats. Otherwise a stored blob of the
+        same size counts only if its first bytes match the server's.
+        """
+        found = self.content_store.lookup_url(video_url) or self.match_stored_prefix(video_url)
+        if not found:
+            return False
+        sha256, size = found
+        self.content_store.link(sha256, os.path.join(self.output_dir, filename))
+        self.file_stats[filename] = (size, sha256)
+        self.count_duplicate(size)
+        self.log_message(f"♻️ Already stored: {filename}")
+        return True
+
+    def match_stored_prefix(self, video_url):
+        """Return ``(sha256, size)`` of a same-sized blob starting with the same bytes"""
+        response = self.head_video(video_url)
+        length = response.headers.get('Content-Length') if response is not None else None
+        candidates = self.content_store.candidates(int(length)) if length else []
+        if not candidates:
+            return None
+        try:
+            prefix = b''
+            headers = self.download_headers(f"bytes=0-{PREFIX_BYTES - 1}")
+            self.limiter.acquire(RateLimiter.CDN)
+            with self.session.get(video_url, headers=headers, stream=True, timeout=15) as response:
+                self.observe_response(RateLimiter.CDN, response)
+                if response.status_code not in (200, 206):
+                    return None
+                for chunk in response.iter_content(chunk_size=8192):
+                    prefix += chunk
+                    if len(prefix) >= PREFIX_BYTES:
+                        break
+        except Exception:
+            return None
+        prefix = prefix[:PREFIX_BYTES]
+        for sha256 in candidates:
+            if self.content_store.read_prefix(sha256, len(prefix)) == prefix:
+                self.content_store.remember_url(video_url, sha256)
+                return sha256, int(length)
+        return None
+
+    def observe_response(self, kind, response):
+        """Count the response's status and feed it to the rate limiter; True if throttled"""
+        self.metrics.inc("http_responses", kind=kind, status=response.status_code)
+        return self.limiter.observe(kind, response)
+
+    def download_headers(self, byte_range=None):
+        """Extra headers for a video request; the fixed ones are session defaults"""
+        return {"Range": byte_range} if byte_range else None
+
+    def head_video(self, video_url):
+        """HEAD response for the video, or None if the request failed"""
+        self.limiter.acquire(RateLimiter.CDN)
+        try:
+            response = self.session.head(video_url, headers=self.download_headers(),
+                                         allow_redirects=True, timeout=15)
+        except Exception:
+            return None
+        self.observe_response(RateLimiter.CDN, response)
+        return response if response.status_code == 200 else None
+
+    def probe_range_support(self, video_url):
+        """Return the video size if the server accepts byte ranges, else None"""
+        response = self.head_video(video_url)
+        if (response is not None
+                and response.headers.get('Accept-Ranges', '').lower() == 'bytes'
+                and response.headers.get('Content-Length')):
+            return int(response.headers['Content-Length'])
         return None
 
+    def download_segmented(self, video_url, filename, size, max_retries=3):
+        """Fetch ``size`` bytes as ``segments`` parallel byte ranges.
+
+        Segments are written at their offsets into a preallocated temporary
+        file, and each one retries from where it stopped. The temporary file
+        is not resumable across runs, so it is removed on failure or stop.
+        """
+        filepath = os.path.join(self.output_dir, filename)
+        temp_path = filepath + '.segments'
+        segment_size = -(-size // self.segments)
+        ranges = [(start, min(start + segment_size, size) - 1)
+                  for start in range(0, size, segment_size)]
+
+        with open(temp_path, 'wb') as f:
+            f.truncate(size)
+
+        def fetch_segment(start, end):
+            position = start
+            for attempt in range(max_retries):
+                if self.stop_requested:
+                    return False
+                if attempt:
+                    self.metrics.inc("retries", stage="segment")
+                try:
+                    headers = self.download_headers(f"bytes={position}-{end}")
+                    self.limiter.acquire(RateLimiter.CDN)
+                    with self.session.get(video_url, headers=headers, stream=True, timeout=30) as response:
+                        if self.observe_response(RateLimiter.CDN, response):
+                            raise IOError(f"throttled (HTTP {response.status_code})")
+                        if response.status_code != 206:
+                            raise IOError(f"HTTP {response.status_code} for range {position}-{end}")
+                        with FileSink(temp_path, 'r+b', chunk_size=self.chunk_size, offset=position,
+                                      fsync=self.fsync_policy, writer=self.writer) as sink:
+                            try:
+                                sink.stream(response, keep_going=self.wait_if_paused)
+                            finally:
+                                position += sink.written
+                                self.metrics.inc("bytes_downloaded", sink.written)
+                    if self.stop_requested:
+                        return False
+                    if position == end + 1:
+                        return True
+                    raise IOError(f"short segment: {position - start}/{end - start + 1} bytes")
+                except Exception as e:
+                    if attempt == max_retries - 1:
+                        self.log_message(f"❌ Segment {start}-{end} of {filename} failed: {str(e)}")
+                    else:
+                        time.sleep(2)
+            return False
+
+        with ThreadPoolExecutor(max_workers=len(ranges)) as executor:
+            results = list(executor.map(lambda r: fetch_segment(*r), ranges))
+
+        if not all(results):
+            os.remove(temp_path)
+            return False
+
+        # Segments land out of order, so the checksum needs one pass over the file
+        self.place_file(temp_path, filepath, filename, size, hash_file(temp_path), video_url)
+        self.log_message(f"✅ Downloaded: {filename} ({len(ranges)} connections)")
+        return True
+
     def download_video(self, video_url, filename, max_retries=3):
-        """Download video from URL"""
+        """Download video from URL.
+
+        Bytes go to ``<filename>.part`` first. A retry, or a later run after a
+        stop, continues from the end of that file with a ``Range`` request,
+        and the file is only renamed into place once its size matches what
+        the server announced.
+        """
         if self.stop_requested:
             return False
             
         filepath = os.path.join(self.output_dir, filename)
+        part_path = filepath + '.part'
+        
+        # HLS playlists and DASH manifests are joined from their segments
+        if is_stream_url(video_url):
+            return self.download_stream(video_url, filename)
+        
+        if self.content_store and not os.path.exists(part_path) and self.link_stored(video_url, filename):
+            return True
+        
+        # Large files on range-capable servers can be split across connections
+        if self.segments > 1 and not os.path.exists(part_path):
+            size = self.probe_range_support(video_url)
+            if size and size >= self.segment_threshold:
+                return self.download_segmented(video_url, filename, size, max_retries)
         
         for attempt in range(max_retries):
             if self.stop_requested:
                 return False
+            if attempt:
+                self.metrics.inc("retries", stage="download")
                 
             try:
-                headers = {
-                    "User-Agent": "Mozilla/5.0 (iPhone; CPU iPhone OS 14_0_1 like Mac OS X) AppleWebKit/605.1.15",
-                    "Accept": "*/*",
-                    "Accept-Encoding": "gzip, deflate, br",
-                }
+                offset = os.path.getsize(part_path) if os.path.exists(part_path) else 0
+                headers = self.download_headers(f"bytes={offset}-" if offset else None)
+                self.limiter.acquire(RateLimiter.CDN)
                 
                 with self.session.get(video_url, headers=headers, stream=True, timeout=30) as response:
-                    if response.status_code == 200:
-                        with open(filepath, 'wb') as f:
-                            for chunk in response.iter_content(chunk_size=8192):
-                                if chunk and not self.stop_requested:
-                                    f.write(chunk)
-                        
-                        if not self.stop_requested:
-                            self.log_message(f"✅ Downloaded: {filename}")
-                            return True
-                        else:
-                            # Clean up partial download
-                            if os.path.exists(filepath):
-                                os.remove(filepath)
-                            return False
-                    else:
+                    if self.observe_response(RateLimiter.CDN, response):
+                        # The limiter holds every download back until Retry-After passes
+                        self.log_message(f"🚦 CDN throttled {filename} (HTTP {response.status_code}), "
+                                         f"attempt {attempt + 1}/{max_retries}")
+                        continue
+                    
+                    plan = resume_plan(response.status_code, response.headers, offset)
+                    total = plan.total
+                    if plan.action == "complete":
+                        return self.finish_download(part_path, filepath, filename,
+                                                    offset, hash_file(part_path), video_url)
+                    if plan.action == "restart":
+                        os.remove(part_path)
+                        continue
+                    if plan.action == "retry":
                         self.log_message(f"⚠️ Download failed (HTTP {response.status_code}), attempt {attempt + 1}/{max_retries}")
+                        continue
+                    if plan.action == "append":
+                        mode = 'ab'
+                        digest = hash_file(part_path)
+                    elif is_stream_type(response.headers.get('Content-Type')):
+                        return self.download_stream(video_url, filename, manifest=response.text)
+                    else:
+                        offset = 0
+                        mode = 'wb'
+                        digest = hashlib.sha256()
+                    
+                    with FileSink(part_path, mode, chunk_size=self.chunk_size, expected_size=total,
+                                  fsync=self.fsync_policy, writer=self.writer) as sink:
+                        try:
+                            size = offset + sink.stream(response, digest, keep_going=self.wait_if_paused)
+                        finally:
+                            self.metrics.inc("bytes_downloaded", sink.written)
+                    
+                    if self.stop_requested:
+                        # Keep the .part file so the next attempt can resume it
+                        return False
+                    
+                    if total is not None and size != total:
+                        raise IOError(f"incomplete download: {size}/{total} bytes")
+                    
+                    return self.finish_download(part_path, filepath, filename, size, digest, video_url)
                         
             except Exception as e:
                 if attempt == max_retries - 1:
@@ -299,6 +695,49 @@ class InstagramReelDownloader:
                     time.sleep(2)
         return False
 
+    def download_stream(self, video_url, filename, manifest=None):
+        """Download an HLS playlist or DASH manifest as one video file.
+
+        The rendition follows the ``rendition``/``max_bandwidth`` policy. A
+        separate audio track (DASH, or an HLS audio group) is saved next to
+        the video as ``.m4a``. Streams are not resumable across runs: a partial file is removed.
+        """
+        try:
+            stream = self.stream_downloader.load(video_url, manifest)
+        except (StreamError, IOError, ValueError) as e:
+            if not self.stop_requested:
+                self.log_message(f"❌ Cannot download the stream for {filename}: {str(e)}")
+            return False
+        self.log_message(f"🎞️ {filename}: {stream.kind.upper()} {rendition_label(stream.video)}")
+        self.metrics.inc("streams", kind=stream.kind)
+        
+        tracks = [(stream.video, filename)]
+        if stream.audio:
+            tracks.append((stream.audio, os.path.splitext(filename)[0] + '.m4a'))
+        for rendition, name in tracks:
+            if not self.save_rendition(rendition, name, video_url):
+                return False
+        return True
+
+    def save_rendition(self, rendition, filename, video_url):
+        """Save one rendition of a stream, segment by segment, as ``filename``"""
+        url = self.stream_downloader.whole_file(rendition)
+        if url:
+            # One plain file: the regular path handles resume and parallel ranges
+            return self.download_video(url, filename)
+        
+        filepath = os.path.join(self.output_dir, filename)
+        temp_path = filepath + '.stream'
+        try:
+            size, digest = self.stream_downloader.save(rendition, temp_path, keep_going=self.wait_if_paused)
+        except Exception as e:
+            if not self.stop_requested:
+                self.log_message(f"❌ Failed to download {filename}: {str(e)}")
+            return False
+        self.place_file(temp_path, filepath, filename, size, digest, video_url)
+        self.log_message(f"✅ Downloaded: {filename} ({len(rendition.segments)} segments)")
+        return True
+
     def stop_download(self):
         """Stop the download process"""
         self.stop_requested = True
@@ -314,63 +753,384 @@ class InstagramReelDownloader:
         self.paused = False
         self.log_message("▶️ Download resumed")
 
+    def wait_if_paused(self):
+        """Block while paused; returns False if a stop was requested"""
+        while self.paused and not self.stop_requested:
+            time.sleep(0.5)
+        return not self.stop_requested
+
+    def reel_filename(self, idx, reel_url):
+        """Name reels by shortcode when a manifest tracks them, else by position"""
+        shortcode = shortcode_from_url(reel_url)
+        if (self.manifest or self.watch_state) and shortcode:
+            return f"reel_{shortcode}.mp4"
+        return f"reel_{idx:03d}.mp4"
+
+    def skip_finished(self, reel_links):
+        """Record reels in the manifest and drop the ones already downloaded"""
+        if not self.manifest:
+            return reel_links
+
+        remaining = []
+        seen = set()
+        skipped = self.skipped
+        for reel_url in reel_links:
+            shortcode = shortcode_from_url(reel_url)
+            if not shortcode:
+                remaining.append(reel_url)
+                continue
+            if shortcode in seen:
+                continue
+            seen.add(shortcode)
+            self.manifest.discover(shortcode, reel_url)
+            if self.manifest.is_downloaded(shortcode, self.output_dir):
+                self.skipped += 1
+                self.metrics.inc("reels", result="skipped")
+                self.finished_shortcodes.add(shortcode)
+            else:
+                remaining.append(reel_url)
+
+        if self.skipped > skipped:
+            self.log_message(f"⏭️ Skipping {self.skipped - skipped} reels already downloaded")
+        return remaining
+
+    def download_reel(self, idx, reel_url, video_url):
+        """Download one resolved reel and record the outcome in the manifest"""
+        filename = self.reel_filename(idx, reel_url)
+        with self.metrics.time("download"):
+            success = self.download_video(video_url, filename)
+        shortcode = shortcode_from_url(reel_url)
+        if success and self.manifest and shortcode:
+            size, sha256 = self.file_stats[filename]
+            self.manifest.mark_downloaded(shortcode, filename, size, sha256)
+        return success
+
+    def resolve_video_urls(self, driver, reel_links, start_idx=1):
+        """Yield ``(idx, reel_url, video_url)`` for each reel, numbering from ``start_idx``.
+
+        Reels whose video URL came with the listing or is already in the
+        manifest are yielded without touching the browser, then the HTTP
+        fast path is tried with the driver's cookies. Whatever is left uses
+        the logged-in ``driver`` directly, or a pool of ``browser_workers``
+        browsers when more than one is configured (or a shared
+        ``browser_pool`` is attached).
+        """
+        pending = []
+        for idx, reel_url in enumerate(reel_links, start_idx):
+            shortcode = shortcode_from_url(reel_url)
+            video_url = self.listed_video_urls.get(shortcode)
+            if video_url:
+                self.metrics.inc("listed_video_urls")
+                if self.manifest:
+                    self.manifest.mark_resolved(shortcode, video_url)
+            elif self.manifest:
+                entry = self.manifest.get(shortcode)
+                if entry and entry['state'] == RunManifest.RESOLVED and entry['video_url']:
+                    video_url = entry['video_url']
+            if video_url:
+                self.metrics.reel_started(reel_url)
+                yield idx, reel_url, video_url
+            else:
+                pending.append((idx, reel_url))
+
+        for idx, reel_url, video_url in self._resolve_pending(driver, pending):
+            shortcode = shortcode_from_url(reel_url)
+            if video_url and self.manifest and shortcode:
+                self.manifest.mark_resolved(shortcode, video_url)
+            yield idx, reel_url, video_url
+
+    def create_browser_pool(self):
+        """A pool of ``browser_workers`` logged-in browsers (not yet started)"""
+        return BrowserPool(self.setup_driver, self.instagram_login, self.extract_video_url,
+                           num_workers=self.browser_workers, log=self.log_message,
+                           wait=self.wait_if_paused)
+
+    def _resolve_pending(self, driver, pending):
+        if self.fast_resolver and pending:
+            self.fast_resolver.copy_cookies(driver)
+            unresolved = []
+            for idx, reel_url, video_url in self.fast_resolver.resolve_many(pending):
+                if self.stop_requested:
+                    return
+                if video_url:
+                    yield idx, reel_url, video_url
+                else:
+                    unresolved.append((idx, reel_url))
+            if unresolved:
+                self.log_message(f"🌐 {len(unresolved)} reels need the browser")
+            pending = sorted(unresolved)
+
+        yield from self._extract_pending(driver, pending)
+
+    def _extract_pending(self, driver, pending):
+        if not pending:
+            return
+
+        if self.browser_pool:
+            for position, reel_url, video_url in self.browser_pool.resolve(
+                    [reel_url for _, reel_url in pending]):
+                yield pending[position - 1][0], reel_url, video_url
+            return
+
+        if self.browser_workers > 1:
+            with self.create_browser_pool() as pool:
+                for position, reel_url, video_url in pool.resolve(
+                        [reel_url for _, reel_url in pending]):
+                    yield pending[position - 1][0], reel_url, video_url
+            return
+
+        for idx, reel_url in pending:
+            if not self.wait_if_paused():
+                return
+            self.log_message(f"📥 Processing reel {idx}")
+            yield idx, reel_url, self.extract_video_url(driver, reel_url)
+
+    def record_result(self, success, reel_url):
+        """Count a finished reel and record failures in the manifest"""
+        shortcode = shortcode_from_url(reel_url)
+        self.metrics.reel_finished(reel_url, "downloaded" if success else "failed")
+        with self.results_lock:
+            if success:
+                self.total_downloaded += 1
+                self.finished_shortcodes.add(shortcode)
+            else:
+                self.failed_downloads.append(reel_url)
+        if not success and self.manifest and shortcode:
+            self.manifest.mark_failed(shortcode)
+
+    def share_resources(self, lead):
+        """Use another downloader's session, resolvers, budgets, writer, stores and metrics"""
+        self.session = lead.session
+        self.transport_stats = lead.transport_stats
+        self.fast_resolver = lead.fast_resolver
+        self.reel_feed = lead.reel_feed
+        self.stream_downloader = lead.stream_downloader
+        self.session_store = lead.session_store
+        self.waits = lead.waits
+        self.limiter = lead.limiter
+        self.metrics = lead.metrics
+        self.browser_profile = lead.browser_profile
+        self.writer = lead.writer
+        self.watch_state = lead.watch_state
+        self.content_store = lead.content_store
+
+    def update_watch_state(self, reel_links):
+        """Remember which of this run's reels are done, and which to retry next time"""
+        if not self.watch_state:
+            return
+        done, failed = [], []
+        for reel_url in reel_links:
+            shortcode = shortcode_from_url(reel_url)
+            if shortcode in self.finished_shortcodes:
+                done.append(shortcode)
+            elif shortcode:
+                failed.append(shortcode)
+        self.watch_state.remember(self.target_profile, done, failed)
+
+    def resolve_listing(self, driver, collected):
+        """Yield ``(self, idx, reel_url, video_url)`` while the profile is still being listed.
+
+        Links are listed, checked against the manifest and resolved a slice
+        at a time, so the first downloads start after the first feed page
+        instead of after the whole listing. Every listed link is appended to
+        ``collected``.
+        """
+        next_idx = 1
+        for links in self.iter_link_slices(driver, self.max_workers * 2):
+            collected.extend(links)
+            self.log_message(f"📱 Found {len(collected)} reels...")
+            for idx, reel_url, video_url in self.resolve_video_urls(
+                    driver, self.skip_finished(links), start_idx=next_idx):
+                yield self, idx, reel_url, video_url
+            next_idx += len(links)
+
+    def run_pipeline(self, resolved, total):
+        """Download resolved reels while more are still being resolved.
+
+        ``resolved`` yields ``(owner, idx, reel_url, video_url)``, where
+        ``owner`` is the downloader whose output directory and manifest the
+        reel belongs to (``self`` except in multi-profile batches). Items go
+        into a bounded queue that a pool of ``max_workers`` threads drains,
+        so downloads overlap extraction and the queue size caps how far
+        extraction can run ahead. If ``resolved`` raises, the reels already
+        queued are still downloaded before the error is passed on.
+        ``total`` is the number of reels for the progress bar, or a function
+        returning it while reels are still being listed.
+        """
+        work_queue = queue.Queue(maxsize=self.max_workers * 2)
+
+        def put(item):
+            # Retry with a timeout so a full queue never blocks a stop
+            while not self.stop_requested:
+                try:
+                    work_queue.put(item, timeout=0.5)
+                    return True
+                except queue.Full:
+                    continue
+            return False
+
+        def download_worker():
+            while True:
+                try:
+                    item = work_queue.get(timeout=0.5)
+                except queue.Empty:
+                    if self.stop_requested:
+                        return
+                    continue
+                if item is None:
+                    return
+                owner, idx, reel_url, video_url = item
+                if not self.wait_if_paused():
+                    return
+                try:
+                    success = owner.download_reel(idx, reel_url, video_url)
+                except Exception as e:
+                    self.log_message(f"❌ Download failed: {str(e)}")
+                    success = False
+                owner.record_result(success, reel_url)
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            workers = [executor.submit(download_worker) for _ in range(self.max_workers)]
+
+            try:
+                for count, (owner, idx, reel_url, video_url) in enumerate(resolved, 1):
+                    self.update_progress(count, total() if callable(total) else total, f"Resolved reel {idx}")
+                    if video_url:
+                        if not put((owner, idx, reel_url, video_url)):
+                            break
+                    elif not self.stop_requested:
+                        owner.record_result(False, reel_url)
+            finally:
+                # One sentinel per worker once extraction is finished or has failed,
+                # or the executor would wait on them forever
+                for _ in workers:
+                    if not put(None):
+                        break
+
+            for future in as_completed(workers):
+                future.result()
+
+    def collect_metrics(self, metrics):
+        """Copy the limiter, wait, connection and extractor totals into gauges"""
+        for kind, seconds, events, requests_made, rate in self.limiter.report():
+            metrics.set("limiter_wait_seconds", round(seconds, 3), kind=kind)
+            metrics.set("limiter_throttle_events", events, kind=kind)
+            metrics.set("limiter_requests", requests_made, kind=kind)
+            metrics.set("limiter_rate", round(rate, 4), kind=kind)
+        for site, seconds, count in self.waits.report():
+            metrics.set("wait_seconds", round(seconds, 3), site=site)
+            metrics.set("wait_calls", count, site=site)
+        requests_made, connections, _ = self.transport_stats.report()
+        metrics.set("http_requests", requests_made)
+        metrics.set("http_connections", connections)
+        for name, stats in default_chain.stats().items():
+            metrics.set("extractor_attempts", stats['attempts'], extractor=name)
+            metrics.set("extractor_hits", stats['hits'], extractor=name)
+
+    def serve_metrics(self):
+        """Start the Prometheus endpoint on ``metrics_port``, if one is set"""
+        if not self.metrics_port or self.metrics.server:
+            return
+        try:
+            self.metrics.serve(self.metrics_port)
+            self.log_message(f"📈 Metrics at http://127.0.0.1:{self.metrics_port}/metrics")
+        except OSError as e:
+            self.log_message(f"⚠️ Could not start the metrics endpoint: {str(e)}")
+
+    def publish_metrics(self):
+        """Write the JSON run report, and the Prometheus text file if one is set"""
+        report_path = self.report_path or os.path.join(self.output_dir, "run_report.json")
+        try:
+            self.metrics.write_report(report_path)
+            if self.metrics_path:
+                self.metrics.write_prometheus(self.metrics_path)
+        except OSError as e:
+            self.log_message(f"⚠️ Could not write the run report: {str(e)}")
+            return None
+        return report_path
+
+    def log_stage_timings(self):
+        """Summary lines for throughput, per-stage latency, URL sources and blocked page requests"""
+        report = self.metrics.report()
+        latency = report['reel_latency']
+        line = f"📈 {report['reels_per_sec']:.2f} reels/s, {report['mb_per_sec']:.1f} MB/s"
+        if latency:
+            line += f", p95 per reel {latency['p95']:.1f}s"
+        self.log_message(line)
+        for stage, stats in report['stages'].items():
+            self.log_message(f"⏱️ {stage}: {stats['count']} calls, mean {stats['mean']:.2f}s, "
+                             f"p95 {stats['p95']:.2f}s")
+        blocked = {row['labels']['type']: row['value'] for row in report['counters']
+                   if row['name'] == "blocked_requests"}
+        if blocked:
+            details = ", ".join(f"{kind} {count}" for kind, count in
+                                sorted(blocked.items(), key=lambda item: item[1], reverse=True))
+            self.log_message(f"🧱 Blocked {sum(blocked.values())} page requests ({details})")
+        sources = {row['labels']['source']: row['value'] for row in report['counters']
+                   if row['name'] == "resolved_by"}
+        if sources:
+            details = ", ".join(f"{source} {count}" for source, count in sorted(sources.items()))
+            self.log_message(f"🔎 Video URLs found in the browser by: {details}")
+
     def run(self):
         """Main execution method"""
         start_time = time.time()
         driver = None
+        self.serve_metrics()
         
         try:
             driver = self.setup_driver()
             
-            if not self.instagram_login(driver):
+            with self.metrics.time("login"):
+                logged_in = self.instagram_login(driver)
+            if not logged_in:
                 return False
                 
-            reel_links = self.collect_reel_links(driver)
-            if not reel_links:
+            # One pool for every slice of the listing
+            if self.browser_workers > 1:
+                self.browser_pool = self.create_browser_pool().start()
+            
+            collected = []
+            self.run_pipeline(self.resolve_listing(driver, collected), lambda: len(collected))
+            self.update_watch_state(collected)
+            if not collected and self.watch_state:
+                self.log_message("✨ No new reels since the last run")
+                return True
+            if not collected:
                 self.log_message("❌ No reels found!")
                 return False
 
-            self.log_message(f"📱 Found {len(reel_links)} reels to download")
-            
-            total_successful = 0
-            total_failed = 0
-
-            # Process each reel
-            for idx, reel_url in enumerate(reel_links, 1):
-                if self.stop_requested:
-                    break
-                    
-                # Handle pause
-                while self.paused and not self.stop_requested:
-                    time.sleep(0.5)
-                
-                if self.stop_requested:
-                    break
-                
-                self.log_message(f"📥 Processing reel {idx}/{len(reel_links)}")
-                self.update_progress(idx, len(reel_links), f"Processing reel {idx}")
-                
-                video_url = self.extract_video_url(driver, reel_url)
-                if video_url:
-                    filename = f"reel_{idx:03d}.mp4"
-                    if self.download_video(video_url, filename):
-                        total_successful += 1
-                    else:
-                        total_failed += 1
-                        self.failed_downloads.append(reel_url)
-                else:
-                    total_failed += 1
-                    self.failed_downloads.append(reel_url)
+            found = len(collected)
+            total_successful, total_failed = self.total_downloaded, len(self.failed_downloads)
 
             # Final summary
             elapsed_time = time.time() - start_time
             self.log_message(f"\n=== 📑 Download Summary ===")
-            self.log_message(f"🎯 Total reels found: {len(reel_links)}")
+            self.log_message(f"🎯 Total reels found: {found}")
+            if self.skipped:
+                self.log_message(f"⏭️ Already downloaded: {self.skipped}")
             self.log_message(f"✅ Successfully downloaded: {total_successful}")
             self.log_message(f"❌ Failed downloads: {total_failed}")
+            if self.deduplicated:
+                self.log_message(f"♻️ Deduplicated: {self.deduplicated} videos "
+                                 f"({self.bytes_saved / (1024 * 1024):.1f} MB stored once)")
             self.log_message(f"⏱️ Time taken: {elapsed_time:.2f} seconds")
             if total_successful > 0:
                 self.log_message(f"⚡ Average time per video: {elapsed_time/total_successful:.2f} seconds")
+            for name, stats in default_chain.stats().items():
+                if stats['attempts']:
+                    self.log_message(f"🔎 {name}: {stats['hits']}/{stats['attempts']} pages ({stats['hit_rate']:.0%})")
+            for site, seconds, count in self.waits.report():
+                self.log_message(f"⏳ {site}: {seconds:.1f}s over {count} waits")
+            for kind, seconds, events, requests_made, rate in self.limiter.report():
+                if requests_made:
+                    self.log_message(f"🚦 {kind}: {requests_made} requests, held back {seconds:.1f}s, "
+                                     f"throttled {events}x, rate now {rate:.2f}/s")
+            requests_made, connections, reused = self.transport_stats.report()
+            if requests_made:
+                self.log_message(f"🔌 HTTP: {requests_made} requests over {connections} connections "
+                                 f"({reused:.0%} reused)")
+            self.log_stage_timings()
             self.log_message(f"📁 Files saved in: {os.path.abspath(self.output_dir)}")
             
             return True
@@ -379,11 +1139,28 @@ class InstagramReelDownloader:
             self.log_message(f"❌ An error occurred: {str(e)}")
             return False
         finally:
+            if self.browser_pool:
+                self.browser_pool.close()
+                self.browser_pool = None
             if driver:
                 driver.quit()
+            report_path = self.publish_metrics()
+            if report_path:
+                self.log_message(f"📊 Run report: {os.path.abspath(report_path)}")
+            self.metrics.close()
+            if self.manifest:
+                self.manifest.close()
+            if self.content_store:
+                self.content_store.close()
+            if self.writer:
+                self.writer.close()
 
 
 class InstagramScraperGUI:
+    # Lines kept in the log view (older ones scroll out); settings.json: log_view_lines
+    LOG_VIEW_LINES = 2000
+    LOG_FILE = "reel_downloader.log"
+
     def __init__(self, root):
         self.root = root
         self.root.title("Instagram Reel Downloader")
@@ -400,6 +1177,18 @@ class InstagramScraperGUI:
         self.target_profile_var = tk.StringVar()
         self.video_limit_var = tk.StringVar(value="10")
         self.max_workers_var = tk.StringVar(value="5")
+        self.browser_workers_var = tk.StringVar(value="1")
+        self.segments_var = tk.StringVar(value="1")
+        self.resume_var = tk.BooleanVar(value=False)
+        self.fast_resolve_var = tk.BooleanVar(value=True)
+        self.reuse_session_var = tk.BooleanVar(value=True)
+        self.incremental_var = tk.BooleanVar(value=False)
+        self.watch_minutes_var = tk.StringVar(value="0")
+        self.dedupe_var = tk.BooleanVar(value=False)
+        self.save_log_var = tk.BooleanVar(value=False)
+        self.block_resources_var = tk.BooleanVar(value=True)
+        self.headless_var = tk.BooleanVar(value=False)
+        self.save_bandwidth_var = tk.BooleanVar(value=False)
         self.output_dir_var = tk.StringVar()
         
         # Download control
@@ -407,9 +1196,20 @@ class InstagramScraperGUI:
         self.download_thread = None
         self.is_downloading = False
         self.is_paused = False
+        self.watch_interval = 0
+        
+        # Extra popup signatures, the page load strategy, network capture, the JSON
+        # reel listing and the stream bandwidth cap, only configurable through settings.json
+        self.popup_signatures = None
+        self.page_load_strategy = "eager"
+        self.network_capture = True
+        self.feed_listing = True
+        self.max_bandwidth_kbps = None
         
-        # Message queue for thread communication
-        self.message_queue = queue.Queue()
+        # Messages from the download thread, applied to the UI once per tick
+        self.messages = MessageChannel()
+        self.log_view_lines = self.LOG_VIEW_LINES
+        self.log_line_count = 0
         
         self.setup_ui()
         self.load_settings()
@@ -447,7 +1247,7 @@ class InstagramScraperGUI:
             row=1, column=1, sticky=(tk.W, tk.E), padx=(10, 0), pady=2)
         
         # Target Profile
-        ttk.Label(config_frame, text="Target Profile:").grid(row=2, column=0, sticky=tk.W, pady=2)
+        ttk.Label(config_frame, text="Target Profile(s):").grid(row=2, column=0, sticky=tk.W, pady=2)
         ttk.Entry(config_frame, textvariable=self.target_profile_var, width=30).grid(
             row=2, column=1, sticky=(tk.W, tk.E), padx=(10, 0), pady=2)
         
@@ -463,16 +1263,69 @@ class InstagramScraperGUI:
         ttk.Entry(config_frame, textvariable=self.max_workers_var, width=10).grid(
             row=4, column=1, sticky=tk.W, padx=(10, 0), pady=2)
         
+        # Browser Workers
+        ttk.Label(config_frame, text="Browser Workers:").grid(row=5, column=0, sticky=tk.W, pady=2)
+        ttk.Entry(config_frame, textvariable=self.browser_workers_var, width=10).grid(
+            row=5, column=1, sticky=tk.W, padx=(10, 0), pady=2)
+        
+        # Connections per video
+        ttk.Label(config_frame, text="Connections per Video:").grid(row=6, column=0, sticky=tk.W, pady=2)
+        segments_frame = ttk.Frame(config_frame)
+        segments_frame.grid(row=6, column=1, sticky=(tk.W, tk.E), padx=(10, 0), pady=2)
+        ttk.Entry(segments_frame, textvariable=self.segments_var, width=10).pack(side=tk.LEFT)
+        ttk.Label(segments_frame, text="(used for videos over 8 MB)").pack(side=tk.LEFT, padx=(10, 0))
+        
         # Output Directory
-        ttk.Label(config_frame, text="Output Directory:").grid(row=5, column=0, sticky=tk.W, pady=2)
+        ttk.Label(config_frame, text="Output Directory:").grid(row=7, column=0, sticky=tk.W, pady=2)
         dir_frame = ttk.Frame(config_frame)
-        dir_frame.grid(row=5, column=1, sticky=(tk.W, tk.E), padx=(10, 0), pady=2)
+        dir_frame.grid(row=7, column=1, sticky=(tk.W, tk.E), padx=(10, 0), pady=2)
         dir_frame.columnconfigure(0, weight=1)
         ttk.Entry(dir_frame, textvariable=self.output_dir_var).grid(
             row=0, column=0, sticky=(tk.W, tk.E))
         ttk.Button(dir_frame, text="Browse", command=self.browse_directory).grid(
             row=0, column=1, padx=(5, 0))
         
+        # Resume
+        ttk.Checkbutton(config_frame, text="Resume previous run (skip downloaded reels)",
+                        variable=self.resume_var).grid(row=8, column=1, sticky=tk.W, padx=(10, 0), pady=2)
+        
+        # Fast resolve
+        ttk.Checkbutton(config_frame, text="Resolve video URLs over HTTP before using the browser",
+                        variable=self.fast_resolve_var).grid(row=9, column=1, sticky=tk.W, padx=(10, 0), pady=2)
+        
+        # Session reuse
+        ttk.Checkbutton(config_frame, text="Remember login session between runs",
+                        variable=self.reuse_session_var).grid(row=10, column=1, sticky=tk.W, padx=(10, 0), pady=2)
+        
+        # Incremental
+        ttk.Checkbutton(config_frame, text="Only new reels (stop at reels downloaded before)",
+                        variable=self.incremental_var).grid(row=11, column=1, sticky=tk.W, padx=(10, 0), pady=2)
+        
+        # Content store
+        ttk.Checkbutton(config_frame, text="Store each video once (hard-link duplicates from reel_store/)",
+                        variable=self.dedupe_var).grid(row=12, column=1, sticky=tk.W, padx=(10, 0), pady=2)
+        
+        # Watch interval
+        ttk.Label(config_frame, text="Watch Every (min):").grid(row=13, column=0, sticky=tk.W, pady=2)
+        watch_frame = ttk.Frame(config_frame)
+        watch_frame.grid(row=13, column=1, sticky=(tk.W, tk.E), padx=(10, 0), pady=2)
+        ttk.Entry(watch_frame, textvariable=self.watch_minutes_var, width=10).pack(side=tk.LEFT)
+        ttk.Label(watch_frame, text="(0 = run once; watching implies only new reels)").pack(side=tk.LEFT, padx=(10, 0))
+        
+        # Full log file
+        ttk.Checkbutton(config_frame, text=f"Also write the full log to {self.LOG_FILE}",
+                        variable=self.save_log_var).grid(row=14, column=1, sticky=tk.W, padx=(10, 0), pady=2)
+        
+        # Lean extraction browsers
+        ttk.Checkbutton(config_frame, text="Skip images, fonts, styles and trackers on reel pages",
+                        variable=self.block_resources_var).grid(row=15, column=1, sticky=tk.W, padx=(10, 0), pady=2)
+        ttk.Checkbutton(config_frame, text="Run Chrome headless (no browser window)",
+                        variable=self.headless_var).grid(row=16, column=1, sticky=tk.W, padx=(10, 0), pady=2)
+        
+        # Rendition policy for adaptive streams and multi-version listings
+        ttk.Checkbutton(config_frame, text="Save bandwidth: download the lowest quality available",
+                        variable=self.save_bandwidth_var).grid(row=17, column=1, sticky=tk.W, padx=(10, 0), pady=2)
+        
         # Control buttons
         button_frame = ttk.Frame(main_frame)
         button_frame.grid(row=2, column=0, columnspan=3, pady=10)
@@ -527,41 +1380,55 @@ class InstagramScraperGUI:
     def clear_log(self):
         """Clear the log text"""
         self.log_text.delete(1.0, tk.END)
+        self.log_line_count = 0
 
     def log_message(self, message):
         """Add message to log"""
         timestamp = datetime.now().strftime("%H:%M:%S")
-        self.log_text.insert(tk.END, f"[{timestamp}] {message}\n")
-        self.log_text.see(tk.END)
+        self.append_log([f"[{timestamp}] {message}"])
+
+    def append_log(self, lines):
+        """Insert lines with one widget call and drop the oldest past ``log_view_lines``"""
+        text = "\n".join(lines) + "\n"
+        # Only follow new output if the view is already at the bottom
+        following = self.log_text.yview()[1] >= 1.0
+        self.log_text.insert(tk.END, text)
+        self.log_line_count += text.count("\n")
+        excess = self.log_line_count - self.log_view_lines
+        if excess > 0:
+            self.log_text.delete("1.0", f"{excess + 1}.0")
+            self.log_line_count -= excess
+        if following:
+            self.log_text.see(tk.END)
 
     def progress_callback(self, msg_type, data):
         """Callback for progress updates from downloader"""
-        self.message_queue.put((msg_type, data))
+        self.messages.put(msg_type, data)
 
     def check_messages(self):
-        """Check for messages from downloader thread"""
-        try:
-            while True:
-                msg_type, data = self.message_queue.get_nowait()
-                
-                if msg_type == 'log':
-                    self.log_message(data)
-                elif msg_type == 'progress':
-                    current = data['current']
-                    total = data['total']
-                    status = data['status']
-                    
-                    if total > 0:
-                        progress_percent = (current / total) * 100
-                        self.progress_bar['value'] = progress_percent
-                        self.progress_var.set(f"{status}: {current}/{total} ({progress_percent:.1f}%)")
-                    else:
-                        self.progress_var.set(status)
-                elif msg_type == 'finished':
-                    self.download_finished()
-                    
-        except queue.Empty:
-            pass
+        """Apply the messages gathered from the downloader thread since the last tick"""
+        lines, dropped, progress, events = self.messages.drain()
+        if dropped:
+            note = f" (all of them are in {self.LOG_FILE})" if self.messages.log_file else ""
+            lines.insert(0, f"[…] {dropped} log lines skipped to keep up{note}")
+        if lines:
+            self.append_log(lines)
+        
+        if progress:
+            current = progress['current']
+            total = progress['total']
+            status = progress['status']
+            
+            if total > 0:
+                progress_percent = (current / total) * 100
+                self.progress_bar['value'] = progress_percent
+                self.progress_var.set(f"{status}: {current}/{total} ({progress_percent:.1f}%)")
+            else:
+                self.progress_var.set(status)
+        
+        for msg_type, data in events:
+            if msg_type == 'finished':
+                self.download_finished()
         
         # Schedule next check
         self.root.after(100, self.check_messages)
@@ -598,6 +1465,32 @@ class InstagramScraperGUI:
             messagebox.showerror("Error", "Parallel downloads must be a valid number")
             return False
         
+        try:
+            browsers = int(self.browser_workers_var.get())
+            if browsers <= 0 or browsers > 8:
+                messagebox.showerror("Error", "Browser workers must be between 1 and 8")
+                return False
+        except ValueError:
+            messagebox.showerror("Error", "Browser workers must be a valid number")
+            return False
+        
+        try:
+            segments = int(self.segments_var.get())
+            if segments <= 0 or segments > 16:
+                messagebox.showerror("Error", "Connections per video must be between 1 and 16")
+                return False
+        except ValueError:
+            messagebox.showerror("Error", "Connections per video must be a valid number")
+            return False
+        
+        try:
+            if float(self.watch_minutes_var.get() or 0) < 0:
+                messagebox.showerror("Error", "Watch interval cannot be negative")
+                return False
+        except ValueError:
+            messagebox.showerror("Error", "Watch interval must be a valid number")
+            return False
+        
         return True
 
     def start_download(self):
@@ -615,18 +1508,58 @@ class InstagramScraperGUI:
         video_limit = self.video_limit_var.get().strip()
         video_limit = int(video_limit) if video_limit else None
         max_workers = int(self.max_workers_var.get())
+        browser_workers = int(self.browser_workers_var.get())
+        resume = self.resume_var.get()
+        segments = int(self.segments_var.get())
+        fast_resolve = self.fast_resolve_var.get()
+        reuse_session = self.reuse_session_var.get()
+        self.watch_interval = float(self.watch_minutes_var.get() or 0) * 60
+        incremental = self.incremental_var.get() or bool(self.watch_interval)
         output_dir = self.output_dir_var.get().strip() or None
         
-        # Create downloader
-        self.downloader = InstagramReelDownloader(
-            username=username,
-            password=password,
-            target_profile=target_profile,
-            video_limit=video_limit,
-            max_workers=max_workers,
-            output_dir=output_dir,
-            progress_callback=self.progress_callback
+        options = dict(
+            browser_workers=browser_workers,
+            resume=resume,
+            segments=segments,
+            fast_resolve=fast_resolve,
+            reuse_session=reuse_session,
+            popup_signatures=self.popup_signatures,
+            incremental=incremental,
+            store_dir="reel_store" if self.dedupe_var.get() else None,
+            block_resources=self.block_resources_var.get(),
+            page_load_strategy=self.page_load_strategy,
+            headless=self.headless_var.get(),
+            network_capture=self.network_capture,
+            feed_listing=self.feed_listing,
+            rendition="lowest" if self.save_bandwidth_var.get() else "highest",
+            max_bandwidth=self.max_bandwidth_kbps * 1000 if self.max_bandwidth_kbps else None
         )
+        profiles = [p.strip().lstrip('@') for p in target_profile.split(',') if p.strip()]
+        
+        # Create downloader; several comma-separated profiles, or watching, run as a batch
+        if len(profiles) > 1 or self.watch_interval:
+            from batch_scheduler import ProfileBatchScheduler
+            self.downloader = ProfileBatchScheduler(
+                profiles,
+                username=username,
+                password=password,
+                video_limit=video_limit,
+                max_workers=max_workers,
+                output_dir=output_dir,
+                progress_callback=self.progress_callback,
+                **options
+            )
+        else:
+            self.downloader = InstagramReelDownloader(
+                username=username,
+                password=password,
+                target_profile=target_profile,
+                video_limit=video_limit,
+                max_workers=max_workers,
+                output_dir=output_dir,
+                progress_callback=self.progress_callback,
+                **options
+            )
         
         # Update UI
         self.is_downloading = True
@@ -636,6 +1569,11 @@ class InstagramScraperGUI:
         
         # Clear log and reset progress
         self.clear_log()
+        if self.save_log_var.get():
+            try:
+                self.messages.open_log(self.LOG_FILE)
+            except OSError as e:
+                self.log_message(f"⚠️ Could not open {self.LOG_FILE}: {str(e)}")
         self.progress_bar['value'] = 0
         self.progress_var.set("Starting download...")
         
@@ -647,11 +1585,14 @@ class InstagramScraperGUI:
     def run_download(self):
         """Run download in separate thread"""
         try:
-            success = self.downloader.run()
-            self.message_queue.put(('finished', success))
+            if self.watch_interval:
+                success = self.downloader.watch(self.watch_interval)
+            else:
+                success = self.downloader.run()
+            self.messages.put('finished', success)
         except Exception as e:
-            self.message_queue.put(('log', f"❌ Download failed: {str(e)}"))
-            self.message_queue.put(('finished', False))
+            self.messages.put('log', f"❌ Download failed: {str(e)}")
+            self.messages.put('finished', False)
 
     def pause_download(self):
         """Pause/resume download"""
@@ -680,6 +1621,7 @@ class InstagramScraperGUI:
         self.pause_button.config(state=tk.DISABLED, text="Pause")
         self.stop_button.config(state=tk.DISABLED)
         self.progress_var.set("Download completed")
+        self.messages.close_log()
 
     def save_settings(self):
         """Save current settings to file"""
@@ -688,8 +1630,27 @@ class InstagramScraperGUI:
             'target_profile': self.target_profile_var.get(),
             'video_limit': self.video_limit_var.get(),
             'max_workers': self.max_workers_var.get(),
+            'browser_workers': self.browser_workers_var.get(),
+            'resume': self.resume_var.get(),
+            'segments': self.segments_var.get(),
+            'fast_resolve': self.fast_resolve_var.get(),
+            'reuse_session': self.reuse_session_var.get(),
+            'incremental': self.incremental_var.get(),
+            'watch_minutes': self.watch_minutes_var.get(),
+            'dedupe': self.dedupe_var.get(),
+            'save_log': self.save_log_var.get(),
+            'log_view_lines': self.log_view_lines,
+            'block_resources': self.block_resources_var.get(),
+            'headless': self.headless_var.get(),
+            'page_load_strategy': self.page_load_strategy,
+            'network_capture': self.network_capture,
+            'feed_listing': self.feed_listing,
+            'save_bandwidth': self.save_bandwidth_var.get(),
+            'max_bandwidth_kbps': self.max_bandwidth_kbps,
             'output_dir': self.output_dir_var.get()
         }
+        if self.popup_signatures:
+            settings['popup_signatures'] = self.popup_signatures
         
         try:
             with open('settings.json', 'w') as f:
@@ -709,7 +1670,25 @@ class InstagramScraperGUI:
                 self.target_profile_var.set(settings.get('target_profile', ''))
                 self.video_limit_var.set(settings.get('video_limit', '10'))
                 self.max_workers_var.set(settings.get('max_workers', '5'))
+                self.browser_workers_var.set(settings.get('browser_workers', '1'))
+                self.resume_var.set(settings.get('resume', False))
+                self.segments_var.set(settings.get('segments', '1'))
+                self.fast_resolve_var.set(settings.get('fast_resolve', True))
+                self.reuse_session_var.set(settings.get('reuse_session', True))
+                self.incremental_var.set(settings.get('incremental', False))
+                self.watch_minutes_var.set(settings.get('watch_minutes', '0'))
+                self.dedupe_var.set(settings.get('dedupe', False))
+                self.save_log_var.set(settings.get('save_log', False))
+                self.log_view_lines = int(settings.get('log_view_lines', self.LOG_VIEW_LINES))
+                self.block_resources_var.set(settings.get('block_resources', True))
+                self.headless_var.set(settings.get('headless', False))
+                self.page_load_strategy = settings.get('page_load_strategy', "eager")
+                self.network_capture = settings.get('network_capture', True)
+                self.feed_listing = settings.get('feed_listing', True)
+                self.save_bandwidth_var.set(settings.get('save_bandwidth', False))
+                self.max_bandwidth_kbps = settings.get('max_bandwidth_kbps')
                 self.output_dir_var.set(settings.get('output_dir', ''))
+                self.popup_signatures = settings.get('popup_signatures')
         except Exception as e:
             print(f"Failed to load settings: {str(e)}")
 
@@ -0,0 +1,35 @@
+from run_manifest import shortcode_from_url
+
+# Returns only hrefs this page has not reported before, so each scroll
+# costs one WebDriver round-trip no matter how many anchors are loaded
+NEW_REEL_HREFS_SCRIPT = """
+const seen = window.__harvestedReels || (window.__harvestedReels = new Set());
+const fresh = [];
+for (const a of document.querySelectorAll('a[href*="/reel/"]')) {
+    if (!seen.has(a.href)) {
+        seen.add(a.href);
+        fresh.push(a.href);
+    }
+}
+return fresh;
+"""
+
+
+def canonical_reel_url(shortcode):
+    return f"https://www.instagram.com/reel/{shortcode}/"
+
+
+def harvest_new_reel_links(driver, seen):
+    """Return canonical URLs of reels on the page whose shortcode is not in ``seen``.
+
+    ``seen`` is a set of shortcodes and is updated in place, so query
+    strings, trailing slashes and ``/reels/`` vs ``/reel/`` variants of the
+    same reel are only reported once.
+    """
+    links = []
+    for href in driver.execute_script(NEW_REEL_HREFS_SCRIPT) or []:
+        shortcode = shortcode_from_url(href)
+        if shortcode and shortcode not in seen:
+            seen.add(shortcode)
+            links.append(canonical_reel_url(shortcode))
+    return links
@@ -0,0 +1,258 @@
+import bisect
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Upper bounds (seconds) of the latency histogram buckets
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0)
+
+# Prefix of every exported Prometheus metric
+NAMESPACE = "instagram_reels"
+
+
+class Histogram:
+    """Latency histogram with fixed buckets, so memory stays flat however long the run"""
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.min = None
+        self.max = None
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+        self.min = value if self.min is None else min(self.min, value)
+        self.max = value if self.max is None else max(self.max, value)
+
+    def quantile(self, q):
+        """Estimate the ``q`` quantile by interpolating inside its bucket.
+
+        Same method as Prometheus' ``histogram_quantile``, but kept within
+        the smallest and largest values seen.
+        """
+        if not self.count:
+            return None
+        rank = q * self.count
+        cumulative = 0
+        lower = 0.0
+        estimate = self.max
+        for upper, count in zip(self.buckets, self.counts):
+            if count and cumulative + count >= rank:
+                estimate = lower + (upper - lower) * (rank - cumulative) / count
+                break
+            cumulative += count
+            lower = upper
+        return min(self.max, max(self.min, estimate))
+
+    def summary(self):
+        return {
+            'count': self.count,
+            'seconds': round(self.sum, 3),
+            'mean': round(self.sum / self.count, 3) if self.count else None,
+            'p50': _round(self.quantile(0.5)),
+            'p95': _round(self.quantile(0.95)),
+            'p99': _round(self.quantile(0.99)),
+            'max': _round(self.max),
+        }
+
+
+def _round(value):
+    return round(value, 3) if value is not None else None
+
+
+def _labels(labels):
+    return tuple(sorted((name, str(value)) for name, value in labels.items()))
+
+
+class RunMetrics:
+    """Counters, gauges and latency histograms shared by every thread of a run.
+
+    Stages are timed with ``with metrics.time("download"):`` and land in
+    the ``stage_seconds`` histogram; ``reel_started``/``reel_finished``
+    measure each reel from the start of its resolution to the end of its
+    download. Collectors registered with ``add_collector`` run before every
+    export and copy totals kept elsewhere (limiter, waits...) into gauges.
+    The data is exported as a JSON report (``report``/``write_report``) or
+    Prometheus text (``prometheus``/``write_prometheus``/``serve``).
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.started = time.time()
+        self.counters = {}
+        self.gauges = {}
+        self.histograms = {}
+        self.reel_starts = {}
+        self.collectors = []
+        self.server = None
+
+    def inc(self, name, amount=1, **labels):
+        key = (name, _labels(labels))
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + amount
+
+    def set(self, name, value, **labels):
+        with self.lock:
+            self.gauges[(name, _labels(labels))] = value
+
+    def observe(self, name, seconds, **labels):
+        key = (name, _labels(labels))
+        with self.lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = Histogram()
+            histogram.observe(seconds)
+
+    @contextmanager
+    def time(self, stage):
+        """Add the block's duration to ``stage_seconds{stage=...}``"""
+        start = time.monotonic()
+        try:
+            yield
+        finally:
+            self.observe("stage_seconds", time.monotonic() - start, stage=stage)
+
+    def reel_started(self, reel_url):
+        """Mark the start of a reel's resolution; later calls for the same reel are ignored"""
+        with self.lock:
+            self.reel_starts.setdefault(reel_url, time.monotonic())
+
+    def reel_finished(self, reel_url, result):
+        """Count the reel under ``result`` and record its end-to-end latency"""
+        with self.lock:
+            start = self.reel_starts.pop(reel_url, None)
+        self.inc("reels", result=result)
+        if start is not None and result == "downloaded":
+            self.observe("reel_seconds", time.monotonic() - start)
+
+    def add_collector(self, collector):
+        self.collectors.append(collector)
+
+    def collect(self):
+        for collector in self.collectors:
+            collector(self)
+
+    def _snapshot(self):
+        self.collect()
+        with self.lock:
+            return dict(self.counters), dict(self.gauges), {
+                key: (histogram.buckets, list(histogram.counts), histogram.count, histogram.sum,
+                      histogram.summary())
+                for key, histogram in self.histograms.items()}
+
+    def report(self):
+        """Run report as a JSON-serialisable dict"""
+        counters, gauges, histograms = self._snapshot()
+        elapsed = time.time() - self.started
+        downloaded = counters.get(("reels", (("result", "downloaded"),)), 0)
+        downloaded_bytes = counters.get(("bytes_downloaded", ()), 0)
+        reel_latency = histograms.get(("reel_seconds", ()))
+
+        def rows(values):
+            return [{'name': name, 'labels': dict(labels), 'value': value}
+                    for (name, labels), value in sorted(values.items())]
+
+        return {
+            'started': datetime.fromtimestamp(self.started, timezone.utc).isoformat(),
+            'elapsed_seconds': round(elapsed, 3),
+            'reels': {dict(labels)['result']: value
+                      for (name, labels), value in sorted(counters.items()) if name == "reels"},
+            'reels_per_sec': round(downloaded / elapsed, 3) if elapsed else 0.0,
+            'bytes_downloaded': downloaded_bytes,
+            'mb_per_sec': round(downloaded_bytes / elapsed / 1e6, 3) if elapsed else 0.0,
+            'reel_latency': reel_latency[4] if reel_latency else None,
+            'stages': {dict(labels)['stage']: data[4]
+                       for (name, labels), data in sorted(histograms.items()) if name == "stage_seconds"},
+            'counters': rows(counters),
+            'gauges': rows(gauges),
+        }
+
+    def write_report(self, path):
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(self.report(), f, indent=2)
+
+    def prometheus(self):
+        """The metrics in the Prometheus text exposition format"""
+        counters, gauges, histograms = self._snapshot()
+        lines = []
+        typed = set()
+
+        def sample(name, labels, value):
+            text = ",".join(f'{key}="{_escape(val)}"' for key, val in labels)
+            lines.append(f"{name}{{{text}}} {value}" if text else f"{name} {value}")
+
+        def declare(name, kind):
+            if name not in typed:
+                typed.add(name)
+                lines.append(f"# TYPE {name} {kind}")
+
+        declare(f"{NAMESPACE}_run_start_time_seconds", "gauge")
+        sample(f"{NAMESPACE}_run_start_time_seconds", (), round(self.started, 3))
+        for (name, labels), value in sorted(counters.items()):
+            metric = f"{NAMESPACE}_{name}_total"
+            declare(metric, "counter")
+            sample(metric, labels, value)
+        for (name, labels), value in sorted(gauges.items()):
+            metric = f"{NAMESPACE}_{name}"
+            declare(metric, "gauge")
+            sample(metric, labels, value)
+        for (name, labels), (buckets, counts, count, total, _) in sorted(histograms.items()):
+            metric = f"{NAMESPACE}_{name}"
+            declare(metric, "histogram")
+            cumulative = 0
+            for upper, bucket_count in zip(buckets, counts):
+                cumulative += bucket_count
+                sample(f"{metric}_bucket", labels + (("le", str(upper)),), cumulative)
+            sample(f"{metric}_bucket", labels + (("le", "+Inf"),), count)
+            sample(f"{metric}_sum", labels, round(total, 6))
+            sample(f"{metric}_count", labels, count)
+        return "\n".join(lines) + "\n"
+
+    def write_prometheus(self, path):
+        """Write the text format atomically, for node_exporter's textfile collector"""
+        temp_path = path + '.tmp'
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            f.write(self.prometheus())
+        os.replace(temp_path, path)
+
+    def serve(self, port, host="127.0.0.1"):
+        """Serve ``/metrics`` over HTTP from a background thread until ``close``"""
+        metrics = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                if self.path.split('?', 1)[0] not in ('/', '/metrics'):
+                    self.send_error(404)
+                    return
+                body = metrics.prometheus().encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+        self.server = ThreadingHTTPServer((host, port), Handler)
+        self.server.daemon_threads = True
+        threading.Thread(target=self.server.serve_forever, name="metrics-server", daemon=True).start()
+        return self
+
+    def close(self):
+        if self.server:
+            self.server.shutdown()
+            self.server.server_close()
+            self.server = None
+
+
+def _escape(value):
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
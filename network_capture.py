@@ -0,0 +1,154 @@
+import mimetypes
+from collections import namedtuple
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+from waits import VIDEO_SRC_SCRIPT
+
+# A media response seen on the wire; content_type and size are None when
+# the request never got a response (e.g. it was blocked)
+MediaResponse = namedtuple('MediaResponse', ['url', 'content_type', 'size'])
+
+MEDIA_EXTENSIONS = ('.mp4', '.m4v', '.m3u8', '.mpd')
+
+# Query parameters the player adds to fetch one byte range of the file
+RANGE_PARAMS = ('bytestart', 'byteend')
+
+
+def clean_media_url(url):
+    """The whole-file URL for a player's byte-range request"""
+    parts = urlsplit(url)
+    query = [(key, value) for key, value in parse_qsl(parts.query, keep_blank_values=True)
+             if key not in RANGE_PARAMS]
+    return urlunsplit(parts._replace(query=urlencode(query)))
+
+
+def _header(headers, name):
+    for key, value in (headers or {}).items():
+        if key.lower() == name:
+            return value
+    return None
+
+
+def _size(headers):
+    """Full size from ``Content-Range`` (ranged responses) or ``Content-Length``"""
+    content_range = _header(headers, 'content-range')
+    if content_range and '/' in content_range:
+        total = content_range.rsplit('/', 1)[1].strip()
+        if total.isdigit():
+            return int(total)
+    length = _header(headers, 'content-length')
+    return int(length) if length and str(length).isdigit() else None
+
+
+def _is_media(url, resource_type=None, mime_type=None):
+    if not url.startswith('http'):
+        return False
+    if mime_type:
+        mime_type = mime_type.lower()
+        if mime_type.startswith('audio/'):
+            return False
+        if mime_type.startswith('video/') or 'mpegurl' in mime_type or 'dash+xml' in mime_type:
+            return True
+    path = urlsplit(url).path.lower()
+    return resource_type == 'Media' or path.endswith(MEDIA_EXTENSIONS)
+
+
+class NetworkCapture:
+    """Media URL of one page load, taken from Chrome's performance log.
+
+    Call ``start`` right before each ``driver.get`` to drop older events, then
+    ``poll`` until it returns a ``MediaResponse``: the first video response
+    (with its content type and size), or the first media request once it
+    has failed, which is all a blocked request leaves behind. ``best``
+    also returns a media request still waiting for its response. Every
+    message drained after a ``start`` is kept in ``messages`` for other
+    consumers, such as the blocked-request count. ``document_status`` is
+    the HTTP status of the page itself, which the DOM never shows.
+
+    The driver needs performance logging with network events enabled
+    (see ``BrowserProfile``); ``read_log`` is its ``drain_log``.
+    """
+
+    def __init__(self, read_log):
+        self.read_log = read_log
+        self.messages = []
+        self.reset()
+
+    def start(self, driver):
+        self.messages.extend(self.read_log(driver))
+        self.reset()
+
+    def reset(self):
+        self.document_status = None
+        self.requested = None
+        self.request_id = None
+        self.request_failed = False
+        self.media = None
+
+    def feed(self, messages):
+        """Scan parsed log messages; returns the media found so far"""
+        self.messages.extend(messages)
+        for message in messages:
+            method = message.get('method')
+            params = message.get('params', {})
+            if method == 'Network.responseReceived':
+                response = params.get('response', {})
+                url = response.get('url', '')
+                if params.get('type') == 'Document' and self.document_status is None:
+                    self.document_status = response.get('status')
+                elif (params.get('requestId') == self.request_id and self.media is None
+                      and (response.get('mimeType') or '').lower().startswith('audio/')):
+                    # The request was the separate audio track; wait for the next one
+                    self.requested = self.request_id = None
+                elif self.media is None and _is_media(url, params.get('type'), response.get('mimeType')):
+                    headers = response.get('headers')
+                    self.media = MediaResponse(clean_media_url(url),
+                                               _header(headers, 'content-type') or response.get('mimeType'),
+                                               _size(headers))
+            elif method == 'Network.requestWillBeSent' and self.requested is None:
+                url = params.get('request', {}).get('url', '')
+                if _is_media(url, params.get('type')):
+                    url = clean_media_url(url)
+                    self.requested = MediaResponse(url, mimetypes.guess_type(urlsplit(url).path)[0], None)
+                    self.request_id = params.get('requestId')
+            elif method == 'Network.loadingFailed' and params.get('requestId') == self.request_id:
+                self.request_failed = self.requested is not None
+        return self.result()
+
+    def result(self):
+        if self.media:
+            return self.media
+        return self.requested if self.request_failed else None
+
+    def best(self):
+        """The media response, or any media request seen; for when waiting is over"""
+        return self.media or self.requested
+
+    def poll(self, driver):
+        """Read new events from the driver; returns the media found so far, or None"""
+        return self.feed(self.read_log(driver))
+
+
+def find_loaded_video(driver, capture=None):
+    """``(source, video_url)`` once the video shows up in network traffic or a ``<video>``.
+
+    A wait condition for reel pages: None while nothing is there yet,
+    ``("throttled", None)`` if the page itself was answered with HTTP 429
+    and ``("blob", None)`` if the player streams a URL the network log
+    missed, which leaves only the page data.
+    """
+    if capture:
+        media = capture.poll(driver)
+        if media:
+            return "network", media.url
+        if capture.document_status == 429:
+            return "throttled", None
+    video_url = driver.execute_script(VIDEO_SRC_SCRIPT)
+    if not video_url:
+        return None
+    if video_url.startswith("http"):
+        return "video_src", video_url
+    if capture and capture.best():
+        # The player is streaming the request we saw; no need to wait for its response
+        return "network", capture.best().url
+    return "blob", None
@@ -0,0 +1,66 @@
+import time
+
+# Popup type -> texts of the button that dismisses it. A text must be the
+# button's whole label (case and spacing aside), so "Skip" never matches a
+# reel titled "Skipping ...". Extra signatures can be passed to
+# dismiss_popups (or set as "popup_signatures" in settings.json for the GUI).
+DEFAULT_POPUP_BUTTONS = {
+    "save_info": ["Not Now", "Not now"],
+    "notifications": ["Not Now", "Not now"],
+    "add_to_home": ["Not Now", "Cancel"],
+    "generic": ["Skip", "Maybe Later", "No Thanks"]
+}
+
+# Clicks the first visible dismiss button matching any signature and
+# returns its popup type, checking every signature in one round-trip
+DISMISS_POPUP_SCRIPT = """
+const signatures = arguments[0];
+for (const el of document.querySelectorAll('button, div[role="button"]')) {
+    if (el.offsetParent === null) continue;
+    const text = (el.textContent || '').replace(/\\s+/g, ' ').trim().toLowerCase();
+    if (!text || text.length > 40) continue;
+    for (const [name, texts] of signatures) {
+        if (texts.some(t => text === t.toLowerCase())) {
+            el.click();
+            return name;
+        }
+    }
+}
+return null;
+"""
+
+
+def merge_popup_buttons(extra=None):
+    """Default signatures plus user-supplied ones (same shape, texts appended)"""
+    merged = {name: list(texts) for name, texts in DEFAULT_POPUP_BUTTONS.items()}
+    for name, texts in (extra or {}).items():
+        buttons = merged.setdefault(name, [])
+        for text in texts:
+            if text not in buttons:
+                buttons.append(text)
+    return merged
+
+
+def dismiss_popups(driver, popup_buttons, timeout=3.0, settle=1.0, poll=0.2,
+                   max_dismissals=8, should_stop=None):
+    """Poll for known popups until ``timeout`` passes with nothing to dismiss.
+
+    After each dismissal the deadline is pushed out by ``settle`` seconds,
+    since Instagram often shows the next popup right after the first.
+    Returns the popup types that were dismissed, in order.
+    """
+    should_stop = should_stop or (lambda: False)
+    signatures = list(popup_buttons.items())
+    handled = []
+    deadline = time.monotonic() + timeout
+
+    while not should_stop() and time.monotonic() < deadline and len(handled) < max_dismissals:
+        try:
+            name = driver.execute_script(DISMISS_POPUP_SCRIPT, signatures)
+        except Exception:
+            name = None
+        if name:
+            handled.append(name)
+            deadline = max(deadline, time.monotonic() + settle)
+        time.sleep(poll)
+    return handled
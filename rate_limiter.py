@@ -0,0 +1,154 @@
+import threading
+import time
+from email.utils import parsedate_to_datetime
+
+# Shown by Instagram instead of the page when navigations come too fast;
+# the browser never exposes the HTTP status, so this is the only signal
+RATE_LIMIT_PAGE_TEXT = "Please wait a few minutes before you try again"
+
+
+def parse_retry_after(value):
+    """Seconds to wait from a ``Retry-After`` header (delta or HTTP date), or None"""
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+class TokenBucket:
+    """Thread-safe token bucket whose rate adapts to throttling.
+
+    Requests are spaced ``1 / rate`` seconds apart, with up to ``burst``
+    let through at once after a quiet spell. A throttling response halves
+    the rate and pauses the bucket (for ``Retry-After`` if the server sent
+    one); after ``cooldown`` seconds without throttling, every successful
+    request raises the rate by ``increase``. Until the first throttle the
+    rate keeps climbing; after it, the rate the server refused becomes
+    ``ceiling`` and the probing stops there, so the rate settles just under
+    the point where the server starts refusing. ``max_rate``, if given, is
+    a hard cap on top.
+    """
+
+    def __init__(self, rate, burst=1, min_rate=None, max_rate=None,
+                 backoff=0.5, increase=0.02, cooldown=30.0, default_pause=30.0):
+        self.rate = float(rate)
+        self.burst = burst
+        self.min_rate = min_rate or self.rate / 16
+        self.max_rate = max_rate
+        self.ceiling = None
+        self.backoff = backoff
+        self.increase = increase
+        self.cooldown = cooldown
+        self.default_pause = default_pause
+        self.lock = threading.Lock()
+        self.next_free = 0.0
+        self.blocked_until = 0.0
+        self.last_throttled = None
+        self.throttled_seconds = 0.0
+        self.throttle_events = 0
+        self.requests = 0
+
+    def acquire(self):
+        """Block until a request may go out; returns the seconds waited"""
+        delay = self.reserve()
+        if delay > 0:
+            time.sleep(delay)
+        return delay
+
+    def reserve(self):
+        """Claim the next slot without waiting; returns the seconds until it.
+
+        For callers that cannot block, such as an event loop, which wait
+        the returned delay their own way.
+        """
+        with self.lock:
+            now = time.monotonic()
+            # Unused capacity carries over, but only up to ``burst`` requests
+            due = max(self.next_free, now)
+            start = max(now, due - (self.burst - 1) / self.rate, self.blocked_until)
+            self.next_free = max(due, start) + 1 / self.rate
+            delay = start - now
+            self.requests += 1
+            self.throttled_seconds += delay
+        return delay
+
+    def throttled(self, retry_after=None):
+        """Back off after the server refused a request"""
+        with self.lock:
+            now = time.monotonic()
+            self.ceiling = self.rate
+            self.rate = max(self.min_rate, self.rate * self.backoff)
+            pause = retry_after if retry_after is not None else self.default_pause
+            self.blocked_until = max(self.blocked_until, now + pause)
+            self.last_throttled = now
+            self.throttle_events += 1
+
+    def succeeded(self):
+        """Probe a little higher once the last throttle is far enough behind"""
+        with self.lock:
+            if self.last_throttled is None or time.monotonic() - self.last_throttled >= self.cooldown:
+                rate = self.rate * (1 + self.increase)
+                for limit in (self.ceiling, self.max_rate):
+                    if limit is not None:
+                        rate = min(limit, rate)
+                self.rate = rate
+
+
+class RateLimiter:
+    """Separate adaptive budgets for Instagram pages and CDN media.
+
+    One instance is shared by every thread (and, in batch runs, every
+    profile), so the budgets are global to the run.
+    """
+
+    PAGE = "page"
+    CDN = "cdn"
+
+    def __init__(self, page_rate=1.0, cdn_rate=8.0):
+        self.buckets = {
+            self.PAGE: TokenBucket(page_rate, burst=3),
+            self.CDN: TokenBucket(cdn_rate, burst=16),
+        }
+
+    def acquire(self, kind):
+        return self.buckets[kind].acquire()
+
+    def reserve(self, kind):
+        return self.buckets[kind].reserve()
+
+    def throttled(self, kind, retry_after=None):
+        self.buckets[kind].throttled(retry_after)
+
+    def observe(self, kind, response):
+        """Feed a response back; returns True if it was a throttling response.
+
+        429 always counts, and so does 503 when it carries ``Retry-After``.
+        """
+        return self.observe_status(kind, response.status_code, response.headers)
+
+    def observe_status(self, kind, status, headers):
+        """``observe`` for clients whose responses are not ``requests`` ones"""
+        retry_after = parse_retry_after(headers.get('Retry-After'))
+        if status == 429 or (status == 503 and retry_after is not None):
+            self.throttled(kind, retry_after)
+            return True
+        if status < 400:
+            self.succeeded(kind)
+        return False
+
+    def succeeded(self, kind):
+        self.buckets[kind].succeeded()
+
+    def report(self):
+        """``(kind, throttled_seconds, throttle_events, requests, rate)`` per budget"""
+        rows = []
+        for kind, bucket in self.buckets.items():
+            with bucket.lock:
+                rows.append((kind, bucket.throttled_seconds, bucket.throttle_events,
+                             bucket.requests, bucket.rate))
+        return rows
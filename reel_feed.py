@@ -0,0 +1,145 @@
+import time
+from collections import namedtuple
+
+from rate_limiter import RateLimiter
+from transport import DEFAULT_HEADERS, INSTAGRAM_APP_ID, set_cookies
+
+# One reel in the listing; video_url is None when the feed leaves it out
+ListedReel = namedtuple('ListedReel', ['shortcode', 'video_url'])
+
+# One page of the listing; ``cursor`` fetches the next page while ``more`` is set
+FeedPage = namedtuple('FeedPage', ['reels', 'cursor', 'more'])
+
+
+class FeedUnavailable(Exception):
+    """The JSON listing cannot be used for this profile; scroll the grid instead"""
+
+
+def parse_feed_page(data, rendition="highest"):
+    """``FeedPage`` from a clips response (``items`` plus ``paging_info``).
+
+    Of a reel's video versions the largest is taken, or with ``rendition``
+    "lowest" the smallest.
+    """
+    reels = []
+    for item in data.get('items') or []:
+        media = item.get('media', item)
+        shortcode = media.get('code')
+        if not shortcode:
+            continue
+        versions = sorted(media.get('video_versions') or [],
+                          key=lambda version: (version.get('width') or 0) * (version.get('height') or 0))
+        if versions:
+            version = versions[0] if rendition == "lowest" else versions[-1]
+            reels.append(ListedReel(shortcode, version.get('url')))
+        else:
+            reels.append(ListedReel(shortcode, None))
+    paging = data.get('paging_info') or {}
+    cursor = paging.get('max_id')
+    return FeedPage(reels, cursor, bool(paging.get('more_available') and cursor))
+
+
+class ReelFeed:
+    """List a profile's reels as cursor-paginated JSON with the login cookies.
+
+    One request per page returns a dozen shortcodes with their video URLs,
+    instead of a scroll, a sleep and an anchor scan in the browser. Pages
+    are fetched with the shared HTTP session from the page budget of the
+    ``limiter`` and counted in ``metrics`` (a ``RunMetrics``) when given.
+    ``pages`` can start from a saved cursor to continue an earlier listing.
+    ``rendition`` "lowest" takes each reel's smallest video version.
+    Anything that makes the feed unusable (login wall, missing profile,
+    unexpected response, throttling that does not clear) raises
+    ``FeedUnavailable`` so the caller can fall back to scrolling.
+    """
+
+    PROFILE_URL = "https://www.instagram.com/api/v1/users/web_profile_info/"
+    CLIPS_URL = "https://www.instagram.com/api/v1/clips/user/"
+
+    HEADERS = dict(DEFAULT_HEADERS, **{
+        "Accept": "application/json",
+        "X-IG-App-ID": INSTAGRAM_APP_ID,
+        "X-Requested-With": "XMLHttpRequest",
+    })
+
+    def __init__(self, session, page_size=12, timeout=15, max_retries=3, limiter=None, metrics=None,
+                 rendition="highest"):
+        self.session = session
+        self.rendition = rendition
+        self.page_size = page_size
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.limiter = limiter
+        self.metrics = metrics
+        self.user_ids = {}
+
+    def copy_cookies(self, driver):
+        """Load the logged-in driver's cookies into the HTTP session"""
+        set_cookies(self.session, driver.get_cookies())
+
+    def request(self, method, url, profile, **kwargs):
+        """Parsed JSON of one API call, retried while throttled or failing server-side"""
+        headers = dict(self.HEADERS, Referer=f"https://www.instagram.com/{profile}/reels/")
+        csrf_token = self.session.cookies.get('csrftoken')
+        if csrf_token:
+            headers["X-CSRFToken"] = csrf_token
+        error = None
+        for _ in range(self.max_retries):
+            if self.limiter:
+                self.limiter.acquire(RateLimiter.PAGE)
+            try:
+                response = self.session.request(method, url, headers=headers, timeout=self.timeout, **kwargs)
+            except Exception as e:
+                error = str(e)
+                continue
+            if self.metrics:
+                self.metrics.inc("http_responses", kind=RateLimiter.PAGE, status=response.status_code)
+            throttled = (self.limiter.observe(RateLimiter.PAGE, response) if self.limiter
+                         else response.status_code == 429)
+            if throttled:
+                error = "rate limited"
+                if not self.limiter:
+                    time.sleep(2)
+                continue
+            if response.status_code >= 500:
+                error = f"HTTP {response.status_code}"
+                continue
+            if response.status_code != 200:
+                raise FeedUnavailable(f"HTTP {response.status_code}")
+            try:
+                return response.json()
+            except ValueError:
+                # A login page or challenge instead of JSON
+                raise FeedUnavailable("not a JSON response")
+        raise FeedUnavailable(error)
+
+    def user_id(self, profile):
+        if profile not in self.user_ids:
+            data = self.request("GET", self.PROFILE_URL, profile, params={'username': profile})
+            user = (data.get('data') or {}).get('user') or {}
+            if not user.get('id'):
+                raise FeedUnavailable(f"no user id for {profile}")
+            self.user_ids[profile] = user['id']
+        return self.user_ids[profile]
+
+    def fetch(self, profile, cursor=None):
+        """One ``FeedPage`` of ``profile``'s reels, starting at ``cursor``"""
+        form = {'target_user_id': self.user_id(profile), 'page_size': self.page_size,
+                'include_feed_video': 'true'}
+        if cursor:
+            form['max_id'] = cursor
+        data = self.request("POST", self.CLIPS_URL, profile, data=form)
+        if 'items' not in data:
+            raise FeedUnavailable("no items in the response")
+        if self.metrics:
+            self.metrics.inc("feed_pages")
+        return parse_feed_page(data, self.rendition)
+
+    def pages(self, profile, cursor=None):
+        """Yield every ``FeedPage`` of ``profile``, newest first, from ``cursor`` on"""
+        while True:
+            page = self.fetch(profile, cursor)
+            yield page
+            if not page.more:
+                return
+            cursor = page.cursor
@@ -0,0 +1,132 @@
+import os
+import re
+import sqlite3
+import threading
+from datetime import datetime
+
+SHORTCODE_PATTERN = re.compile(r'/(?:reels?|p|tv)/([A-Za-z0-9_-]+)')
+
+
+def shortcode_from_url(url):
+    """Return the reel shortcode in ``url``, or None if there is none"""
+    match = SHORTCODE_PATTERN.search(url or "")
+    return match.group(1) if match else None
+
+
+class RunManifest:
+    """On-disk record of every reel seen for a profile, keyed by shortcode.
+
+    Each reel moves through ``discovered`` -> ``resolved`` -> ``downloaded``,
+    or ends up ``failed``. The manifest lives in the output directory so a
+    re-run can skip finished reels and pick up where a killed job stopped.
+    The JSON listing's cursor is kept too, so an unfinished listing
+    continues from its last page.
+    """
+
+    FILENAME = "manifest.sqlite3"
+
+    DISCOVERED = "discovered"
+    RESOLVED = "resolved"
+    DOWNLOADED = "downloaded"
+    FAILED = "failed"
+
+    def __init__(self, output_dir):
+        self.path = os.path.join(output_dir, self.FILENAME)
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(self.path, check_same_thread=False)
+        self.conn.row_factory = sqlite3.Row
+        with self.lock, self.conn:
+            self.conn.execute("""
+                CREATE TABLE IF NOT EXISTS reels (
+                    shortcode TEXT PRIMARY KEY,
+                    reel_url TEXT NOT NULL,
+                    video_url TEXT,
+                    state TEXT NOT NULL,
+                    filename TEXT,
+                    bytes INTEGER,
+                    sha256 TEXT,
+                    error TEXT,
+                    updated_at TEXT NOT NULL
+                )
+            """)
+            self.conn.execute("""
+                CREATE TABLE IF NOT EXISTS listings (
+                    profile TEXT PRIMARY KEY,
+                    cursor TEXT NOT NULL,
+                    updated_at TEXT NOT NULL
+                )
+            """)
+
+    def _execute(self, sql, params):
+        with self.lock, self.conn:
+            self.conn.execute(sql, params)
+
+    def _now(self):
+        return datetime.now().isoformat(timespec="seconds")
+
+    def discover(self, shortcode, reel_url):
+        """Record a reel found on the profile; existing entries are kept"""
+        self._execute(
+            "INSERT OR IGNORE INTO reels (shortcode, reel_url, state, updated_at) "
+            "VALUES (?, ?, ?, ?)",
+            (shortcode, reel_url, self.DISCOVERED, self._now()))
+
+    def mark_resolved(self, shortcode, video_url):
+        self._execute(
+            "UPDATE reels SET state = ?, video_url = ?, error = NULL, updated_at = ? "
+            "WHERE shortcode = ?",
+            (self.RESOLVED, video_url, self._now(), shortcode))
+
+    def mark_downloaded(self, shortcode, filename, size, sha256):
+        self._execute(
+            "UPDATE reels SET state = ?, filename = ?, bytes = ?, sha256 = ?, error = NULL, "
+            "updated_at = ? WHERE shortcode = ?",
+            (self.DOWNLOADED, filename, size, sha256, self._now(), shortcode))
+
+    def mark_failed(self, shortcode, error=None):
+        # Drop the cached URL: CDN links expire, so the next run re-resolves
+        self._execute(
+            "UPDATE reels SET state = ?, video_url = NULL, error = ?, updated_at = ? "
+            "WHERE shortcode = ?",
+            (self.FAILED, error, self._now(), shortcode))
+
+    def get(self, shortcode):
+        """Return the manifest row for ``shortcode`` as a dict, or None"""
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT * FROM reels WHERE shortcode = ?", (shortcode,)).fetchone()
+        return dict(row) if row else None
+
+    def is_downloaded(self, shortcode, output_dir):
+        """True if the reel was downloaded and its file is still intact on disk"""
+        entry = self.get(shortcode)
+        if not entry or entry["state"] != self.DOWNLOADED or not entry["filename"]:
+            return False
+        filepath = os.path.join(output_dir, entry["filename"])
+        return os.path.exists(filepath) and os.path.getsize(filepath) == entry["bytes"]
+
+    def listed_reel_urls(self):
+        """Every reel URL recorded, in the order the reels were discovered"""
+        with self.lock:
+            rows = self.conn.execute("SELECT reel_url FROM reels ORDER BY rowid").fetchall()
+        return [row["reel_url"] for row in rows]
+
+    def listing_cursor(self, profile):
+        """Feed cursor after the last page an unfinished listing recorded, or None"""
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT cursor FROM listings WHERE profile = ?", (profile,)).fetchone()
+        return row["cursor"] if row else None
+
+    def save_listing_cursor(self, profile, cursor):
+        """Remember where the listing got to; None once it reached the end"""
+        if cursor is None:
+            self._execute("DELETE FROM listings WHERE profile = ?", (profile,))
+        else:
+            self._execute(
+                "INSERT OR REPLACE INTO listings (profile, cursor, updated_at) VALUES (?, ?, ?)",
+                (profile, cursor, self._now()))
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
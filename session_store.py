@@ -0,0 +1,99 @@
+import json
+import os
+import threading
+import time
+
+from transport import set_cookies
+
+INSTAGRAM_HOME = "https://www.instagram.com/"
+# A tiny same-origin page, so cookies can be set without loading the app
+COOKIE_LANDING_URL = "https://www.instagram.com/robots.txt"
+# Redirects to the login page when the session is no longer valid
+VALIDATION_URL = "https://www.instagram.com/accounts/edit/"
+
+
+class SessionStore:
+    """Save and restore a logged-in Instagram session.
+
+    After a successful login the driver's cookies and local storage are
+    written to ``path``. Later runs load them into the driver and the
+    ``requests`` session, check them with one request, and only fall back
+    to a full login when they have expired.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+
+    def save(self, driver):
+        """Write the driver's cookies and local storage to disk"""
+        state = {
+            'saved_at': time.time(),
+            'cookies': driver.get_cookies(),
+            'local_storage': driver.execute_script("return Object.assign({}, window.localStorage);") or {},
+        }
+        temp_path = self.path + '.tmp'
+        with self.lock:
+            # The cookies are as good as the password, keep them private
+            fd = os.open(temp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+            with os.fdopen(fd, 'w') as f:
+                json.dump(state, f)
+            os.replace(temp_path, self.path)
+
+    def load(self):
+        with self.lock:
+            if not os.path.exists(self.path):
+                return None
+            try:
+                with open(self.path, 'r') as f:
+                    return json.load(f)
+            except (OSError, ValueError):
+                return None
+
+    def restore(self, driver, session):
+        """Load a saved session into ``driver`` and ``session``.
+
+        Returns True if the restored cookies are still accepted by Instagram.
+        """
+        state = self.load()
+        if not state or not state.get('cookies'):
+            return False
+
+        now = time.time()
+        cookies = [cookie for cookie in state['cookies']
+                   if not cookie.get('expiry') or cookie['expiry'] > now]
+        if not any(cookie['name'] == 'sessionid' for cookie in cookies):
+            return False
+
+        set_cookies(session, cookies)
+        if not self.validate(session):
+            session.cookies.clear()
+            return False
+
+        driver.get(COOKIE_LANDING_URL)
+        for cookie in cookies:
+            if cookie.get('sameSite') not in (None, 'Strict', 'Lax', 'None'):
+                cookie = {key: value for key, value in cookie.items() if key != 'sameSite'}
+            try:
+                driver.add_cookie(cookie)
+            except Exception:
+                continue
+        if state.get('local_storage'):
+            driver.execute_script(
+                "for (const [key, value] of Object.entries(arguments[0])) { window.localStorage.setItem(key, value); }",
+                state['local_storage'])
+        driver.get(INSTAGRAM_HOME)
+        return True
+
+    def validate(self, session):
+        """One cheap request: a valid session gets the page, an expired one a redirect"""
+        try:
+            response = session.get(VALIDATION_URL, allow_redirects=False, timeout=15)
+        except Exception:
+            return False
+        return response.status_code == 200
+
+    def clear(self):
+        with self.lock:
+            if os.path.exists(self.path):
+                os.remove(self.path)
@@ -0,0 +1,94 @@
+"""HLS audio groups and retries of ``StreamDownloader``, with a canned session"""
+import pytest
+
+import adaptive_stream
+from adaptive_stream import StreamDownloader, parse_hls_audio
+
+BASE = "https://cdn.example/reel/"
+
+MASTER = """#EXTM3U
+#EXT-X-MEDIA:TYPE=AUDIO,GROUP-ID="lo",NAME="Low",DEFAULT=YES,URI="audio/lo.m3u8"
+#EXT-X-MEDIA:TYPE=AUDIO,GROUP-ID="hi",NAME="Commentary",URI="audio/commentary.m3u8"
+#EXT-X-MEDIA:TYPE=AUDIO,GROUP-ID="hi",NAME="High",DEFAULT=YES,URI="audio/hi.m3u8"
+#EXT-X-MEDIA:TYPE=AUDIO,GROUP-ID="muxed",NAME="In stream",DEFAULT=YES
+#EXT-X-MEDIA:TYPE=SUBTITLES,GROUP-ID="subs",NAME="English",URI="subs/en.m3u8"
+#EXT-X-STREAM-INF:BANDWIDTH=400000,RESOLUTION=360x640,AUDIO="lo"
+video/360.m3u8
+#EXT-X-STREAM-INF:BANDWIDTH=2500000,RESOLUTION=720x1280,AUDIO="hi"
+video/720.m3u8
+"""
+
+NO_AUDIO_MASTER = """#EXTM3U
+#EXT-X-STREAM-INF:BANDWIDTH=2500000,RESOLUTION=720x1280
+video/720.m3u8
+"""
+
+
+def media(*segments):
+    lines = ["#EXTM3U", "#EXT-X-TARGETDURATION:4"]
+    for segment in segments:
+        lines += ["#EXTINF:4.0,", segment]
+    return "\n".join(lines + ["#EXT-X-ENDLIST"])
+
+
+class Response:
+    def __init__(self, status_code, text=""):
+        self.status_code = status_code
+        self.content = text.encode()
+        self.headers = {}
+
+
+class CannedSession:
+    def __init__(self, pages):
+        self.pages = pages
+        self.requested = []
+
+    def get(self, url, headers=None, timeout=None):
+        self.requested.append(url)
+        if url not in self.pages:
+            return Response(404)
+        return Response(200, self.pages[url])
+
+
+PAGES = {
+    BASE + "master.m3u8": MASTER,
+    BASE + "video/720.m3u8": media("720/1.m4s", "720/2.m4s"),
+    BASE + "video/360.m3u8": media("360/1.m4s"),
+    BASE + "audio/hi.m3u8": media("hi.m4a"),
+    BASE + "audio/lo.m3u8": media("lo.m4a"),
+}
+
+
+def test_audio_groups_list_the_default_first():
+    groups = parse_hls_audio(MASTER, BASE + "master.m3u8")
+    assert sorted(groups) == ["hi", "lo"]
+    assert [r.url for r in groups["hi"]] == [BASE + "audio/hi.m3u8", BASE + "audio/commentary.m3u8"]
+
+
+@pytest.mark.parametrize("policy, video, audio", [
+    ("highest", BASE + "video/720/1.m4s", BASE + "audio/hi.m4a"),
+    ("lowest", BASE + "video/360/1.m4s", BASE + "audio/lo.m4a"),
+])
+def test_load_takes_the_audio_group_of_the_chosen_variant(policy, video, audio):
+    stream = StreamDownloader(CannedSession(PAGES), rendition=policy).load(BASE + "master.m3u8")
+    assert stream.kind == "hls"
+    assert stream.video.segments[0].url == video
+    assert stream.audio.segments[0].url == audio
+    # One whole file, so callers hand it to the resumable download as the .m4a
+    assert StreamDownloader.whole_file(stream.audio) == audio
+
+
+def test_load_without_audio_group():
+    pages = {BASE + "master.m3u8": NO_AUDIO_MASTER, BASE + "video/720.m3u8": media("720/1.m4s")}
+    stream = StreamDownloader(CannedSession(pages)).load(BASE + "master.m3u8")
+    assert stream.audio is None
+
+
+def test_fetch_does_not_wait_after_the_last_attempt(monkeypatch):
+    sleeps = []
+    monkeypatch.setattr(adaptive_stream.time, "sleep", sleeps.append)
+    session = CannedSession({})
+    with pytest.raises(IOError, match="HTTP 404"):
+        StreamDownloader(session, max_retries=3).fetch(BASE + "missing.m4s")
+    assert len(session.requested) == 3
+    assert sleeps == [2, 2]
@@ -0,0 +1,33 @@
+"""``ProfileBatchScheduler.build`` sharing one set of resources across profiles"""
+import instagram_scraper_gui
+from batch_scheduler import ProfileBatchScheduler
+
+
+def test_profiles_are_built_on_the_lead_resources(tmp_path, monkeypatch):
+    sessions = []
+    create_session = instagram_scraper_gui.create_session
+
+    def counting_create_session(*args, **kwargs):
+        sessions.append(args)
+        return create_session(*args, **kwargs)
+
+    monkeypatch.setattr(instagram_scraper_gui, "create_session", counting_create_session)
+    batch = ProfileBatchScheduler(["one", "two", "three"], output_dir=str(tmp_path),
+                                  reuse_session=False, background_writes=True,
+                                  store_dir=str(tmp_path / "store"))
+    try:
+        lead = batch.lead
+        assert len(sessions) == 1
+        for downloader in batch.downloaders:
+            assert downloader.session is lead.session
+            assert downloader.limiter is lead.limiter
+            assert downloader.fast_resolver is lead.fast_resolver
+            assert downloader.reel_feed is lead.reel_feed
+            assert downloader.stream_downloader is lead.stream_downloader
+            assert downloader.writer is lead.writer
+            assert downloader.content_store is lead.content_store
+            assert downloader.metrics is batch.metrics
+            assert downloader.output_dir == str(tmp_path / downloader.target_profile)
+    finally:
+        lead.writer.close()
+        lead.content_store.close()
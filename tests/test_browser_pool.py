@@ -0,0 +1,119 @@
+"""``BrowserPool`` with fake drivers: requeueing, replacing dead browsers and giving up"""
+import threading
+
+import pytest
+
+from browser_pool import BrowserPool
+
+
+class FakeDriver:
+    """A browser that can be killed; a dead one raises on every call"""
+
+    def __init__(self, number):
+        self.number = number
+        self.dead = False
+        self.quit_called = False
+
+    @property
+    def current_url(self):
+        if self.dead:
+            raise ConnectionError("browser is gone")
+        return "https://www.instagram.com/"
+
+    def quit(self):
+        self.quit_called = True
+
+
+class FakeBrowsers:
+    """``driver_factory``, ``login`` and ``extract`` for a pool.
+
+    ``kills`` maps a reel URL to how many times extracting it kills the
+    browser. ``broken_after`` makes the factory fail once that many drivers
+    have been made.
+    """
+
+    def __init__(self, kills=None, broken_after=None, logins_ok=True):
+        self.kills = dict(kills or {})
+        self.broken_after = broken_after
+        self.logins_ok = logins_ok
+        self.drivers = []
+        self.logins = []
+        self.lock = threading.Lock()
+
+    def factory(self):
+        with self.lock:
+            if self.broken_after is not None and len(self.drivers) >= self.broken_after:
+                raise RuntimeError("chrome failed to start")
+            driver = FakeDriver(len(self.drivers) + 1)
+            self.drivers.append(driver)
+            return driver
+
+    def login(self, driver):
+        self.logins.append(driver.number)
+        return self.logins_ok
+
+    def extract(self, driver, reel_url):
+        if driver.dead:
+            raise ConnectionError("browser is gone")
+        with self.lock:
+            if self.kills.get(reel_url):
+                self.kills[reel_url] -= 1
+                driver.dead = True
+                raise ConnectionError("browser crashed")
+        return reel_url.replace("/reel/", "/video/")
+
+    def pool(self, workers):
+        return BrowserPool(self.factory, self.login, self.extract, num_workers=workers,
+                           log=lambda message: None)
+
+
+REELS = [f"https://www.instagram.com/reel/R{n}/" for n in range(1, 9)]
+
+
+def video(reel_url):
+    return reel_url.replace("/reel/", "/video/")
+
+
+def test_reels_are_resolved_across_workers():
+    browsers = FakeBrowsers()
+    with browsers.pool(3) as pool:
+        results = sorted(pool.resolve(REELS))
+    assert results == [(idx, url, video(url)) for idx, url in enumerate(REELS, 1)]
+    assert len(browsers.drivers) == 3
+    assert all(driver.quit_called for driver in browsers.drivers)
+
+
+def test_dead_browser_is_replaced_and_its_reel_requeued():
+    browsers = FakeBrowsers(kills={REELS[2]: 1})
+    with browsers.pool(1) as pool:
+        results = sorted(pool.resolve(REELS))
+    assert results == [(idx, url, video(url)) for idx, url in enumerate(REELS, 1)]
+    # The replacement was logged in before it took over
+    assert [driver.number for driver in browsers.drivers] == [1, 2]
+    assert browsers.logins == [1, 2]
+    assert browsers.drivers[0].quit_called
+
+
+def test_reel_that_keeps_killing_browsers_gives_up():
+    browsers = FakeBrowsers(kills={REELS[0]: 10})
+    with browsers.pool(1) as pool:
+        results = dict((url, video_url) for _, url, video_url in pool.resolve(REELS))
+    assert results.pop(REELS[0]) is None
+    assert results == {url: video(url) for url in REELS[1:]}
+    # Handed out MAX_REQUEUES more times, each on a new browser
+    assert len(browsers.drivers) == 1 + BrowserPool.MAX_REQUEUES + 1
+
+
+def test_pool_fails_loudly_when_no_browser_can_be_started():
+    browsers = FakeBrowsers(kills={REELS[0]: 1}, broken_after=1)
+    with browsers.pool(1) as pool:
+        with pytest.raises(RuntimeError, match="every browser worker has stopped"):
+            list(pool.resolve(REELS))
+
+
+def test_pool_fails_loudly_when_no_worker_logs_in():
+    browsers = FakeBrowsers(logins_ok=False)
+    with browsers.pool(2) as pool:
+        with pytest.raises(RuntimeError):
+            list(pool.resolve(REELS))
+    assert all(driver.quit_called for driver in browsers.drivers)
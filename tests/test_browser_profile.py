@@ -0,0 +1,50 @@
+"""``BrowserProfile`` switching the DevTools blocklist on and off"""
+from browser_profile import BrowserProfile
+
+
+class CdpDriver:
+    def __init__(self):
+        self.commands = []
+        self.blocked = []
+
+    def execute_cdp_cmd(self, command, params):
+        self.commands.append(command)
+        if command == 'Network.setBlockedURLs':
+            self.blocked = list(params['urls'])
+        return {}
+
+    def get_log(self, log_type):
+        return []
+
+
+def test_prepare_blocks_and_release_clears():
+    profile = BrowserProfile()
+    driver = CdpDriver()
+    assert profile.prepare(driver)
+    assert "*.css*" in driver.blocked
+    profile.release(driver)
+    assert driver.blocked == []
+
+
+def test_prepare_after_release_blocks_again():
+    profile = BrowserProfile()
+    driver = CdpDriver()
+    profile.prepare(driver)
+    profile.release(driver)
+    assert profile.prepare(driver)
+    assert driver.blocked == profile.patterns
+
+
+def test_release_of_an_unprepared_driver_sends_nothing():
+    profile = BrowserProfile()
+    driver = CdpDriver()
+    profile.release(driver)
+    assert driver.commands == []
+
+
+def test_nothing_is_blocked_without_block_resources():
+    profile = BrowserProfile(block_resources=False)
+    driver = CdpDriver()
+    assert not profile.prepare(driver)
+    profile.release(driver)
+    assert driver.commands == []
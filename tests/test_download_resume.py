@@ -0,0 +1,227 @@
+"""``download_video`` against a local server that drops and resumes transfers
+
+The GUI and the CLI downloaders and the asyncio engine share the .part/Range
+resume path and all run the same tests; stopping mid-transfer is GUI-only.
+"""
+import importlib.util
+import os
+import re
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+import instagram_scraper_gui
+from async_downloader import AsyncDownloadEngine
+from instagram_scraper_gui import InstagramReelDownloader
+
+BODY = os.urandom(300_000)
+
+
+class VideoServer:
+    """Serves ``BODY`` with byte ranges; each answer can be scripted.
+
+    ``plan`` is a list of per-request behaviours, used up in order (the
+    last one repeats): "ok", "drop" (send half the body, then close) and
+    "wrong_start" (a 206 starting at byte 0 whatever was asked).
+    ``ranges`` records the ``Range`` header of every request.
+    """
+
+    def __init__(self, plan=("ok",)):
+        self.plan = list(plan)
+        self.ranges = []
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                action = server.plan.pop(0) if len(server.plan) > 1 else server.plan[0]
+                server.ranges.append(self.headers.get("Range"))
+                start = 0
+                match = re.match(r"bytes=(\d+)-", self.headers.get("Range") or "")
+                if match:
+                    start = int(match.group(1))
+                    if start >= len(BODY):
+                        self.send_response(416)
+                        self.send_header("Content-Range", f"bytes */{len(BODY)}")
+                        self.send_header("Content-Length", "0")
+                        self.end_headers()
+                        return
+                    if action == "wrong_start":
+                        start = 0
+                    self.send_response(206)
+                    self.send_header("Content-Range", f"bytes {start}-{len(BODY) - 1}/{len(BODY)}")
+                else:
+                    self.send_response(200)
+                content = BODY[start:]
+                self.send_header("Content-Type", "video/mp4")
+                self.send_header("Content-Length", str(len(content)))
+                self.end_headers()
+                half = len(content) // 2
+                self.wfile.write(content[:half])
+                self.wfile.flush()
+                if action == "drop":
+                    self.close_connection = True
+                    return
+                self.wfile.write(content[half:])
+
+        self.httpd = QuietServer(("127.0.0.1", 0), Handler)
+        self.httpd.daemon_threads = True
+        self.url = f"http://127.0.0.1:{self.httpd.server_port}/video.mp4"
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+
+    def close(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+class QuietServer(ThreadingHTTPServer):
+    def handle_error(self, request, client_address):
+        # The client resets dropped connections; expected here
+        pass
+
+
+def load_cli():
+    spec = importlib.util.spec_from_file_location(
+        "instagram_scraper_cli", os.path.join(os.path.dirname(os.path.dirname(__file__)),
+                                              "Instagram Scraper Python.py"))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+@pytest.fixture
+def gui_downloader(tmp_path, monkeypatch):
+    # Retries wait 2 s between attempts; not here
+    monkeypatch.setattr(instagram_scraper_gui.time, "sleep", lambda seconds: None)
+    downloader = InstagramReelDownloader(target_profile="test", output_dir=str(tmp_path),
+                                         fast_resolve=False, reuse_session=False, chunk_size=16 * 1024)
+    downloader.log_message = lambda message: None
+    yield downloader
+    if downloader.writer:
+        downloader.writer.close()
+
+
+@pytest.fixture
+def cli_downloader(tmp_path, monkeypatch):
+    cli = load_cli()
+    monkeypatch.setattr(cli.time, "sleep", lambda seconds: None)
+    # The CLI creates its output folder in the working directory
+    monkeypatch.chdir(tmp_path)
+    downloader = cli.InstagramReelDownloader(target_profile="test", fast_resolve=False,
+                                             reuse_session=False, feed_listing=False)
+    downloader.output_dir = str(tmp_path)
+    return downloader
+
+
+class AsyncEngineDownloader:
+    """``download_video`` on top of an ``AsyncDownloadEngine``"""
+
+    def __init__(self, output_dir):
+        self.output_dir = output_dir
+        self.engines = []
+
+    def download_video(self, video_url, filename, max_retries=3):
+        engine = AsyncDownloadEngine(self.output_dir, max_retries=max_retries, chunk_size=16 * 1024,
+                                     log=lambda message: None, retry_delay=0).start()
+        self.engines.append(engine)
+        return engine.submit(video_url, filename).result()
+
+    def close(self):
+        for engine in self.engines:
+            engine.close()
+
+
+@pytest.fixture
+def async_downloader(tmp_path):
+    pytest.importorskip("aiohttp")
+    downloader = AsyncEngineDownloader(str(tmp_path))
+    yield downloader
+    downloader.close()
+
+
+@pytest.fixture(params=["gui", "cli", "async"])
+def downloader(request):
+    return request.getfixturevalue(f"{request.param}_downloader")
+
+
+def serve(request, plan):
+    server = VideoServer(plan)
+    request.addfinalizer(server.close)
+    return server
+
+
+def read(path):
+    with open(path, 'rb') as f:
+        return f.read()
+
+
+def test_dropped_transfer_resumes_from_part_file(request, downloader, tmp_path):
+    server = serve(request, ["drop", "ok"])
+    assert downloader.download_video(server.url, "reel.mp4")
+    assert read(tmp_path / "reel.mp4") == BODY
+    assert not (tmp_path / "reel.mp4.part").exists()
+    assert server.ranges[0] is None
+    assert server.ranges[1] == f"bytes={len(BODY) // 2}-"
+
+
+def test_part_file_from_an_earlier_run_is_continued(request, downloader, tmp_path):
+    server = serve(request, ["ok"])
+    (tmp_path / "reel.mp4.part").write_bytes(BODY[:1000])
+    assert downloader.download_video(server.url, "reel.mp4")
+    assert read(tmp_path / "reel.mp4") == BODY
+    assert server.ranges == ["bytes=1000-"]
+
+
+def test_resume_at_the_wrong_offset_is_rejected(request, downloader, tmp_path):
+    server = serve(request, ["wrong_start"])
+    (tmp_path / "reel.mp4.part").write_bytes(BODY[:1000])
+    assert not downloader.download_video(server.url, "reel.mp4", max_retries=2)
+    assert not (tmp_path / "reel.mp4").exists()
+    assert len(server.ranges) == 2
+
+
+def test_416_for_a_complete_part_file_finishes_it(request, downloader, tmp_path):
+    server = serve(request, ["ok"])
+    (tmp_path / "reel.mp4.part").write_bytes(BODY)
+    assert downloader.download_video(server.url, "reel.mp4")
+    assert read(tmp_path / "reel.mp4") == BODY
+    assert server.ranges == [f"bytes={len(BODY)}-"]
+
+
+def test_416_for_an_oversized_part_file_starts_over(request, downloader, tmp_path):
+    server = serve(request, ["ok"])
+    (tmp_path / "reel.mp4.part").write_bytes(BODY + b"extra")
+    assert downloader.download_video(server.url, "reel.mp4")
+    assert read(tmp_path / "reel.mp4") == BODY
+    assert server.ranges == [f"bytes={len(BODY) + 5}-", None]
+
+
+def test_stop_keeps_the_part_file_for_the_next_run(request, gui_downloader, tmp_path):
+    downloader = gui_downloader
+    server = serve(request, ["ok"])
+    chunks = []
+
+    def keep_going():
+        # Stop after a few chunks, as a click on Stop would
+        chunks.append(1)
+        if len(chunks) > 3:
+            downloader.stop_requested = True
+        return not downloader.stop_requested
+
+    downloader.wait_if_paused = keep_going
+    assert not downloader.download_video(server.url, "reel.mp4")
+    part = tmp_path / "reel.mp4.part"
+    kept = part.stat().st_size
+    assert 0 < kept < len(BODY)
+    assert not (tmp_path / "reel.mp4").exists()
+
+    downloader.stop_requested = False
+    del downloader.wait_if_paused
+    assert downloader.download_video(server.url, "reel.mp4")
+    assert read(tmp_path / "reel.mp4") == BODY
+    assert server.ranges == [None, f"bytes={kept}-"]
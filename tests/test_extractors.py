@@ -0,0 +1,84 @@
+"""The extractor chain against saved reel pages (``tests/fixtures/reels``)"""
+import os
+
+import pytest
+
+from extractors import ExtractorChain, decode_escapes, find_video_url
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures", "reels")
+
+
+def cdn(n, ext="mp4", kind="mp4", path="m86"):
+    """The CDN URL the fixture pages use for media ``n``"""
+    host = "scontent-fra5-1.cdninstagram.com"
+    return (f"https://{host}/o1/v/t16/f2/{path}/AQ{n}Pp3kXo7Gr2QbT9mFZ_vLh0sNc8.{ext}"
+            f"?stp=dst-{kind}&efg=eyJxZV9ncm91cHMiOiJbXCJpZ193ZWJfZGVsaXZlcnlfdnRzX290ZlwiXSJ9"
+            f"&_nc_ht={host}&_nc_cat=10{n}&vs=8f2c{n}a1&_nc_vs=HBksFQIYUmln&oh=00_AYD{n}xQ3&oe=6713A{n}F2")
+
+
+def page(name):
+    with open(os.path.join(FIXTURES, name), encoding="utf-8") as f:
+        return f.read()
+
+
+@pytest.mark.parametrize("fixture, url", [
+    ("logged_in_video_versions.html", cdn(1)),
+    ("logged_out_json_ld.html", cdn(4)),
+    ("graphql_shared_data.html", cdn(6)),
+    ("og_video_meta.html", cdn(7)),
+    ("hls_only.html", cdn(8, "m3u8", "hls")),
+    ("dash_only.html", cdn(11, "mpd", "dash")),
+    ("login_wall.html", None),
+])
+def test_page_yields_its_video_url(fixture, url):
+    assert find_video_url(page(fixture)) == url
+
+
+def test_embedded_json_runs_before_the_url_scan():
+    # The DASH manifest's audio-only BaseURL is the first .mp4 on the page
+    source = page("logged_in_video_versions.html")
+    chain = ExtractorChain.default()
+    scan = chain.extractors[2]
+    assert scan.name == "mp4_url"
+    assert scan.extract(source).startswith(cdn(9, path="m69"))
+    assert chain.extract(source) == cdn(1)
+
+
+def test_json_ld_runs_before_embedded_json():
+    # The embedded JSON further down holds a smaller rendition
+    source = page("logged_out_json_ld.html")
+    chain = ExtractorChain.default()
+    assert chain.extractors[1].extract(source) == cdn(5)
+    assert chain.extract(source) == cdn(4)
+
+
+def test_chain_stops_at_the_first_hit():
+    chain = ExtractorChain.default()
+    chain.extract(page("logged_out_json_ld.html"))
+    assert [extractor.stats()['attempts'] for extractor in chain.extractors] == [1, 0, 0, 0, 0]
+
+
+def test_hit_rates_over_the_corpus():
+    chain = ExtractorChain.default()
+    for name in sorted(os.listdir(FIXTURES)):
+        chain.extract(page(name))
+    assert chain.stats() == {
+        'json_ld': {'attempts': 7, 'hits': 1, 'hit_rate': 0.143},
+        'embedded_json': {'attempts': 6, 'hits': 2, 'hit_rate': 0.333},
+        'mp4_url': {'attempts': 4, 'hits': 1, 'hit_rate': 0.25},
+        'm3u8_url': {'attempts': 3, 'hits': 1, 'hit_rate': 0.333},
+        'mpd_url': {'attempts': 2, 'hits': 1, 'hit_rate': 0.5},
+    }
+
+
+@pytest.mark.parametrize("raw, decoded", [
+    (r"https:\/\/cdn\/v.mp4?a=1\u0026b=2", "https://cdn/v.mp4?a=1&b=2"),
+    (r"https:\u002F\u002Fcdn\u002Fv.mp4?a\u003D1", "https://cdn/v.mp4?a=1"),
+    (r"\u003Cvideo\u003E", "<video>"),
+    ("https://cdn/v.mp4?a=1&amp;b=2", "https://cdn/v.mp4?a=1&b=2"),
+    (r"https:\/\/cdn\/caf\u00e9.mp4", "https://cdn/caf\u00e9.mp4"),
+    # Not valid JSON (a stray backslash); the common escapes are still undone
+    (r"https:\/\/cdn\/v.mp4?a=1\u0026b=\x", r"https://cdn/v.mp4?a=1&b=\x"),
+])
+def test_decode_escapes(raw, decoded):
+    assert decode_escapes(raw) == decoded
@@ -0,0 +1,131 @@
+"""``NetworkCapture`` and ``find_loaded_video`` replaying recorded performance logs"""
+import json
+import os
+
+from browser_profile import BrowserProfile
+from network_capture import NetworkCapture, clean_media_url, find_loaded_video
+from waits import VIDEO_SRC_SCRIPT
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures", "network")
+CDN = "https://scontent-ams2-1.cdninstagram.com"
+VIDEO = (CDN + "/o1/v/t16/f2/m86/AQN1abc_video.mp4?efg=eyJ2ZW5j"
+         "&_nc_ht=scontent-ams2-1.cdninstagram.com&oh=00_AfB&oe=6720A1B2")
+
+
+class ReplayDriver:
+    """Replays a recorded performance log after ``get``, ``per_poll`` entries at a time"""
+
+    def __init__(self, fixture, per_poll=None, video_src=None):
+        with open(os.path.join(FIXTURES, fixture)) as f:
+            self.recorded = json.load(f)
+        self.entries = [{'level': 'INFO', 'timestamp': 1.0, 'message': '{"message": {"method": "Page.loadEventFired"}}'}]
+        self.per_poll = per_poll or len(self.recorded)
+        self.video_src = video_src
+
+    def get(self, url):
+        self.entries += self.recorded
+
+    def get_log(self, log_type):
+        assert log_type == 'performance'
+        batch, self.entries = self.entries[:self.per_poll], self.entries[self.per_poll:]
+        return batch
+
+    def execute_script(self, script, *args):
+        assert script == VIDEO_SRC_SCRIPT
+        return self.video_src
+
+
+def capture_for(driver):
+    """A capture started the way ``extract_video_url`` does, right before the navigation"""
+    capture = NetworkCapture(BrowserProfile(block_resources=False).drain_log)
+    capture.start(driver)
+    driver.get("https://www.instagram.com/reel/C9xYzAbCdEf/")
+    return capture
+
+
+def poll_until_done(capture, driver, polls=20):
+    for _ in range(polls):
+        media = capture.poll(driver)
+        if media:
+            return media
+    return None
+
+
+def test_ranged_video_response_gives_whole_file_url_and_full_size():
+    driver = ReplayDriver("reel_ranged_video.json", per_poll=2)
+    capture = capture_for(driver)
+    media = poll_until_done(capture, driver)
+    # Not the thumbnail, not the separate audio track
+    assert media.url == clean_media_url(VIDEO + "&bytestart=0&byteend=65535")
+    assert "bytestart" not in media.url and "byteend" not in media.url
+    assert media.content_type == "video/mp4"
+    assert media.size == 5242880
+    assert capture.document_status == 200
+
+
+def test_audio_request_is_not_taken_for_the_video():
+    driver = ReplayDriver("reel_ranged_video.json", per_poll=6)
+    capture = capture_for(driver)
+    # Up to the audio response: the audio request was seen and then dropped
+    assert capture.poll(driver) is None
+    assert capture.best() is None
+    assert capture.poll(driver).url.startswith(CDN + "/o1/v/t16/f2/m86/AQN1abc_video.mp4")
+
+
+def test_whole_video_response_takes_size_from_content_length():
+    driver = ReplayDriver("reel_whole_video.json")
+    media = capture_for(driver).poll(driver)
+    assert media == (VIDEO, "video/mp4", 1834022)
+
+
+def test_blocked_video_request_is_returned_once_it_has_failed():
+    driver = ReplayDriver("reel_blocked_video.json", per_poll=4)
+    capture = capture_for(driver)
+    # Request seen, failure not yet: nothing final, but best() has it
+    assert capture.poll(driver) is None
+    assert capture.best().url == clean_media_url(VIDEO + "&bytestart=0&byteend=65535")
+    media = capture.poll(driver)
+    assert media.url == capture.best().url
+    assert media.content_type == "video/mp4"
+    assert media.size is None
+
+
+def test_failed_thumbnail_does_not_count_as_the_video_failing():
+    driver = ReplayDriver("reel_blocked_video.json", per_poll=3)
+    capture = capture_for(driver)
+    assert capture.poll(driver) is None
+    assert not capture.request_failed
+
+
+def test_start_keeps_earlier_messages_and_forgets_earlier_media():
+    driver = ReplayDriver("reel_whole_video.json")
+    capture = capture_for(driver)
+    assert capture.poll(driver)
+    capture.start(driver)
+    assert capture.result() is None and capture.best() is None
+    # The event drained before the navigation and the three after it
+    assert len(capture.messages) == 4
+
+
+def test_throttled_document_is_reported():
+    driver = ReplayDriver("reel_throttled.json")
+    assert find_loaded_video(driver, capture_for(driver)) == ("throttled", None)
+
+
+def test_find_loaded_video_sources():
+    driver = ReplayDriver("reel_whole_video.json")
+    assert find_loaded_video(driver, capture_for(driver)) == ("network", VIDEO)
+
+    driver = ReplayDriver("reel_throttled.json", video_src=None)
+    assert find_loaded_video(driver) is None
+
+    driver = ReplayDriver("reel_throttled.json", video_src=VIDEO)
+    assert find_loaded_video(driver) == ("video_src", VIDEO)
+
+    driver = ReplayDriver("reel_throttled.json", video_src="blob:https://www.instagram.com/5f2a")
+    assert find_loaded_video(driver) == ("blob", None)
+
+    # A blob player streaming a request whose response has not arrived yet
+    driver = ReplayDriver("reel_blocked_video.json", per_poll=4, video_src="blob:https://www.instagram.com/5f2a")
+    source, url = find_loaded_video(driver, capture_for(driver))
+    assert source == "network" and url == clean_media_url(VIDEO + "&bytestart=0&byteend=65535")
@@ -0,0 +1,100 @@
+"""``DISMISS_POPUP_SCRIPT`` run against saved Instagram pages.
+
+The script runs in Node with a stub ``document`` built from the fixture:
+every ``<button>`` and ``<div role="button">``, in page order, with its
+text and whether it is rendered (elements under ``hidden`` or
+``display: none`` have no ``offsetParent``, as in a browser).
+"""
+import json
+import os
+import shutil
+import subprocess
+from html.parser import HTMLParser
+
+import pytest
+
+from popups import DEFAULT_POPUP_BUTTONS, DISMISS_POPUP_SCRIPT, merge_popup_buttons
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures", "popups")
+VOID_TAGS = {"area", "base", "br", "col", "embed", "hr", "img", "input", "link", "meta", "source", "wbr"}
+
+RUNNER = """
+const input = JSON.parse(require('fs').readFileSync(0, 'utf8'));
+const clicked = [];
+const elements = input.elements.map(el => ({
+    textContent: el.text,
+    offsetParent: el.visible ? {} : null,
+    click() { clicked.push(el.text.trim()); },
+}));
+global.document = {querySelectorAll: () => elements};
+const name = new Function(input.script).apply(null, [input.signatures]);
+console.log(JSON.stringify({name, clicked}));
+"""
+
+
+class ButtonCollector(HTMLParser):
+    """The elements ``document.querySelectorAll('button, div[role="button"]')`` would return"""
+
+    def __init__(self):
+        super().__init__()
+        self.stack = []
+        self.elements = []
+
+    def handle_starttag(self, tag, attrs):
+        if tag in VOID_TAGS:
+            return
+        attrs = dict(attrs)
+        style = (attrs.get('style') or '').replace(' ', '')
+        hidden = 'hidden' in attrs or 'display:none' in style
+        element = None
+        if tag == 'button' or (tag == 'div' and attrs.get('role') == 'button'):
+            element = {'text': '', 'visible': not hidden and not any(e[1] for e in self.stack)}
+            self.elements.append(element)
+        self.stack.append((tag, hidden, element))
+
+    def handle_endtag(self, tag):
+        while self.stack:
+            if self.stack.pop()[0] == tag:
+                break
+
+    def handle_data(self, data):
+        for _, _, element in self.stack:
+            if element is not None:
+                element['text'] += data
+
+
+def dismiss(fixture, popup_buttons=DEFAULT_POPUP_BUTTONS):
+    """``(popup type, clicked button texts)`` of one poll on the fixture page"""
+    if not shutil.which("node"):
+        pytest.skip("node is needed to run the popup script")
+    collector = ButtonCollector()
+    with open(os.path.join(FIXTURES, fixture), encoding="utf-8") as f:
+        collector.feed(f.read())
+    payload = json.dumps({'script': DISMISS_POPUP_SCRIPT, 'elements': collector.elements,
+                          'signatures': list(popup_buttons.items())})
+    output = subprocess.run(["node", "-e", RUNNER], input=payload, capture_output=True,
+                            text=True, check=True, timeout=30).stdout
+    result = json.loads(output)
+    return result['name'], result['clicked']
+
+
+@pytest.mark.parametrize("fixture, popup, button", [
+    ("onetap_save_info.html", "save_info", "Not now"),
+    # Popups sharing a button text are reported under the first signature that has it
+    ("notifications_dialog.html", "save_info", "Not Now"),
+    ("add_to_home_dialog.html", "add_to_home", "Cancel"),
+    ("generic_skip_dialog.html", "generic", "Skip"),
+])
+def test_popup_is_dismissed(fixture, popup, button):
+    assert dismiss(fixture) == (popup, [button])
+
+
+def test_page_without_popup_is_left_alone():
+    # Labels that merely contain "Skip", "Cancel" or "No thanks", and a hidden dialog
+    assert dismiss("profile_no_popup.html") == (None, [])
+
+
+def test_extra_signatures_are_matched():
+    buttons = merge_popup_buttons({"install": ["add to home screen"]})
+    assert dismiss("add_to_home_dialog.html", {"install": buttons["install"]}) == (
+        "install", ["Add to Home screen"])
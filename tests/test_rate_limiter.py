@@ -0,0 +1,70 @@
+"""Adaptive rate of ``TokenBucket`` and the responses ``RateLimiter`` counts as throttling"""
+from rate_limiter import RateLimiter, TokenBucket
+
+
+class Response:
+    def __init__(self, status_code, headers=None):
+        self.status_code = status_code
+        self.headers = headers or {}
+
+
+def probe(bucket, times):
+    for _ in range(times):
+        bucket.succeeded()
+
+
+def test_rate_climbs_until_the_first_throttle():
+    bucket = TokenBucket(8.0, cooldown=0)
+    probe(bucket, 200)
+    # Well past any multiple of the starting rate guessed up front
+    assert bucket.rate > 8.0 * 4
+    assert bucket.ceiling is None
+
+
+def test_throttled_rate_becomes_the_ceiling():
+    bucket = TokenBucket(8.0, cooldown=0)
+    probe(bucket, 50)
+    refused = bucket.rate
+    bucket.throttled(retry_after=0)
+    assert bucket.ceiling == refused
+    assert bucket.rate == refused / 2
+    probe(bucket, 200)
+    assert bucket.rate == refused
+
+
+def test_a_later_throttle_lowers_the_ceiling():
+    bucket = TokenBucket(8.0, cooldown=0)
+    bucket.throttled(retry_after=0)
+    probe(bucket, 5)
+    lower = bucket.rate
+    bucket.throttled(retry_after=0)
+    assert bucket.ceiling == lower < 8.0
+
+
+def test_no_probing_during_cooldown():
+    bucket = TokenBucket(8.0, cooldown=60)
+    bucket.throttled(retry_after=0)
+    probe(bucket, 50)
+    assert bucket.rate == 4.0
+
+
+def test_max_rate_caps_the_probe():
+    bucket = TokenBucket(8.0, max_rate=10.0, cooldown=0)
+    probe(bucket, 200)
+    assert bucket.rate == 10.0
+
+
+def test_reserve_spaces_requests_without_sleeping():
+    bucket = TokenBucket(10.0)
+    assert bucket.reserve() == 0
+    assert 0.09 < bucket.reserve() <= 0.1
+
+
+def test_observe_counts_429_and_503_with_retry_after():
+    limiter = RateLimiter()
+    assert limiter.observe(RateLimiter.CDN, Response(429))
+    assert limiter.observe(RateLimiter.CDN, Response(503, {'Retry-After': '0'}))
+    assert not limiter.observe(RateLimiter.CDN, Response(503))
+    assert not limiter.observe(RateLimiter.CDN, Response(200))
+    assert limiter.observe_status(RateLimiter.PAGE, 429, {})
+    assert limiter.buckets[RateLimiter.CDN].throttle_events == 2
@@ -0,0 +1,101 @@
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+
+# Sent with every request unless overridden; media byte offsets and
+# Content-Length must refer to the raw file, hence no compression
+DEFAULT_HEADERS = {
+    "User-Agent": "Mozilla/5.0 (iPhone; CPU iPhone OS 14_0_1 like Mac OS X) AppleWebKit/605.1.15",
+    "Accept": "*/*",
+    "Accept-Encoding": "identity",
+}
+
+# Instagram's web app ID, which its JSON endpoints expect
+INSTAGRAM_APP_ID = "936619743392459"
+
+
+def set_cookies(session, cookies):
+    """Load WebDriver-style cookie dicts (e.g. ``driver.get_cookies()``) into ``session``"""
+    for cookie in cookies:
+        session.cookies.set(cookie['name'], cookie['value'],
+                            domain=cookie.get('domain'), path=cookie.get('path', '/'))
+
+
+class TransportStats:
+    """Counts requests and newly opened connections, to show keep-alive reuse"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.connections = 0
+
+    def record_request(self):
+        with self.lock:
+            self.requests += 1
+
+    def record_connection(self):
+        with self.lock:
+            self.connections += 1
+
+    def report(self):
+        """``(requests, connections, reuse_ratio)``"""
+        with self.lock:
+            requests_made, connections = self.requests, self.connections
+        reused = 1 - connections / requests_made if requests_made else 0.0
+        return requests_made, connections, max(0.0, reused)
+
+
+class PooledAdapter(HTTPAdapter):
+    """``HTTPAdapter`` whose connection pools report every new connection"""
+
+    def __init__(self, stats, **kwargs):
+        # init_poolmanager runs inside HTTPAdapter.__init__ and needs this
+        self.stats = stats
+        super().__init__(**kwargs)
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        stats = self.stats
+
+        class CountingHTTPConnectionPool(HTTPConnectionPool):
+            def _new_conn(self):
+                stats.record_connection()
+                return super()._new_conn()
+
+        class CountingHTTPSConnectionPool(HTTPSConnectionPool):
+            def _new_conn(self):
+                stats.record_connection()
+                return super()._new_conn()
+
+        self.poolmanager.pool_classes_by_scheme = {
+            "http": CountingHTTPConnectionPool,
+            "https": CountingHTTPSConnectionPool,
+        }
+
+    def send(self, request, **kwargs):
+        self.stats.record_request()
+        return super().send(request, **kwargs)
+
+
+def create_session(concurrency, hosts=32, headers=None):
+    """A ``requests`` session whose pools fit ``concurrency`` threads.
+
+    Each host keeps up to ``concurrency`` connections alive and requests
+    beyond that wait for a free one (``pool_block``) instead of opening a
+    socket that would be thrown away afterwards. ``hosts`` pools are kept,
+    enough for the CDN edge hosts a run touches. Returns
+    ``(session, stats)``.
+    """
+    session = requests.Session()
+    session.headers.update(DEFAULT_HEADERS)
+    if headers:
+        session.headers.update(headers)
+
+    stats = TransportStats()
+    adapter = PooledAdapter(stats, pool_connections=hosts, pool_maxsize=max(1, concurrency),
+                            pool_block=True)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session, stats
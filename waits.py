@@ -0,0 +1,71 @@
+import threading
+import time
+from contextlib import contextmanager
+
+
+class WaitBudget:
+    """Condition-based waits that account for the time spent at each call site.
+
+    ``wait`` polls a condition until it returns something truthy or the
+    timeout runs out, instead of sleeping for a fixed period. Every wait,
+    sleep or tracked block adds its elapsed time to its call site so the run
+    summary can show where latency goes.
+    """
+
+    def __init__(self, should_stop=None):
+        self.should_stop = should_stop or (lambda: False)
+        self.totals = {}
+        self.counts = {}
+        self.lock = threading.Lock()
+
+    def record(self, site, seconds):
+        with self.lock:
+            self.totals[site] = self.totals.get(site, 0.0) + seconds
+            self.counts[site] = self.counts.get(site, 0) + 1
+
+    def wait(self, site, condition, timeout, poll=0.1):
+        """Poll ``condition()`` until truthy; return its value, or None on timeout.
+
+        Exceptions from the condition (stale or missing elements while the
+        page is still changing) count as "not ready yet".
+        """
+        start = time.monotonic()
+        deadline = start + timeout
+        result = None
+        while not self.should_stop():
+            try:
+                result = condition()
+            except Exception:
+                result = None
+            if result or time.monotonic() >= deadline:
+                break
+            time.sleep(poll)
+        self.record(site, time.monotonic() - start)
+        return result or None
+
+    def sleep(self, site, seconds):
+        """A fixed pause that still shows up in the report (e.g. retry back-off)"""
+        time.sleep(seconds)
+        self.record(site, seconds)
+
+    @contextmanager
+    def track(self, site):
+        """Account for a block that waits internally (e.g. ``WebDriverWait``)"""
+        start = time.monotonic()
+        try:
+            yield
+        finally:
+            self.record(site, time.monotonic() - start)
+
+    def report(self):
+        """``(site, total_seconds, count)`` tuples, largest total first"""
+        with self.lock:
+            rows = [(site, total, self.counts[site]) for site, total in self.totals.items()]
+        return sorted(rows, key=lambda row: row[1], reverse=True)
+
+
+# Page probes used as wait conditions; each is one WebDriver round-trip
+VIDEO_SRC_SCRIPT = "const v = document.querySelector('video'); return v && v.src ? v.src : null;"
+REEL_ANCHOR_COUNT_SCRIPT = "return document.querySelectorAll('a[href*=\"/reel/\"]').length;"
+SCROLL_HEIGHT_SCRIPT = "return document.body.scrollHeight;"
+
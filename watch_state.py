@@ -0,0 +1,99 @@
+import json
+import os
+import threading
+import time
+
+
+class WatchState:
+    """Newest reel shortcodes already downloaded, per profile.
+
+    An incremental run stops scrolling a profile once it reaches reels it
+    has seen before, since the grid lists the newest first. Only the top
+    ``keep`` shortcodes per profile are kept; that is plenty to recognise
+    the boundary even if a few recent reels were deleted. Reels that failed
+    to download are kept in a separate retry list so the next run scrolls
+    at least as far as them. A reel is dropped from it after ``retry_runs``
+    runs without a download, so one that was deleted or always fails does
+    not keep every later run scrolling the whole grid.
+    """
+
+    def __init__(self, path, keep=50, retry_runs=3):
+        self.path = path
+        self.keep = keep
+        self.retry_runs = retry_runs
+        self.lock = threading.Lock()
+        self.profiles = {}
+        if os.path.exists(path):
+            try:
+                with open(path, 'r') as f:
+                    self.profiles = json.load(f).get('profiles', {})
+            except (OSError, ValueError):
+                self.profiles = {}
+
+    def known(self, profile):
+        """Shortcodes recorded for ``profile``, newest first"""
+        with self.lock:
+            return list(self.profiles.get(profile, {}).get('shortcodes', []))
+
+    def retry(self, profile):
+        """Shortcodes of reels that still have to be downloaded"""
+        with self.lock:
+            return list(self.profiles.get(profile, {}).get('retry', []))
+
+    def remember(self, profile, done, failed=()):
+        """Put ``done`` (newest first) in front of the known shortcodes.
+
+        ``failed`` is added to the retry list, and reels in it that are
+        now done are dropped from it. Every call counts as a run for the
+        reels still on the list, done or not seen.
+        """
+        with self.lock:
+            entry = self.profiles.setdefault(profile, {'shortcodes': []})
+            merged = list(done)
+            merged += [code for code in entry['shortcodes'] if code not in merged]
+            entry['shortcodes'] = merged[:self.keep]
+            retry = list(failed) + [code for code in entry.get('retry', []) if code not in failed]
+            runs = entry.get('retry_runs', {})
+            runs = {code: runs.get(code, 0) + 1 for code in retry if code not in merged}
+            entry['retry'] = [code for code in runs if runs[code] <= self.retry_runs][:self.keep]
+            entry['retry_runs'] = {code: runs[code] for code in entry['retry']}
+            entry['checked_at'] = time.time()
+            self.save()
+
+    def save(self):
+        temp_path = self.path + '.tmp'
+        with open(temp_path, 'w') as f:
+            json.dump({'profiles': self.profiles}, f, indent=2)
+        os.replace(temp_path, self.path)
+
+
+# Instagram lets a profile pin up to three (old) reels above the newest
+# ones, so a run of known reels only marks the boundary once it is longer
+PINNED_REELS = 3
+
+
+class ListingBoundary:
+    """Where an incremental listing reaches the reels of an earlier run.
+
+    Feed it the shortcodes of one listing, newest first: ``is_new`` tells
+    which to take, and ``reached`` turns true after a run of known reels
+    longer than the pinned ones, once every reel to retry has come up.
+    """
+
+    def __init__(self, known=(), retry=()):
+        self.known = set(known)
+        self.retry = set(retry)
+        self.stop_after = min(PINNED_REELS + 1, len(self.known))
+        self.streak = 0
+
+    def is_new(self, shortcode):
+        if shortcode in self.known:
+            self.streak += 1
+            return False
+        self.streak = 0
+        self.retry.discard(shortcode)
+        return True
+
+    @property
+    def reached(self):
+        return bool(self.known) and self.streak >= self.stop_after and not self.retry
@@ -0,0 +1,238 @@
+import ctypes
+import ctypes.util
+import errno
+import hashlib
+import os
+import queue
+import re
+import threading
+from collections import namedtuple
+
+FSYNC_POLICIES = ("none", "close", "chunk")
+
+# Linux fallocate(2) flag: reserve blocks without changing the file size,
+# so a killed download's .part file still reports only the bytes written
+FALLOC_FL_KEEP_SIZE = 1
+
+
+# How to handle the answer to a download request that asked for the bytes
+# of a .part file from ``offset`` on (see resume_plan)
+ResumePlan = namedtuple('ResumePlan', ['action', 'total'])
+
+
+def parse_content_range(value):
+    """Parse a ``Content-Range`` header into ``(start, total)``.
+
+    Either part is None when the server leaves it out (``*``).
+    """
+    match = re.match(r'bytes\s+(?:(\d+)-\d+|\*)/(\d+|\*)', value or "")
+    if not match:
+        return None, None
+    start = int(match.group(1)) if match.group(1) is not None else None
+    total = int(match.group(2)) if match.group(2) != '*' else None
+    return start, total
+
+
+def resume_plan(status, headers, offset):
+    """``ResumePlan`` for a response to a request starting at byte ``offset``.
+
+    ``action`` is "append" (a 206 continuing the .part file), "write" (a
+    full body, replacing it), "complete" (a 416 because the .part already
+    holds the whole file), "restart" (a 416 for a .part that does not fit;
+    delete it and start over) or "retry" (any other status). ``total`` is
+    the full size when the server says. A 206 starting anywhere but
+    ``offset`` raises ``IOError``.
+    """
+    if status == 416 and offset:
+        _, total = parse_content_range(headers.get('Content-Range'))
+        return ResumePlan("complete", total) if total == offset else ResumePlan("restart", None)
+    if status == 206 and offset:
+        start, total = parse_content_range(headers.get('Content-Range'))
+        if start != offset:
+            raise IOError(f"server resumed at byte {start}, expected {offset}")
+        return ResumePlan("append", total)
+    if status == 200:
+        # Full body: the server ignored the Range header or none was sent
+        length = headers.get('Content-Length')
+        return ResumePlan("write", int(length) if length else None)
+    return ResumePlan("retry", None)
+
+
+def hash_file(path):
+    """SHA-256 of the bytes already on disk, used when resuming a .part file"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(block)
+    return digest
+
+
+def _load_fallocate():
+    try:
+        fallocate = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True).fallocate
+    except (OSError, AttributeError, TypeError):
+        return None
+    fallocate.argtypes = [ctypes.c_int, ctypes.c_int, ctypes.c_longlong, ctypes.c_longlong]
+    fallocate.restype = ctypes.c_int
+    return fallocate
+
+
+_fallocate = _load_fallocate()
+
+
+def preallocate(f, offset, length):
+    """Reserve ``length`` bytes from ``offset``; False where unsupported.
+
+    Running out of space is raised straight away instead of partway
+    through the download.
+    """
+    if _fallocate is None or length <= 0:
+        return False
+    if _fallocate(f.fileno(), FALLOC_FL_KEEP_SIZE, offset, length) == 0:
+        return True
+    err = ctypes.get_errno()
+    if err == errno.ENOSPC:
+        raise OSError(err, os.strerror(err))
+    return False
+
+
+class BackgroundWriter:
+    """One thread that performs the file writes queued by network threads.
+
+    Each ``FileSink`` only has a few buffers, so a download whose writes
+    are still queued waits for a buffer to come back: memory stays bounded
+    and network threads slow down only when the disk cannot keep up.
+    """
+
+    def __init__(self):
+        self.queue = queue.Queue()
+        self.thread = threading.Thread(target=self._run, name="background-writer", daemon=True)
+        self.thread.start()
+
+    def _run(self):
+        while True:
+            item = self.queue.get()
+            if item is None:
+                return
+            sink, data, buffer, done = item
+            try:
+                if data is not None and sink.error is None:
+                    sink.write_now(data)
+            except Exception as e:
+                sink.error = e
+            finally:
+                if buffer is not None:
+                    sink.free.put(buffer)
+                if done:
+                    done.set()
+
+    def submit(self, sink, data, buffer=None):
+        self.queue.put((sink, data, buffer, None))
+
+    def flush(self, sink):
+        """Block until every write queued for ``sink`` so far has happened"""
+        done = threading.Event()
+        self.queue.put((sink, None, None, done))
+        done.wait()
+
+    def close(self):
+        self.queue.put(None)
+        self.thread.join()
+
+
+class FileSink:
+    """Destination file for one download (or one segment of it).
+
+    ``stream`` reads the response body straight into reused ``chunk_size``
+    buffers and writes them here, or through ``writer`` when a
+    ``BackgroundWriter`` is given. With ``expected_size`` the blocks are
+    reserved up front. ``fsync`` is "none", "close" (once before the file
+    is closed) or "chunk" (after every write).
+    """
+
+    def __init__(self, path, mode, chunk_size=1024 * 1024, expected_size=None,
+                 offset=None, fsync="none", writer=None, buffers=4):
+        if fsync not in FSYNC_POLICIES:
+            raise ValueError(f"fsync must be one of {', '.join(FSYNC_POLICIES)}")
+        self.file = open(path, mode)
+        if offset is not None:
+            self.file.seek(offset)
+        self.chunk_size = chunk_size
+        self.fsync = fsync
+        self.writer = writer
+        self.error = None
+        self.written = 0
+        self.free = queue.Queue()
+        for _ in range(buffers if writer else 1):
+            self.free.put(memoryview(bytearray(chunk_size)))
+        if expected_size:
+            position = self.file.tell()
+            preallocate(self.file, position, expected_size - position)
+
+    def write_now(self, data):
+        self.file.write(data)
+        if self.fsync == "chunk":
+            self.file.flush()
+            os.fsync(self.file.fileno())
+
+    def write(self, data, buffer=None):
+        """Write ``data``; ``buffer`` (which ``data`` views) is reused afterwards"""
+        if self.error is not None:
+            raise self.error
+        if self.writer:
+            self.writer.submit(self, data, buffer)
+            return
+        try:
+            self.write_now(data)
+        finally:
+            if buffer is not None:
+                self.free.put(buffer)
+
+    def stream(self, response, digest=None, keep_going=None):
+        """Copy the response body here; returns the number of bytes written.
+
+        Stops early when ``keep_going()`` returns False. Encoded bodies
+        go through ``iter_content``, which decodes them. ``written`` counts
+        the bytes so far, also if the transfer breaks off with an error.
+        """
+        if response.headers.get('Content-Encoding', 'identity').lower() not in ('', 'identity'):
+            for chunk in response.iter_content(chunk_size=self.chunk_size):
+                if keep_going and not keep_going():
+                    break
+                if digest:
+                    digest.update(chunk)
+                self.write(chunk)
+                self.written += len(chunk)
+            return self.written
+
+        while not keep_going or keep_going():
+            buffer = self.free.get()
+            count = response.raw.readinto(buffer)
+            if not count:
+                self.free.put(buffer)
+                break
+            data = buffer[:count]
+            if digest:
+                digest.update(data)
+            self.write(data, buffer)
+            self.written += count
+        return self.written
+
+    def close(self):
+        """Wait for queued writes, apply the fsync policy and close the file"""
+        try:
+            if self.writer:
+                self.writer.flush(self)
+            if self.error is None and self.fsync == "close":
+                self.file.flush()
+                os.fsync(self.file.fileno())
+        finally:
+            self.file.close()
+        if self.error is not None:
+            raise self.error
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()